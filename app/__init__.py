@@ -1,38 +1,86 @@
-from flask import Flask
-from flask_swagger import swagger
-from flask_swagger_ui import get_swaggerui_blueprint
-from .extensions import ma, limiter, cache, db
-from .blueprints.customer import customer_bp
-from .blueprints.mechanic import mechanic_bp
-from .blueprints.service_ticket import service_ticket_bp
-from .blueprints.inventory import inventory_bp
-from .swagger_config import swagger_config
+import importlib
+import threading
+
+from flask import Flask, appcontext_pushed
+from .extensions import limiter, cache, db
+# models: the tables create_all and migrations see; search: its FTS tables
+# are created along with them
+from . import compression, metrics, models, search  # noqa: F401
+from .database import configure_engine
+from .commands import register_commands
+from .json_provider import FastJSONProvider
+
+# (module, blueprint, url prefix), imported by register_blueprints
+BLUEPRINTS = (
+    ('app.blueprints.customer', 'customer_bp', '/customers'),
+    ('app.blueprints.mechanic', 'mechanic_bp', '/mechanics'),
+    ('app.blueprints.service_ticket', 'service_ticket_bp', '/service-tickets'),
+    ('app.blueprints.inventory', 'inventory_bp', '/inventory'),
+    ('app.blueprints.report', 'report_bp', '/reports'),
+)
+SWAGGER_URL = '/docs'
+API_URL = '/swagger.json'
+
+_registering = threading.Lock()
+
+
+def register_blueprints(app):
+    """Import the API blueprints (routes, schemas, Swagger UI) and register them.
+
+    Runs once per app; later calls return immediately. With LAZY_BLUEPRINTS
+    this happens when the app context is first pushed (the first request, a
+    CLI command such as ``flask routes``, a ``url_for`` outside a request)
+    instead of in create_app, which keeps marshmallow-sqlalchemy, the
+    schemas and the route modules off the startup path.
+    """
+    if 'blueprints_loaded' in app.extensions:
+        return
+    with _registering:
+        if 'blueprints_loaded' in app.extensions:
+            return
+        from flask_swagger_ui import get_swaggerui_blueprint
+        from .extensions import ma
+
+        ma.init_app(app)
+        # rules take the map's strict_slashes when added; the blueprints
+        # have always been registered before create_app turned it off
+        strict_slashes, app.url_map.strict_slashes = app.url_map.strict_slashes, True
+        try:
+            for module, name, url_prefix in BLUEPRINTS:
+                app.register_blueprint(getattr(importlib.import_module(module), name), url_prefix=url_prefix)
+            app.register_blueprint(get_swaggerui_blueprint(SWAGGER_URL, API_URL))
+        finally:
+            app.url_map.strict_slashes = strict_slashes
+        app.extensions['blueprints_loaded'] = True
+
 
 def create_app(config_name=None):
     app = Flask(__name__)
     app.config.from_object(f'config.{config_name}')
+    app.json = FastJSONProvider(app)
 
     # Initialize extensions here (e.g., db, ma)
     db.init_app(app)
-    ma.init_app(app)
+    configure_engine(app)
     limiter.init_app(app)
     cache.init_app(app)
+    metrics.init_app(app)
+    # registered after metrics so its after_request runs first and the
+    # response size histogram sees the bytes actually sent
+    compression.init_app(app)
+    register_commands(app)
     
     # Register Blueprints and set url prefixes (plural names)
-    app.register_blueprint(customer_bp, url_prefix='/customers')
-    app.register_blueprint(mechanic_bp, url_prefix='/mechanics')
-    app.register_blueprint(service_ticket_bp, url_prefix='/service-tickets')
-    app.register_blueprint(inventory_bp, url_prefix='/inventory')
-    
+    if app.config.get('LAZY_BLUEPRINTS'):
+        # a request pushes the app context before Flask starts refusing new
+        # routes, so the first request can still register them
+        appcontext_pushed.connect(register_blueprints, app)
+    else:
+        register_blueprints(app)
+
     # Disable strict slashes globally
     app.url_map.strict_slashes = False
     
-    # Swagger UI setup
-    SWAGGER_URL = '/docs'
-    API_URL = '/swagger.json'
-    swaggerui_blueprint = get_swaggerui_blueprint(SWAGGER_URL, API_URL)
-    app.register_blueprint(swaggerui_blueprint)
-    
     @app.before_request
     def check_content_type():
         from flask import request, jsonify
@@ -86,8 +134,10 @@ def create_app(config_name=None):
 </html>'''
         return Response(html, mimetype='text/html')
     
-    @app.route('/swagger.json')
+    @app.route(API_URL)
     def swagger_spec():
+        # the spec is a large dict only the docs need; loaded on first request
+        from .swagger_config import swagger_config
         return swagger_config
     
     @app.errorhandler(404)
@@ -95,7 +145,7 @@ def create_app(config_name=None):
         from flask import jsonify
         return jsonify({
             'error': 'Route not found',
-            'available_routes': ['/customers', '/mechanics', '/service-tickets', '/inventory']
+            'available_routes': ['/customers', '/mechanics', '/service-tickets', '/inventory', '/reports']
         }), 404
     
     return app
\ No newline at end of file
@@ -1,10 +1,11 @@
 from . import create_app
 from .extensions import db
+from .migrations import upgrade
 
 def main():
     app = create_app('DevelopmentConfig')
     with app.app_context():
-        db.create_all()
+        upgrade(db.engine)
     app.run()
 
 if __name__ == "__main__":
@@ -1,7 +1,84 @@
 from functools import wraps
+from collections import OrderedDict
 from flask import request, jsonify, current_app
 from jose import jwt, JWTError
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
 import datetime
+import hashlib
+import threading
+import time
+from app.extensions import db
+from app.metrics import registry
+from app.models import RevokedToken
+
+class TokenCache:
+    """Bounded LRU of verified token claims, each kept until the token's exp.
+
+    Keys are SHA-256 digests of the raw token, so a hit means these exact
+    bytes already passed signature verification with this app's secret.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, digest):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, digest, claims, expires_at):
+        with self._lock:
+            self._entries[digest] = (claims, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+def token_cache():
+    """The per-app claims cache (created on first use)."""
+    caches = current_app.extensions.setdefault('token_cache', {})
+    if 'claims' not in caches:
+        caches['claims'] = TokenCache(current_app.config.get('AUTH_TOKEN_CACHE_SIZE', 1024))
+    return caches['claims']
+
+def _digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _expires_at(payload):
+    exp = payload.get('exp')
+    if isinstance(exp, (int, float)):
+        return exp
+    return time.time() + current_app.config.get('AUTH_TOKEN_CACHE_TTL', 300)
 
 def encode_token(customer_id):
     payload = {
@@ -10,21 +87,76 @@ def encode_token(customer_id):
     }
     return jwt.encode(payload, current_app.config.get('SECRET_KEY', 'dev-secret'), algorithm='HS256')
 
+def decode_token(token):
+    """Return the verified claims for ``token``; raises JWTError if invalid.
+
+    Repeat tokens are answered from ``token_cache()`` without re-verifying
+    the signature. With ``AUTH_REVOCATION_CHECK`` on, revoked tokens are
+    rejected even while cached.
+    """
+    digest = _digest(token)
+    if current_app.config.get('AUTH_REVOCATION_CHECK') and is_revoked(digest):
+        registry.inc('auth_token_lookups_total', {'result': 'revoked'})
+        raise JWTError('Token has been revoked')
+
+    claims_cache = token_cache()
+    payload = claims_cache.get(digest)
+    if payload is not None:
+        registry.inc('auth_token_lookups_total', {'result': 'hit'})
+        return payload
+
+    registry.inc('auth_token_lookups_total', {'result': 'miss'})
+    payload = jwt.decode(token, current_app.config.get('SECRET_KEY', 'dev-secret'), algorithms=['HS256'])
+    claims_cache.put(digest, payload, _expires_at(payload))
+    return payload
+
+def is_revoked(digest):
+    return db.session.execute(
+        select(RevokedToken.digest).where(RevokedToken.digest == digest, RevokedToken.expires_at > time.time())
+    ).first() is not None
+
+def revoke_token(token):
+    """Reject ``token`` from now until it would have expired anyway.
+
+    The revocation list is the ``revoked_tokens`` table, so every worker
+    sees it and no cache eviction can bring a token back; it is only
+    consulted when ``AUTH_REVOCATION_CHECK`` is on. Expired rows are
+    purged here.
+    """
+    digest = _digest(token)
+    token_cache().discard(digest)
+    try:
+        claims = jwt.get_unverified_claims(token)
+    except JWTError:
+        return
+    now = time.time()
+    expires_at = _expires_at(claims)
+    db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+    if expires_at > now and db.session.get(RevokedToken, digest) is None:
+        db.session.add(RevokedToken(digest=digest, expires_at=expires_at))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # revoked by a concurrent logout
+
+def bearer_token():
+    token = request.headers.get('Authorization')
+    if token and token.startswith('Bearer '):
+        token = token[7:]
+    return token
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
+        token = bearer_token()
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
-        
-        if token.startswith('Bearer '):
-            token = token[7:]
-        
+
         try:
-            payload = jwt.decode(token, current_app.config.get('SECRET_KEY', 'dev-secret'), algorithms=['HS256'])
+            payload = decode_token(token)
             customer_id = payload['customer_id']
-        except JWTError:
+        except (JWTError, KeyError):
             return jsonify({'error': 'Token is invalid'}), 401
-        
+
         return f(customer_id, *args, **kwargs)
-    return decorated
\ No newline at end of file
+    return decorated
@@ -1,11 +1,17 @@
-from .schemas import customer_schema, customers_schema, login_schema
-from flask import request, jsonify
+from .schemas import customer_schema, customers_schema, customers_bulk_schema, customer_rows, login_schema
+from flask import request, jsonify, current_app
 from marshmallow import ValidationError
 from sqlalchemy import select
-from app.models import Customer, ServiceTicket, db
+from app.models import Customer, ServiceTicket, Service_Mechanic, db
 from . import customer_bp
 from app.extensions import limiter, cache
-from app.auth import encode_token, token_required
+from app.auth import bearer_token, encode_token, revoke_token, token_required
+from app.bulk import BulkPayloadError, bulk_create, bulk_response
+from app.pagination import CursorError, keyset_paginate, page_args
+from app.ranking import reconcile_ticket_counts
+from app.rollups import refresh_days, ticket_days
+from app.search import search, search_limit
+from app.streaming import ndjson_response, wants_ndjson
 
 #Create CUSTOMER (POST)
 #This endpoint creates a new user by deserializing and validating the incoming data.
@@ -56,11 +62,54 @@ def create_customer():
     
     return customer_schema.jsonify(new_customer), 201
 
+#BULK CREATE CUSTOMERS (POST)
+#Validates an array of customers in one pass; duplicate emails are found with a single IN query.
+#POST /customers/bulk Endpoint:
+@customer_bp.route("/bulk", methods=['POST'])
+@limiter.limit("5 per day")
+def bulk_create_customers():
+    """
+    Bulk create customers
+    ---
+    tags:
+      - Customers
+    summary: Create many customers in one request
+    description: Validates the whole array and inserts the valid rows in one transaction. Duplicate emails are rejected per row.
+    parameters:
+      - in: body
+        name: customers
+        required: true
+        schema:
+          type: array
+          items:
+            $ref: '#/definitions/CustomerInput'
+    responses:
+      201:
+        description: All rows created
+        schema:
+          $ref: '#/definitions/BulkResult'
+      207:
+        description: Some rows created; rejected rows are listed in errors by index
+        schema:
+          $ref: '#/definitions/BulkResult'
+      400:
+        description: No rows created
+        schema:
+          $ref: '#/definitions/BulkResult'
+    """
+    try:
+        ids, errors = bulk_create(Customer, customers_bulk_schema, request.get_json(silent=True), unique=('email',))
+    except BulkPayloadError as e:
+        return jsonify({"error": str(e)}), 400
+    body, status = bulk_response(ids, errors)
+    return jsonify(body), status
+
 #RETRIEVE ALL CUSTOMERS (GET)
 #When this request is received a function to retrieve and return all Customers will fire .
 #GET /customers Endpoint:
 @customer_bp.route("/", methods=['GET'])
-@cache.cached(timeout=30)
+@cache.conditional(tables=('customers',))
+@cache.cached(timeout=300, tables=('customers',), unless=wants_ndjson)
 @limiter.limit("3 per hour")
 def get_customers():
     """
@@ -69,19 +118,37 @@ def get_customers():
     tags:
       - Customers
     summary: Retrieve all customers
-    description: Returns paginated list of customers
+    description: >
+      Returns a cursor-paginated list of customers ordered by id. Follow
+      next_cursor with ?cursor= for the next page; page numbers are not
+      supported, and total is only returned with include_total (the
+      pages and current_page fields are gone).
     parameters:
       - in: query
-        name: page
-        type: integer
-        default: 1
+        name: cursor
+        type: string
+        description: Opaque next_cursor / prev_cursor from a previous page
       - in: query
-        name: per_page
+        name: limit
         type: integer
         default: 10
+        description: Page size (per_page is accepted as an alias)
+      - in: query
+        name: include_total
+        type: boolean
+        default: false
+      - in: query
+        name: stream
+        type: boolean
+        default: false
+        description: Stream every row as NDJSON (same as Accept application/x-ndjson)
     responses:
       200:
-        description: List of customers
+        description: Page of customers with next_cursor / prev_cursor
+      400:
+        description: Invalid cursor, or the unsupported page parameter
+        schema:
+          $ref: '#/definitions/Error'
     """
     if request.headers.get('Accept') == 'text/html' or 'text/html' in request.headers.get('Accept', ''):
         from flask import Response
@@ -94,20 +161,58 @@ def get_customers():
 </body></html>'''
         return Response(html, mimetype='text/html')
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
-    customers = db.session.query(Customer).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
-    
-    return jsonify({
-        'customers': customers_schema.dump(customers.items),
-        'total': customers.total,
-        'pages': customers.pages,
-        'current_page': customers.page,
-        'per_page': customers.per_page
-    }), 200
+    if wants_ndjson():
+        return ndjson_response(customer_rows.select().order_by(Customer.id), customer_rows)
+
+    try:
+        page = keyset_paginate(customer_rows.select(), [(Customer.id, False)], **page_args(default_limit=10))
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    body = {
+        'customers': customer_rows.dump_many(page.items),
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'per_page': page.limit
+    }
+    if page.total is not None:
+        body['total'] = page.total
+    return jsonify(body), 200
+
+#SEARCH CUSTOMERS (GET)
+#Type-ahead lookup by name or email, served from the full-text index (see app/search.py).
+#GET /customers/search?q= Endpoint:
+@customer_bp.route("/search", methods=['GET'])
+@cache.cached(timeout=60, tables=('customers',))
+@limiter.limit("120 per minute")
+def search_customers():
+    """
+    Search customers
+    ---
+    tags:
+      - Customers
+    summary: Type-ahead search over customers
+    description: Every word of q must prefix-match a word of the name or email. Results are ranked best match first.
+    parameters:
+      - in: query
+        name: q
+        type: string
+        required: true
+      - in: query
+        name: limit
+        type: integer
+        default: 10
+        description: At most SEARCH_MAX_LIMIT (50) results
+    responses:
+      200:
+        description: Matching customers, best first
+        schema:
+          type: array
+          items:
+            $ref: '#/definitions/Customer'
+    """
+    results = search(Customer, request.args.get('q', ''), limit=search_limit())
+    return jsonify(customers_schema.dump(results)), 200
 
 #RETRIEVE SPECIFIC CUSTOMER (GET)
 #This endpoint includes a path parameter, which is a variable piece of the endpoint that can be used to pass information to the backend without sending a json body.
@@ -215,7 +320,19 @@ def delete_customer(id):
     if not customer:
         return jsonify({"error": "Customer not found."}), 404
 
+    # the customer's tickets go with it, so recount the mechanics who worked them
+    affected = db.session.scalars(
+        select(Service_Mechanic.c.mechanic_id)
+        .join(ServiceTicket, ServiceTicket.id == Service_Mechanic.c.service_ticket_id)
+        .where(ServiceTicket.customer_id == id)
+        .distinct()
+    ).all()
+    days = ticket_days(customer_id=id)
     db.session.delete(customer)
+    db.session.flush()
+    if affected:
+        reconcile_ticket_counts(affected)
+    refresh_days(days)
     db.session.commit()
     return jsonify({"message": f'Customer id: {id}, successfully deleted.'}), 200
 
@@ -260,6 +377,35 @@ def login():
     token = encode_token(customer.id)
     return jsonify({'token': token}), 200
 
+@customer_bp.route('/logout', methods=['POST'])
+@token_required
+def logout(customer_id):
+    """
+    Customer logout
+    ---
+    tags:
+      - Authentication
+    summary: Revoke the current token
+    description: Adds the bearer token to the revocation list until it expires (requires AUTH_REVOCATION_CHECK)
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Token revoked
+      401:
+        description: Unauthorized
+        schema:
+          $ref: '#/definitions/Error'
+      501:
+        description: Token revocation is disabled
+        schema:
+          $ref: '#/definitions/Error'
+    """
+    if not current_app.config.get('AUTH_REVOCATION_CHECK'):
+        return jsonify({'error': 'Token revocation is disabled'}), 501
+    revoke_token(bearer_token())
+    return jsonify({'message': 'Logged out'}), 200
+
 @customer_bp.route('/my-tickets', methods=['GET'])
 @token_required
 def get_my_tickets(customer_id):
@@ -278,13 +424,17 @@ def get_my_tickets(customer_id):
         schema:
           type: array
           items:
-            $ref: '#/definitions/ServiceTicket'
+            $ref: '#/definitions/ServiceTicketDetail'
       401:
         description: Unauthorized
         schema:
           $ref: '#/definitions/Error'
     """
-    from app.blueprints.service_ticket.schemas import service_tickets_schema
-    query = select(ServiceTicket).where(ServiceTicket.customer_id == customer_id)
+    from app.blueprints.service_ticket.schemas import service_tickets_detail_schema, ticket_load_options
+    query = (
+        select(ServiceTicket)
+        .where(ServiceTicket.customer_id == customer_id)
+        .options(*ticket_load_options('detail'))
+    )
     tickets = db.session.execute(query).scalars().all()
-    return service_tickets_schema.jsonify(tickets), 200
\ No newline at end of file
+    return service_tickets_detail_schema.jsonify(tickets), 200
\ No newline at end of file
@@ -1,5 +1,6 @@
 from app.extensions import ma
 from app.models import Customer
+from app.serialization import RowSerializer
 from marshmallow import validates, ValidationError
 
 class CustomerSchema(ma.SQLAlchemyAutoSchema):
@@ -11,10 +12,16 @@ class CustomerSchema(ma.SQLAlchemyAutoSchema):
       email = ma.Email(required=True)
       password = ma.Str(load_only=True)
 
+class CustomerBulkSchema(CustomerSchema):
+      password = ma.Str(load_only=True, required=True)
+
 class LoginSchema(ma.Schema):
     email = ma.Email(required=True)
     password = ma.Str(required=True)
 
 customer_schema = CustomerSchema()
 customers_schema = CustomerSchema(many=True)
-login_schema = LoginSchema()
\ No newline at end of file
+customers_bulk_schema = CustomerBulkSchema(many=True, load_instance=False)
+login_schema = LoginSchema()
+# read-only list routes: Core rows to the same dicts as customer_schema.dump
+customer_rows = RowSerializer(customer_schema)
\ No newline at end of file
@@ -2,9 +2,26 @@ from flask import request, jsonify
 from . import inventory_bp
 from app.models import Inventory
 from app.extensions import db, limiter, cache
-from .schemas import inventory_schema, inventories_schema
+from app.bulk import BulkPayloadError, bulk_create, bulk_response
+from app.filtering import FilterError, filter_clauses, ordering, sort_order
+from app.pagination import CursorError, keyset_paginate, page_args
+from app.rollups import refresh_days, ticket_days
+from app.search import search, search_limit
+from app.streaming import ndjson_response, wants_ndjson
+from .schemas import inventory_schema, inventories_schema, inventories_bulk_schema, inventory_rows
 from marshmallow import ValidationError
 
+# query parameters accepted by GET /inventory (see app/filtering.py)
+INVENTORY_FILTERS = {
+    'name': Inventory.name,
+    'price': Inventory.price,
+}
+INVENTORY_SORTS = {
+    'id': Inventory.id,
+    'name': Inventory.name,
+    'price': Inventory.price,
+}
+
 @inventory_bp.route('/', methods=['POST'])
 @limiter.limit('10/day')
 def create_inventory():
@@ -38,8 +55,48 @@ def create_inventory():
     db.session.commit()
     return inventory_schema.jsonify(item), 201
 
+@inventory_bp.route('/bulk', methods=['POST'])
+@limiter.limit('10/day')
+def bulk_create_inventory():
+    """
+    Bulk create inventory items
+    ---
+    tags:
+      - Inventory
+    summary: Create many inventory items in one request
+    description: Validates the whole array and inserts the valid rows in one transaction.
+    parameters:
+      - in: body
+        name: inventory_items
+        required: true
+        schema:
+          type: array
+          items:
+            $ref: '#/definitions/InventoryInput'
+    responses:
+      201:
+        description: All rows created
+        schema:
+          $ref: '#/definitions/BulkResult'
+      207:
+        description: Some rows created; rejected rows are listed in errors by index
+        schema:
+          $ref: '#/definitions/BulkResult'
+      400:
+        description: No rows created
+        schema:
+          $ref: '#/definitions/BulkResult'
+    """
+    try:
+        ids, errors = bulk_create(Inventory, inventories_bulk_schema, request.get_json(silent=True))
+    except BulkPayloadError as e:
+        return jsonify({"error": str(e)}), 400
+    body, status = bulk_response(ids, errors)
+    return jsonify(body), status
+
 @inventory_bp.route('/', methods=['GET'])
-@cache.cached(timeout=30)
+@cache.conditional(tables=('inventory',))
+@cache.cached(timeout=300, tables=('inventory',), unless=wants_ndjson)
 def get_inventory():
     """
     Get all inventory items
@@ -47,10 +104,35 @@ def get_inventory():
     tags:
       - Inventory
     summary: Retrieve all inventory items
-    description: Returns list of all inventory items
+    description: >
+      Returns a page of inventory items, optionally filtered and sorted (default order is id).
+      Filter with field=value or field[op]=value (op: eq, ne, gt, gte, lt, lte,
+      or in with a comma list) on name, price.
+    parameters:
+      - in: query
+        name: sort
+        type: string
+        description: "Comma-separated id, name, price; prefix - for descending (e.g. -price)"
+      - in: query
+        name: cursor
+        type: string
+        description: Opaque cursor from X-Next-Cursor / X-Prev-Cursor
+      - in: query
+        name: limit
+        type: integer
+        default: 50
+      - in: query
+        name: include_total
+        type: boolean
+        default: false
+      - in: query
+        name: stream
+        type: boolean
+        default: false
+        description: Stream every row as NDJSON (same as Accept application/x-ndjson)
     responses:
       200:
-        description: List of inventory items
+        description: Page of inventory items (cursors in X-Next-Cursor, X-Prev-Cursor and Link headers)
         schema:
           type: array
           items:
@@ -67,11 +149,51 @@ def get_inventory():
 <p><a href="/">← Back to Home</a> | <a href="/docs">API Documentation</a></p>
 </body></html>'''
         return Response(html, mimetype='text/html')
-    items = db.session.query(Inventory).all()
-    return inventories_schema.jsonify(items), 200
+    try:
+        stmt = inventory_rows.select().where(*filter_clauses(INVENTORY_FILTERS))
+        order_by = sort_order(INVENTORY_SORTS, default=[(Inventory.id, False)], tiebreaker=Inventory.id)
+        if wants_ndjson():
+            return ndjson_response(stmt.order_by(*ordering(order_by)), inventory_rows)
+        page = keyset_paginate(stmt, order_by, **page_args())
+    except (CursorError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(inventory_rows.dump_many(page.items)), 200, page.headers
+
+@inventory_bp.route('/search', methods=['GET'])
+@cache.cached(timeout=60, tables=('inventory',))
+@limiter.limit('120 per minute')
+def search_inventory():
+    """
+    Search inventory items
+    ---
+    tags:
+      - Inventory
+    summary: Type-ahead search over inventory items
+    description: Every word of q must prefix-match a word of the part name. Results are ranked best match first.
+    parameters:
+      - in: query
+        name: q
+        type: string
+        required: true
+      - in: query
+        name: limit
+        type: integer
+        default: 10
+        description: At most SEARCH_MAX_LIMIT (50) results
+    responses:
+      200:
+        description: Matching inventory items, best first
+        schema:
+          type: array
+          items:
+            $ref: '#/definitions/Inventory'
+    """
+    results = search(Inventory, request.args.get('q', ''), limit=search_limit())
+    return inventories_schema.jsonify(results), 200
 
 @inventory_bp.route('/<int:id>', methods=['GET'])
-@cache.cached(timeout=60)
+@cache.conditional(tables=('inventory',))
+@cache.cached(timeout=600, tables=('inventory',))
 def get_inventory_item(id):
     """
     Get inventory item by ID
@@ -136,6 +258,9 @@ def update_inventory(id):
         updated_item = inventory_schema.load(request.json, instance=item)
     except ValidationError as e:
         return jsonify(e.messages), 400
+    # links without a price snapshot are priced from the catalogue
+    if db.session.is_modified(item):
+        refresh_days(ticket_days(inventory_id=id))
     db.session.commit()
     return inventory_schema.jsonify(updated_item), 200
 
@@ -165,6 +290,8 @@ def delete_inventory(id):
     item = db.session.get(Inventory, id)
     if not item:
         return jsonify({"error": "Inventory item not found"}), 404
+    days = ticket_days(inventory_id=id)
     db.session.delete(item)
+    refresh_days(days)
     db.session.commit()
     return jsonify({"message": f"Inventory item id: {id}, successfully deleted."}), 200
\ No newline at end of file
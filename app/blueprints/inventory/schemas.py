@@ -1,4 +1,5 @@
 from app.extensions import ma
+from app.serialization import RowSerializer
 from app.models import Inventory
 
 class InventorySchema(ma.SQLAlchemyAutoSchema):
@@ -11,4 +12,7 @@ class InventorySchema(ma.SQLAlchemyAutoSchema):
     price = ma.Float(required=True)
 
 inventory_schema = InventorySchema()
-inventories_schema = InventorySchema(many=True)
\ No newline at end of file
+inventories_schema = InventorySchema(many=True)
+inventories_bulk_schema = InventorySchema(many=True, load_instance=False)
+# read-only list routes: Core rows to the same dicts as inventory_schema.dump
+inventory_rows = RowSerializer(inventory_schema)
\ No newline at end of file
@@ -2,9 +2,30 @@ from flask import request, jsonify
 from app.blueprints.mechanic import mechanic_bp
 from app.extensions import db, limiter, cache
 from app.models import Mechanic
-from .schemas import mechanic_schema, mechanics_schema
+from app.bulk import BulkPayloadError, bulk_create, bulk_response
+from app.filtering import FilterError, filter_clauses, ordering, sort_order
+from app.pagination import CursorError, keyset_paginate, limit_arg, page_args
+from app.rollups import refresh_days, ticket_days
+from app.search import search, search_limit
+from app.streaming import ndjson_response, wants_ndjson
+from .schemas import mechanic_schema, mechanics_schema, mechanics_bulk_schema, mechanic_rows
 from marshmallow import ValidationError
 
+# query parameters accepted by GET /mechanics (see app/filtering.py)
+MECHANIC_FILTERS = {
+    'name': Mechanic.name,
+    'email': Mechanic.email,
+    'specialization': Mechanic.specialization,
+    'experience': Mechanic.experience,
+    'ticket_count': Mechanic.ticket_count,
+}
+MECHANIC_SORTS = {
+    'id': Mechanic.id,
+    'name': Mechanic.name,
+    'experience': Mechanic.experience,
+    'ticket_count': Mechanic.ticket_count,
+}
+
 @mechanic_bp.route('/', methods=['POST'])
 @limiter.limit('10/day')
 def create_mechanic():
@@ -39,8 +60,48 @@ def create_mechanic():
     db.session.commit()
     return mechanic_schema.jsonify(mech), 201
 
+@mechanic_bp.route('/bulk', methods=['POST'])
+@limiter.limit('10/day')
+def bulk_create_mechanics():
+    """
+    Bulk create mechanics
+    ---
+    tags:
+      - Mechanics
+    summary: Create many mechanics in one request
+    description: Validates the whole array and inserts the valid rows in one transaction. Duplicate emails are rejected per row.
+    parameters:
+      - in: body
+        name: mechanics
+        required: true
+        schema:
+          type: array
+          items:
+            $ref: '#/definitions/MechanicInput'
+    responses:
+      201:
+        description: All rows created
+        schema:
+          $ref: '#/definitions/BulkResult'
+      207:
+        description: Some rows created; rejected rows are listed in errors by index
+        schema:
+          $ref: '#/definitions/BulkResult'
+      400:
+        description: No rows created
+        schema:
+          $ref: '#/definitions/BulkResult'
+    """
+    try:
+        ids, errors = bulk_create(Mechanic, mechanics_bulk_schema, request.get_json(silent=True), unique=('email',))
+    except BulkPayloadError as e:
+        return jsonify({"error": str(e)}), 400
+    body, status = bulk_response(ids, errors)
+    return jsonify(body), status
+
 @mechanic_bp.route('/', methods=['GET'])
-@cache.cached(timeout=30)
+@cache.conditional(tables=('mechanics',))
+@cache.cached(timeout=300, tables=('mechanics',), unless=wants_ndjson)
 def get_mechanics():
     """
     Get all mechanics
@@ -48,10 +109,35 @@ def get_mechanics():
     tags:
       - Mechanics
     summary: Retrieve all mechanics
-    description: Returns list of all mechanics
+    description: >
+      Returns a page of mechanics, optionally filtered and sorted (default order is id).
+      Filter with field=value or field[op]=value (op: eq, ne, gt, gte, lt, lte,
+      or in with a comma list) on name, email, specialization, experience, ticket_count.
+    parameters:
+      - in: query
+        name: sort
+        type: string
+        description: "Comma-separated id, name, experience, ticket_count; prefix - for descending (e.g. -experience,name)"
+      - in: query
+        name: cursor
+        type: string
+        description: Opaque cursor from X-Next-Cursor / X-Prev-Cursor
+      - in: query
+        name: limit
+        type: integer
+        default: 50
+      - in: query
+        name: include_total
+        type: boolean
+        default: false
+      - in: query
+        name: stream
+        type: boolean
+        default: false
+        description: Stream every row as NDJSON (same as Accept application/x-ndjson)
     responses:
       200:
-        description: List of mechanics
+        description: Page of mechanics (cursors in X-Next-Cursor, X-Prev-Cursor and Link headers)
         schema:
           type: array
           items:
@@ -68,11 +154,51 @@ def get_mechanics():
 <p><a href="/">← Back to Home</a> | <a href="/docs">API Documentation</a></p>
 </body></html>'''
         return Response(html, mimetype='text/html')
-    mechs = db.session.query(Mechanic).all()
-    return mechanics_schema.jsonify(mechs), 200
+    try:
+        stmt = mechanic_rows.select().where(*filter_clauses(MECHANIC_FILTERS))
+        order_by = sort_order(MECHANIC_SORTS, default=[(Mechanic.id, False)], tiebreaker=Mechanic.id)
+        if wants_ndjson():
+            return ndjson_response(stmt.order_by(*ordering(order_by)), mechanic_rows)
+        page = keyset_paginate(stmt, order_by, **page_args())
+    except (CursorError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(mechanic_rows.dump_many(page.items)), 200, page.headers
+
+@mechanic_bp.route('/search', methods=['GET'])
+@cache.cached(timeout=60, tables=('mechanics',))
+@limiter.limit('120 per minute')
+def search_mechanics():
+    """
+    Search mechanics
+    ---
+    tags:
+      - Mechanics
+    summary: Type-ahead search over mechanics
+    description: Every word of q must prefix-match a word of the name or specialization. Results are ranked best match first.
+    parameters:
+      - in: query
+        name: q
+        type: string
+        required: true
+      - in: query
+        name: limit
+        type: integer
+        default: 10
+        description: At most SEARCH_MAX_LIMIT (50) results
+    responses:
+      200:
+        description: Matching mechanics, best first
+        schema:
+          type: array
+          items:
+            $ref: '#/definitions/Mechanic'
+    """
+    results = search(Mechanic, request.args.get('q', ''), limit=search_limit())
+    return mechanics_schema.jsonify(results), 200
 
 @mechanic_bp.route('/<int:id>', methods=['GET'])
-@cache.cached(timeout=60)
+@cache.conditional(tables=('mechanics',))
+@cache.cached(timeout=600, tables=('mechanics',))
 def get_mechanic(id):
     """
     Get mechanic by ID
@@ -166,12 +292,16 @@ def delete_mechanic(id):
     mech = db.session.get(Mechanic, id)
     if not mech:
         return jsonify({"error": "Mechanic not found"}), 404
+    # deleting the mechanic unlinks it from its tickets
+    days = ticket_days(mechanic_id=id)
     db.session.delete(mech)
+    refresh_days(days)
     db.session.commit()
     return jsonify({"message": f"Mechanic id: {id}, successfully deleted."}), 200
 
 @mechanic_bp.route('/ranking', methods=['GET'])
-@cache.cached(timeout=60)
+@cache.conditional(tables=('mechanics', 'service_mechanic'))
+@cache.cached(timeout=600, tables=('mechanics', 'service_mechanic'))
 def get_mechanics_by_tickets():
     """
     Get mechanics ranked by ticket count
@@ -180,43 +310,30 @@ def get_mechanics_by_tickets():
       - Mechanics
     summary: Get mechanics ranking
     description: Returns mechanics ordered by number of tickets worked on
+    parameters:
+      - in: query
+        name: limit
+        type: integer
+        description: Only return the top N mechanics
     responses:
       200:
         description: Ranked list of mechanics
         schema:
           type: array
           items:
-            type: object
-            properties:
-              id:
-                type: integer
-              name:
-                type: string
-              email:
-                type: string
-              specialization:
-                type: string
-              experience:
-                type: integer
-              ticket_count:
-                type: integer
-    """
-    from sqlalchemy import func
-    from app.models import Service_Mechanic
-    
-    # Query mechanics ordered by ticket count
-    mechanics_with_counts = db.session.query(
-        Mechanic,
-        func.count(Service_Mechanic.c.service_ticket_id).label('ticket_count')
-    ).outerjoin(Service_Mechanic).group_by(Mechanic.id).order_by(
-        func.count(Service_Mechanic.c.service_ticket_id).desc()
-    ).all()
-    
-    result = []
-    for mech, count in mechanics_with_counts:
-        mech_data = mechanic_schema.dump(mech)
-        mech_data['ticket_count'] = count
-        result.append(mech_data)
-    
-    return jsonify(result), 200
-
+            $ref: '#/definitions/Mechanic'
+      400:
+        description: limit is not a positive integer
+        schema:
+          $ref: '#/definitions/Error'
+    """
+    try:
+        limit = limit_arg('limit')
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    # ticket_count is maintained on write (app.ranking), so this is an
+    # index scan on ix_mechanics_ranking rather than a GROUP BY over history
+    query = mechanic_rows.select().order_by(Mechanic.ticket_count.desc(), Mechanic.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return jsonify(mechanic_rows.dump_many(db.session.execute(query))), 200
@@ -1,4 +1,5 @@
 from app.extensions import ma
+from app.serialization import RowSerializer
 from app.models import Mechanic
 
 class MechanicSchema(ma.SQLAlchemyAutoSchema):
@@ -11,6 +12,10 @@ class MechanicSchema(ma.SQLAlchemyAutoSchema):
     specialization = ma.Str(required=True)
     name = ma.Str(required=True)
     experience = ma.Int(required=True)
+    ticket_count = ma.Int(dump_only=True)
 
 mechanic_schema = MechanicSchema()
-mechanics_schema = MechanicSchema(many=True)
\ No newline at end of file
+mechanics_schema = MechanicSchema(many=True)
+mechanics_bulk_schema = MechanicSchema(many=True, load_instance=False)
+# read-only list routes: Core rows to the same dicts as mechanic_schema.dump
+mechanic_rows = RowSerializer(mechanic_schema)
\ No newline at end of file
@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+report_bp = Blueprint('report_bp', __name__)
+
+# import routes so decorators attach to blueprint
+from . import routes  # noqa: F401,E402
@@ -0,0 +1,203 @@
+from datetime import date, timedelta
+from flask import request, jsonify
+from sqlalchemy import Date, cast, func, select
+from . import report_bp
+from app.extensions import db, cache
+from app.models import DailyMechanicWorkload, DailyPartUsage, DailyRevenue
+from app.rollups import ROLLUP_TABLES
+
+BUCKETS = ('day', 'week', 'month')
+
+# Reports read only the rollup tables (see app/rollups.py), so a range costs
+# one index range scan over at most one row per day and key, never a scan of
+# the ticket history.
+
+class ReportArgsError(ValueError):
+    pass
+
+def _report_args(default_bucket='day'):
+    """``start``, ``end`` (inclusive, default the last 30 days) and ``bucket``."""
+    try:
+        end = date.fromisoformat(request.args['end']) if 'end' in request.args else date.today()
+        start = date.fromisoformat(request.args['start']) if 'start' in request.args else end - timedelta(days=29)
+    except ValueError:
+        raise ReportArgsError('start and end must be dates (YYYY-MM-DD)')
+    if start > end:
+        raise ReportArgsError('start must not be after end')
+    bucket = request.args.get('bucket', default_bucket)
+    if bucket not in BUCKETS:
+        raise ReportArgsError(f"bucket must be one of {', '.join(BUCKETS)}")
+    return start, end, bucket
+
+def _period(column, bucket):
+    """SQL expression for the first day of the bucket containing ``column``."""
+    if bucket == 'day':
+        return column
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        if bucket == 'week':
+            # back to Monday: %w is 0 for Sunday
+            return func.date(column, func.printf('-%d days', (func.strftime('%w', column) + 6) % 7))
+        return func.strftime('%Y-%m-01', column)
+    if dialect == 'mysql':
+        if bucket == 'week':
+            return func.subdate(column, func.weekday(column))
+        return func.date_format(column, '%Y-%m-01')
+    return cast(func.date_trunc(bucket, column), Date)
+
+def _iso(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+def _report(model, keys, measures, start, end, bucket, where=()):
+    period = _period(model.day, bucket).label('period')
+    group = [period] + [getattr(model, key) for key in keys]
+    stmt = (
+        select(*group, *(func.sum(getattr(model, m)).label(m) for m in measures))
+        .where(model.day >= start, model.day <= end, *where)
+        .group_by(*group)
+        .order_by(*group)
+    )
+    rows = []
+    for row in db.session.execute(stmt):
+        entry = {'period': _iso(row.period)}
+        entry.update({key: getattr(row, key) for key in keys})
+        entry.update({m: round(getattr(row, m), 2) if m == 'revenue' else getattr(row, m) for m in measures})
+        rows.append(entry)
+    return {'start': start.isoformat(), 'end': end.isoformat(), 'bucket': bucket, 'rows': rows}
+
+@report_bp.route('/revenue', methods=['GET'])
+@cache.conditional(tables=ROLLUP_TABLES)
+@cache.cached(timeout=600, tables=ROLLUP_TABLES)
+def revenue_report():
+    """
+    Revenue per period
+    ---
+    tags:
+      - Reports
+    summary: Tickets, parts sold and revenue per day, week or month
+    parameters:
+      - in: query
+        name: start
+        type: string
+        format: date
+        description: First day (default 29 days before end)
+      - in: query
+        name: end
+        type: string
+        format: date
+        description: Last day, inclusive (default today)
+      - in: query
+        name: bucket
+        type: string
+        enum: [day, week, month]
+        default: day
+    responses:
+      200:
+        description: One row per period that had tickets
+        schema:
+          $ref: '#/definitions/Report'
+      400:
+        description: Invalid range or bucket
+        schema:
+          $ref: '#/definitions/Error'
+    """
+    try:
+        start, end, bucket = _report_args()
+    except ReportArgsError as e:
+        return jsonify({"error": str(e)}), 400
+    body = _report(DailyRevenue, (), ('ticket_count', 'part_count', 'revenue'), start, end, bucket)
+    return jsonify(body), 200
+
+@report_bp.route('/mechanic-workload', methods=['GET'])
+@cache.conditional(tables=ROLLUP_TABLES)
+@cache.cached(timeout=600, tables=ROLLUP_TABLES)
+def mechanic_workload_report():
+    """
+    Tickets per mechanic per period
+    ---
+    tags:
+      - Reports
+    summary: Tickets each mechanic worked per day, week or month
+    parameters:
+      - in: query
+        name: start
+        type: string
+        format: date
+      - in: query
+        name: end
+        type: string
+        format: date
+      - in: query
+        name: bucket
+        type: string
+        enum: [day, week, month]
+        default: week
+      - in: query
+        name: mechanic_id
+        type: integer
+        description: Only this mechanic
+    responses:
+      200:
+        description: One row per period and mechanic
+        schema:
+          $ref: '#/definitions/Report'
+      400:
+        description: Invalid range or bucket
+        schema:
+          $ref: '#/definitions/Error'
+    """
+    try:
+        start, end, bucket = _report_args(default_bucket='week')
+    except ReportArgsError as e:
+        return jsonify({"error": str(e)}), 400
+    mechanic_id = request.args.get('mechanic_id', type=int)
+    where = [DailyMechanicWorkload.mechanic_id == mechanic_id] if mechanic_id else []
+    body = _report(DailyMechanicWorkload, ('mechanic_id',), ('ticket_count',), start, end, bucket, where)
+    return jsonify(body), 200
+
+@report_bp.route('/parts-usage', methods=['GET'])
+@cache.conditional(tables=ROLLUP_TABLES)
+@cache.cached(timeout=600, tables=ROLLUP_TABLES)
+def parts_usage_report():
+    """
+    Parts used per period
+    ---
+    tags:
+      - Reports
+    summary: Quantity and revenue of each part per day, week or month
+    parameters:
+      - in: query
+        name: start
+        type: string
+        format: date
+      - in: query
+        name: end
+        type: string
+        format: date
+      - in: query
+        name: bucket
+        type: string
+        enum: [day, week, month]
+        default: day
+      - in: query
+        name: inventory_id
+        type: integer
+        description: Only this part
+    responses:
+      200:
+        description: One row per period and part
+        schema:
+          $ref: '#/definitions/Report'
+      400:
+        description: Invalid range or bucket
+        schema:
+          $ref: '#/definitions/Error'
+    """
+    try:
+        start, end, bucket = _report_args()
+    except ReportArgsError as e:
+        return jsonify({"error": str(e)}), 400
+    inventory_id = request.args.get('inventory_id', type=int)
+    where = [DailyPartUsage.inventory_id == inventory_id] if inventory_id else []
+    body = _report(DailyPartUsage, ('inventory_id',), ('quantity', 'revenue'), start, end, bucket, where)
+    return jsonify(body), 200
@@ -1,10 +1,37 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
+from sqlalchemy import delete, insert, select, update
 from . import service_ticket_bp
-from app.models import ServiceTicket, Mechanic, Inventory
+from app.models import ServiceTicket, Mechanic, Inventory, Service_Mechanic, Service_Inventory
 from app.extensions import db, limiter, cache
-from .schemas import service_ticket_schema, service_tickets_schema
+from app.filtering import FilterError, filter_clauses, ordering, sort_order
+from app.invoices import INVOICE_TABLES, invoice, ticket_totals
+from app.pagination import CursorError, keyset_paginate, page_args
+from app.ranking import adjust_ticket_counts
+from app.rollups import refresh_days
+from app.streaming import ndjson_response, wants_ndjson
+from .schemas import (
+    service_ticket_schema,
+    service_ticket_detail_schema,
+    service_ticket_rows,
+    service_tickets_detail_schema,
+    ticket_load_options,
+)
 from marshmallow import ValidationError
 
+# Tables a ticket listing reads (expanded tickets embed mechanics and parts)
+TICKET_TABLES = ('service_tickets', 'service_mechanic', 'service_inventory', 'mechanics', 'inventory')
+
+# query parameters accepted by GET /service-tickets (see app/filtering.py)
+TICKET_FILTERS = {
+    'customer_id': ServiceTicket.customer_id,
+    'service_date': ServiceTicket.service_date,
+}
+TICKET_SORTS = {
+    'id': ServiceTicket.id,
+    'service_date': ServiceTicket.service_date,
+}
+TICKET_DEFAULT_SORT = [(ServiceTicket.service_date, False), (ServiceTicket.id, False)]
+
 @service_ticket_bp.route('/', methods=['POST'])
 @limiter.limit('20/day')
 def create_ticket():
@@ -42,11 +69,13 @@ def create_ticket():
         return jsonify({"error": f"Customer with id {ticket.customer_id} not found"}), 400
     
     db.session.add(ticket)
+    refresh_days([ticket.service_date])
     db.session.commit()
     return service_ticket_schema.jsonify(ticket), 201
 
 @service_ticket_bp.route('/', methods=['GET'])
-@cache.cached(timeout=30)
+@cache.conditional(tables=TICKET_TABLES)
+@cache.cached(timeout=300, tables=TICKET_TABLES, unless=wants_ndjson)
 def get_tickets():
     """
     Get all service tickets
@@ -54,10 +83,40 @@ def get_tickets():
     tags:
       - Service Tickets
     summary: Retrieve all service tickets
-    description: Returns list of all service tickets
+    description: >
+      Returns a page of service tickets, optionally filtered and sorted (default order is service date, then id).
+      Filter with field=value or field[op]=value (op: eq, ne, gt, gte, lt, lte,
+      or in with a comma list) on customer_id, service_date (YYYY-MM-DD).
+    parameters:
+      - in: query
+        name: sort
+        type: string
+        description: "Comma-separated id, service_date; prefix - for descending (e.g. -service_date)"
+      - in: query
+        name: cursor
+        type: string
+        description: Opaque cursor from X-Next-Cursor / X-Prev-Cursor
+      - in: query
+        name: limit
+        type: integer
+        default: 50
+      - in: query
+        name: include_total
+        type: boolean
+        default: false
+      - in: query
+        name: stream
+        type: boolean
+        default: false
+        description: Stream every row as NDJSON (same as Accept application/x-ndjson)
+      - in: query
+        name: expand
+        type: boolean
+        default: false
+        description: Include mechanic and part summaries on each ticket
     responses:
       200:
-        description: List of service tickets
+        description: Page of service tickets (cursors in X-Next-Cursor, X-Prev-Cursor and Link headers)
         schema:
           type: array
           items:
@@ -74,8 +133,25 @@ def get_tickets():
 <p><a href="/">← Back to Home</a> | <a href="/docs">API Documentation</a></p>
 </body></html>'''
         return Response(html, mimetype='text/html')
-    tickets = db.session.query(ServiceTicket).all()
-    return service_tickets_schema.jsonify(tickets), 200
+    # expanded tickets need their relationships, so only they load ORM objects
+    expand = request.args.get('expand', '').lower() in ('1', 'true', 'yes')
+
+    try:
+        where = filter_clauses(TICKET_FILTERS)
+        order_by = sort_order(TICKET_SORTS, default=TICKET_DEFAULT_SORT, tiebreaker=ServiceTicket.id)
+        if wants_ndjson():
+            stmt = service_ticket_rows.select().where(*where).order_by(*ordering(order_by))
+            return ndjson_response(stmt, service_ticket_rows)
+        if expand:
+            stmt = select(ServiceTicket).where(*where).options(*ticket_load_options('detail'))
+        else:
+            stmt = service_ticket_rows.select().where(*where)
+        page = keyset_paginate(stmt, order_by, **page_args())
+    except (CursorError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+    if expand:
+        return service_tickets_detail_schema.jsonify(page.items), 200, page.headers
+    return jsonify(service_ticket_rows.dump_many(page.items)), 200, page.headers
 
 @service_ticket_bp.route('/<int:ticket_id>/assign-mechanic/<int:mechanic_id>', methods=['PUT'])
 def assign_mechanic(ticket_id, mechanic_id):
@@ -99,13 +175,13 @@ def assign_mechanic(ticket_id, mechanic_id):
       200:
         description: Mechanic assigned
         schema:
-          $ref: '#/definitions/ServiceTicket'
+          $ref: '#/definitions/ServiceTicketDetail'
       404:
         description: Ticket or mechanic not found
         schema:
           $ref: '#/definitions/Error'
     """
-    ticket = db.session.get(ServiceTicket, ticket_id)
+    ticket = db.session.get(ServiceTicket, ticket_id, options=ticket_load_options('detail'))
     if not ticket:
         return jsonify({"error": "Ticket not found"}), 404
     mech = db.session.get(Mechanic, mechanic_id)
@@ -113,8 +189,10 @@ def assign_mechanic(ticket_id, mechanic_id):
         return jsonify({"error": "Mechanic not found"}), 404
     if mech not in ticket.mechanics:
         ticket.mechanics.append(mech)
+        adjust_ticket_counts(added=[mech.id])
+        refresh_days([ticket.service_date])
         db.session.commit()
-    return service_ticket_schema.jsonify(ticket), 200
+    return service_ticket_detail_schema.jsonify(ticket), 200
 
 @service_ticket_bp.route('/<int:ticket_id>/remove-mechanic/<int:mechanic_id>', methods=['PUT'])
 def remove_mechanic(ticket_id, mechanic_id):
@@ -138,13 +216,13 @@ def remove_mechanic(ticket_id, mechanic_id):
       200:
         description: Mechanic removed
         schema:
-          $ref: '#/definitions/ServiceTicket'
+          $ref: '#/definitions/ServiceTicketDetail'
       404:
         description: Ticket or mechanic not found
         schema:
           $ref: '#/definitions/Error'
     """
-    ticket = db.session.get(ServiceTicket, ticket_id)
+    ticket = db.session.get(ServiceTicket, ticket_id, options=ticket_load_options('detail'))
     if not ticket:
         return jsonify({"error": "Ticket not found"}), 404
     mech = db.session.get(Mechanic, mechanic_id)
@@ -152,8 +230,10 @@ def remove_mechanic(ticket_id, mechanic_id):
         return jsonify({"error": "Mechanic not found"}), 404
     if mech in ticket.mechanics:
         ticket.mechanics.remove(mech)
+        adjust_ticket_counts(removed=[mech.id])
+        refresh_days([ticket.service_date])
         db.session.commit()
-    return service_ticket_schema.jsonify(ticket), 200
+    return service_ticket_detail_schema.jsonify(ticket), 200
 
 @service_ticket_bp.route('/<int:ticket_id>/edit', methods=['PUT'])
 def edit_ticket_mechanics(ticket_id):
@@ -162,15 +242,18 @@ def edit_ticket_mechanics(ticket_id):
     ---
     tags:
       - Service Tickets
-    summary: Add/remove multiple mechanics from ticket
-    description: Bulk add or remove mechanics from service ticket
+    summary: Add/remove multiple mechanics and parts on a ticket
+    description: >
+      Bulk add or remove mechanics and inventory parts on a service ticket.
+      An id listed in both add and remove ends up attached. Ids that do not
+      exist are skipped and reported back.
     parameters:
       - in: path
         name: ticket_id
         type: integer
         required: true
       - in: body
-        name: mechanics
+        name: links
         schema:
           type: object
           properties:
@@ -182,11 +265,23 @@ def edit_ticket_mechanics(ticket_id):
               type: array
               items:
                 type: integer
+            add_part_ids:
+              type: array
+              items:
+                type: integer
+            remove_part_ids:
+              type: array
+              items:
+                type: integer
     responses:
       200:
-        description: Ticket updated
+        description: Ticket updated, plus unknown_mechanic_ids and unknown_part_ids
         schema:
-          $ref: '#/definitions/ServiceTicket'
+          $ref: '#/definitions/ServiceTicketDetail'
+      400:
+        description: Ids are not lists of integers
+        schema:
+          $ref: '#/definitions/Error'
       404:
         description: Ticket not found
         schema:
@@ -195,23 +290,62 @@ def edit_ticket_mechanics(ticket_id):
     ticket = db.session.get(ServiceTicket, ticket_id)
     if not ticket:
         return jsonify({"error": "Ticket not found"}), 404
-    
-    data = request.get_json() or {}
-    remove_ids = data.get('remove_ids', [])
-    add_ids = data.get('add_ids', [])
-    
-    for mid in remove_ids:
-        mech = db.session.get(Mechanic, mid)
-        if mech and mech in ticket.mechanics:
-            ticket.mechanics.remove(mech)
-    
-    for mid in add_ids:
-        mech = db.session.get(Mechanic, mid)
-        if mech and mech not in ticket.mechanics:
-            ticket.mechanics.append(mech)
-    
+
+    data = request.get_json(silent=True) or {}
+    fields = ('add_ids', 'remove_ids', 'add_part_ids', 'remove_part_ids')
+    ids = {field: data.get(field) or [] for field in fields}
+    for field, values in ids.items():
+        if not isinstance(values, list) or not all(type(v) is int for v in values):
+            return jsonify({"error": f"{field} must be a list of integers"}), 400
+
+    unknown_mechanics, added, removed = _edit_links(Service_Mechanic.c.mechanic_id, Mechanic, ticket_id,
+                                                    ids['add_ids'], ids['remove_ids'])
+    adjust_ticket_counts(added=added, removed=removed)
+    unknown_parts, _, _ = _edit_links(Service_Inventory.c.inventory_id, Inventory, ticket_id,
+                                      ids['add_part_ids'], ids['remove_part_ids'],
+                                      snapshot={'unit_price': Inventory.price})
+    refresh_days([ticket.service_date])
     db.session.commit()
-    return service_ticket_schema.jsonify(ticket), 200
+
+    body = service_ticket_detail_schema.dump(ticket)
+    body['unknown_mechanic_ids'] = unknown_mechanics
+    body['unknown_part_ids'] = unknown_parts
+    return jsonify(body), 200
+
+def _edit_links(link_column, model, ticket_id, add_ids, remove_ids, snapshot=None):
+    """Apply an add/remove diff to one ticket association table.
+
+    One SELECT validates every id, one SELECT finds the links that already
+    exist, then a single executemany INSERT and a single DELETE apply the
+    change. ``snapshot`` maps link columns to model columns copied onto new
+    links (a part's current price). Returns ``(unknown_ids, added_ids,
+    removed_ids)``.
+    """
+    requested = set(add_ids) | set(remove_ids)
+    if not requested:
+        return [], [], []
+    snapshot = snapshot or {}
+    rows = db.session.execute(select(model.id, *snapshot.values()).where(model.id.in_(requested)))
+    known = {row[0]: dict(zip(snapshot, row[1:])) for row in rows}
+    known_ids = set(known)
+
+    table = link_column.table
+    to_add = set(add_ids) & known_ids
+    to_remove = (set(remove_ids) & known_ids) - to_add
+    linked = set(db.session.scalars(
+        select(link_column).where(table.c.service_ticket_id == ticket_id, link_column.in_(to_add | to_remove))
+    )) if known else set()
+    added = sorted(to_add - linked)
+    removed = sorted(to_remove & linked)
+    if added:
+        db.session.execute(
+            insert(table), [{'service_ticket_id': ticket_id, link_column.key: i, **known[i]} for i in added]
+        )
+    if removed:
+        db.session.execute(
+            delete(table).where(table.c.service_ticket_id == ticket_id, link_column.in_(removed))
+        )
+    return sorted(requested - known_ids), added, removed
 
 @service_ticket_bp.route('/<int:ticket_id>/add-part/<int:inventory_id>', methods=['PUT'])
 def add_part_to_ticket(ticket_id, inventory_id):
@@ -221,7 +355,9 @@ def add_part_to_ticket(ticket_id, inventory_id):
     tags:
       - Service Tickets
     summary: Add inventory part to service ticket
-    description: Associates an inventory item with a service ticket
+    description: >
+      Associates an inventory item with a service ticket at its current price.
+      Adding a part that is already on the ticket increases its quantity.
     parameters:
       - in: path
         name: ticket_id
@@ -231,26 +367,119 @@ def add_part_to_ticket(ticket_id, inventory_id):
         name: inventory_id
         type: integer
         required: true
+      - in: query
+        name: quantity
+        type: integer
+        default: 1
     responses:
       200:
         description: Part added to ticket
         schema:
-          $ref: '#/definitions/ServiceTicket'
+          $ref: '#/definitions/ServiceTicketDetail'
+      400:
+        description: Quantity is not a positive integer
+        schema:
+          $ref: '#/definitions/Error'
       404:
         description: Ticket or inventory item not found
         schema:
           $ref: '#/definitions/Error'
     """
-    ticket = db.session.get(ServiceTicket, ticket_id)
+    ticket = db.session.get(ServiceTicket, ticket_id, options=ticket_load_options('detail'))
     if not ticket:
         return jsonify({"error": "Ticket not found"}), 404
     
     part = db.session.get(Inventory, inventory_id)
     if not part:
         return jsonify({"error": "Inventory item not found"}), 404
-    
-    if part not in ticket.inventory:
-        ticket.inventory.append(part)
-        db.session.commit()
-    
-    return service_ticket_schema.jsonify(ticket), 200
\ No newline at end of file
+
+    try:
+        quantity = int(request.args.get('quantity', 1))
+    except ValueError:
+        quantity = 0
+    if quantity < 1:
+        return jsonify({"error": "quantity must be a positive integer"}), 400
+
+    link = (Service_Inventory.c.service_ticket_id == ticket_id) & (Service_Inventory.c.inventory_id == inventory_id)
+    if part in ticket.inventory:
+        db.session.execute(update(Service_Inventory).where(link).values(quantity=Service_Inventory.c.quantity + quantity))
+    else:
+        db.session.execute(insert(Service_Inventory).values(
+            service_ticket_id=ticket_id, inventory_id=inventory_id, quantity=quantity, unit_price=part.price
+        ))
+        db.session.expire(ticket, ['inventory'])
+    refresh_days([ticket.service_date])
+    db.session.commit()
+
+    return service_ticket_detail_schema.jsonify(ticket), 200
+
+@service_ticket_bp.route('/<int:ticket_id>/invoice', methods=['GET'])
+@cache.conditional(tables=INVOICE_TABLES)
+@cache.cached(timeout=600, tables=INVOICE_TABLES)
+def get_ticket_invoice(ticket_id):
+    """
+    Get ticket invoice
+    ---
+    tags:
+      - Service Tickets
+    summary: Parts, line totals and grand total of a service ticket
+    description: Computed by one aggregate query; cached until the ticket's parts change
+    parameters:
+      - in: path
+        name: ticket_id
+        type: integer
+        required: true
+    responses:
+      200:
+        description: Invoice
+        schema:
+          $ref: '#/definitions/Invoice'
+      404:
+        description: Ticket not found
+        schema:
+          $ref: '#/definitions/Error'
+    """
+    body = invoice(ticket_id)
+    if body is None:
+        return jsonify({"error": "Ticket not found"}), 404
+    return jsonify(body), 200
+
+@service_ticket_bp.route('/totals', methods=['GET'])
+@cache.conditional(tables=INVOICE_TABLES)
+@cache.cached(timeout=600, tables=INVOICE_TABLES)
+def get_ticket_totals():
+    """
+    Get totals for many tickets
+    ---
+    tags:
+      - Service Tickets
+    summary: Grand totals for a batch of service tickets
+    description: One GROUP BY query for the whole batch
+    parameters:
+      - in: query
+        name: ids
+        type: string
+        required: true
+        description: Comma-separated ticket ids (at most PAGINATION_MAX_LIMIT)
+    responses:
+      200:
+        description: Totals per ticket plus the ids that do not exist
+        schema:
+          $ref: '#/definitions/TicketTotals'
+      400:
+        description: Missing or malformed ids
+        schema:
+          $ref: '#/definitions/Error'
+    """
+    try:
+        ids = sorted({int(part) for part in request.args.get('ids', '').split(',') if part.strip()})
+    except ValueError:
+        return jsonify({"error": "ids must be a comma-separated list of integers"}), 400
+    if not ids:
+        return jsonify({"error": "ids is required"}), 400
+    max_ids = current_app.config.get('PAGINATION_MAX_LIMIT', 500)
+    if len(ids) > max_ids:
+        return jsonify({"error": f"At most {max_ids} ids per request"}), 400
+
+    totals, missing = ticket_totals(ids)
+    return jsonify({'totals': totals, 'missing_ids': missing}), 200
\ No newline at end of file
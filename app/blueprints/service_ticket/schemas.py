@@ -1,5 +1,7 @@
+from sqlalchemy.orm import selectinload
 from app.extensions import ma
 from app.models import ServiceTicket
+from app.serialization import RowSerializer
 
 class ServiceTicketSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
@@ -7,5 +9,36 @@ class ServiceTicketSchema(ma.SQLAlchemyAutoSchema):
         load_instance = True
         include_fk = True
 
+class MechanicSummarySchema(ma.Schema):
+    id = ma.Int()
+    name = ma.Str()
+
+class PartSummarySchema(ma.Schema):
+    id = ma.Int()
+    name = ma.Str()
+    price = ma.Float()
+
+class ServiceTicketDetailSchema(ServiceTicketSchema):
+    mechanics = ma.Nested(MechanicSummarySchema, many=True, dump_only=True)
+    inventory = ma.Nested(PartSummarySchema, many=True, dump_only=True)
+
+# Loader options per endpoint. Anything dumped with the detail schema must be
+# loaded with the detail profile, otherwise every ticket lazy-loads its
+# mechanics and parts with one extra SELECT each.
+TICKET_LOAD_PROFILES = {
+    'summary': (),
+    'detail': (
+        selectinload(ServiceTicket.mechanics),
+        selectinload(ServiceTicket.inventory),
+    ),
+}
+
+def ticket_load_options(profile):
+    return TICKET_LOAD_PROFILES[profile]
+
 service_ticket_schema = ServiceTicketSchema()
-service_tickets_schema = ServiceTicketSchema(many=True)
\ No newline at end of file
+service_tickets_schema = ServiceTicketSchema(many=True)
+service_ticket_detail_schema = ServiceTicketDetailSchema()
+service_tickets_detail_schema = ServiceTicketDetailSchema(many=True)
+# read-only list routes: Core rows to the same dicts as service_ticket_schema.dump
+service_ticket_rows = RowSerializer(service_ticket_schema)
@@ -0,0 +1,107 @@
+"""Bulk create support for the ``POST /<resource>/bulk`` routes.
+
+A whole array is validated in one ``schema.load(many=True)`` call, unique
+columns are checked against the database with a single ``IN`` query per
+column, and the surviving rows go in as one executemany INSERT inside one
+transaction (one INSERT per row on backends without executemany RETURNING,
+i.e. MySQL). Rows that fail are reported by their index in the request.
+
+The uniqueness check and the INSERT are not atomic: a concurrent request
+may take a value in between. The INSERT then fails as a whole, and the
+batch is rolled back and checked again, so the colliding rows are reported
+like any other duplicate.
+"""
+from flask import current_app
+from marshmallow import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+
+
+# the check and INSERT are retried when a concurrent request wins a race
+INSERT_ATTEMPTS = 3
+
+
+class BulkPayloadError(ValueError):
+    """Raised when the request body is not a usable array of rows."""
+
+
+def bulk_create(model, schema, payload, unique=()):
+    """Insert the valid rows of ``payload`` and return ``(ids, errors)``.
+
+    ``schema`` must be a ``many=True`` schema built with
+    ``load_instance=False``. ``unique`` names columns that may not repeat
+    within the batch or collide with an existing row. ``errors`` maps the
+    index of each rejected row (as a string) to its validation messages.
+    """
+    if not isinstance(payload, list) or not payload:
+        raise BulkPayloadError('Expected a non-empty JSON array.')
+    max_rows = current_app.config.get('BULK_MAX_ROWS', 1000)
+    if len(payload) > max_rows:
+        raise BulkPayloadError(f'At most {max_rows} rows per request.')
+
+    try:
+        rows = schema.load(payload)
+        errors = {}
+    except ValidationError as e:
+        rows, errors = e.valid_data, dict(e.messages)
+    candidates = [(i, row) for i, row in enumerate(rows) if i not in errors]
+
+    for attempt in range(INSERT_ATTEMPTS):
+        kept = _check_unique(model, candidates, unique, errors)
+        if not kept:
+            ids = []
+            break
+        try:
+            ids = _insert(model, [row for _, row in kept])
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if not unique or attempt == INSERT_ATTEMPTS - 1:
+                raise
+    return ids, {str(i): messages for i, messages in sorted(errors.items())}
+
+
+def _taken(column, values):
+    return set(db.session.scalars(select(column).where(column.in_(values)))) if values else set()
+
+
+def _check_unique(model, candidates, unique, errors):
+    """The candidates whose ``unique`` values are free; records errors for the rest."""
+    for field in unique:
+        column = getattr(model, field)
+        taken = _taken(column, [row[field] for _, row in candidates])
+        seen = set()
+        kept = []
+        for i, row in candidates:
+            value = row[field]
+            if value in taken:
+                errors[i] = {field: [f'{field} already exists.']}
+            elif value in seen:
+                errors[i] = {field: [f'Duplicate {field} in this request.']}
+            else:
+                seen.add(value)
+                kept.append((i, row))
+        candidates = kept
+    return candidates
+
+
+def _insert(model, rows):
+    """Insert ``rows``; returns their ids in order."""
+    if db.session.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+        return db.session.scalars(stmt, rows).all()
+    return [db.session.execute(insert(model).values(**row)).inserted_primary_key[0] for row in rows]
+
+
+def bulk_response(ids, errors):
+    """Status code for a bulk result: 201 all rows, 207 some, 400 none."""
+    if not errors:
+        status = 201
+    elif ids:
+        status = 207
+    else:
+        status = 400
+    return {'created': len(ids), 'ids': ids, 'errors': errors}, status
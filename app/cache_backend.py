@@ -0,0 +1,253 @@
+"""Flask-Caching backends bounded to ``CACHE_THRESHOLD`` cached views.
+
+Both evict the least recently used view first (``SimpleCache`` only
+prunes expired entries and then every third one, whatever their use) and
+report evicted keys to ``on_evict``, which the view cache turns into
+per-view eviction counts. Only keys starting with ``EVICTABLE_PREFIX``
+count towards the threshold or are ever evicted: the table versions and
+single-flight locks stored next to the views (see caching.py) must stay
+until they expire or are replaced, or views would be served stale.
+
+``LRUCache`` lives in each worker's memory. ``SQLiteCache`` keeps one copy
+of the cached views and the table versions (see caching.py) in
+``CACHE_SQLITE_PATH`` for every worker on the host, so a write committed
+in one worker invalidates the views of all of them and each view is
+computed once per host. Its ``add`` is atomic across processes, which is
+what the single-flight locks in caching.py rely on.
+"""
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask_caching.backends.base import BaseCache
+
+from app.shared_sqlite import SharedSQLite
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,  -- 0: never
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cache_entries_used_at ON cache_entries (used_at)
+'''
+
+_LIVE = '(expires_at = 0 OR expires_at > ?)'
+
+# caching.VIEW_KEY; the other keys are few and are never evicted
+EVICTABLE_PREFIX = 'view/'
+# the same keys as a range the primary key index can scan
+_EVICTABLE = "key >= 'view/' AND key < 'view0'"
+
+# seconds between sweeps of expired entries
+PURGE_INTERVAL = 60
+# a hit only rewrites used_at once it is this many seconds old, so hot
+# entries do not turn every read into a write
+TOUCH_INTERVAL = 1.0
+
+
+def _dump(value):
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+class _BoundedCache(BaseCache):
+    def __init__(self, threshold=500, default_timeout=300, ignore_errors=False):
+        super().__init__(default_timeout=default_timeout)
+        self.threshold = threshold
+        self.ignore_errors = ignore_errors
+        # called with the keys dropped to stay within threshold
+        self.on_evict = None
+
+    def _expires_at(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout else 0
+
+    def _evicted(self, keys):
+        if keys and self.on_evict is not None:
+            self.on_evict(keys)
+
+
+class LRUCache(_BoundedCache):
+    """Per-process cache holding at most ``threshold`` cached views."""
+
+    def __init__(self, threshold=500, default_timeout=300, ignore_errors=False):
+        super().__init__(threshold, default_timeout, ignore_errors)
+        # key -> (pickled value, expires_at); views least recently used
+        # first, every other key in _pinned. Values are pickled, as
+        # SimpleCache does, so callers never share (and mutate) one cached
+        # Response object.
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(threshold=config['CACHE_THRESHOLD'], ignore_errors=config['CACHE_IGNORE_ERRORS'])
+        return cls(*args, **kwargs)
+
+    def _store(self, key):
+        return self._entries if key.startswith(EVICTABLE_PREFIX) else self._pinned
+
+    def _live(self, key, now):
+        store = self._store(key)
+        entry = store.get(key)
+        if entry is not None and entry[1] and entry[1] <= now:
+            del store[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.time())
+            if entry is None:
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return pickle.loads(entry[0])
+
+    def has(self, key):
+        with self._lock:
+            return self._live(key, time.time()) is not None
+
+    def set(self, key, value, timeout=None):
+        entry = (_dump(value), self._expires_at(timeout))
+        with self._lock:
+            self._store(key)[key] = entry
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            evicted = self._trim()
+        self._evicted(evicted)
+        return True
+
+    def add(self, key, value, timeout=None):
+        entry = (_dump(value), self._expires_at(timeout))
+        with self._lock:
+            if self._live(key, time.time()) is not None:
+                return False
+            self._store(key)[key] = entry
+            evicted = self._trim()
+        self._evicted(evicted)
+        return True
+
+    def _trim(self):
+        evicted = []
+        if len(self._entries) > self.threshold:
+            # expired entries go first and do not count as evictions
+            now = time.time()
+            for store in (self._entries, self._pinned):
+                for key in [k for k, (_, expires_at) in store.items() if expires_at and expires_at <= now]:
+                    del store[key]
+        while len(self._entries) > self.threshold:
+            evicted.append(self._entries.popitem(last=False)[0])
+        return evicted
+
+    def delete(self, key):
+        with self._lock:
+            return self._store(key).pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+        return True
+
+
+class SQLiteCache(_BoundedCache):
+    """Cache whose entries are rows of one SQLite table shared by the workers."""
+
+    def __init__(self, path, threshold=500, default_timeout=300, ignore_errors=False):
+        super().__init__(threshold, default_timeout, ignore_errors)
+        self.db = SharedSQLite(path)
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(cache_entries)')}
+        if columns and 'used_at' not in columns:
+            self.db.execute('DROP TABLE cache_entries')  # a file from before LRU eviction
+        self.db.connection().executescript(_SCHEMA)
+        self._last_purge = 0.0
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        path = config.get('CACHE_SQLITE_PATH') or os.path.join(tempfile.gettempdir(), 'mechanic_api_cache.db')
+        kwargs.update(threshold=config['CACHE_THRESHOLD'], ignore_errors=config['CACHE_IGNORE_ERRORS'])
+        return cls(path, *args, **kwargs)
+
+    def _trim(self, connection, now):
+        if now - self._last_purge >= PURGE_INTERVAL:
+            connection.execute('DELETE FROM cache_entries WHERE expires_at != 0 AND expires_at <= ?', (now,))
+            self._last_purge = now
+        excess = connection.execute(f'SELECT count(*) FROM cache_entries WHERE {_EVICTABLE}').fetchone()[0] \
+            - self.threshold
+        if excess <= 0:
+            return []
+        return [row[0] for row in connection.execute(
+            'DELETE FROM cache_entries WHERE key IN '
+            f'(SELECT key FROM cache_entries WHERE {_EVICTABLE} ORDER BY used_at LIMIT ?) RETURNING key', (excess,))]
+
+    def _touch(self, rows, now):
+        stale = [(now, key) for key, used_at in rows if now - used_at >= TOUCH_INTERVAL]
+        if stale:
+            self.db.connection().executemany('UPDATE cache_entries SET used_at = ? WHERE key = ?', stale)
+
+    def get(self, key):
+        now = time.time()
+        row = self.db.execute(f'SELECT value, used_at FROM cache_entries WHERE key = ? AND {_LIVE}', (key, now)).fetchone()
+        if row is None:
+            return None
+        self._touch([(key, row[1])], now)
+        return pickle.loads(row[0])
+
+    def get_many(self, *keys):
+        if not keys:
+            return []
+        now = time.time()
+        placeholders = ','.join('?' * len(keys))
+        rows = {key: (value, used_at) for key, value, used_at in self.db.execute(
+            f'SELECT key, value, used_at FROM cache_entries WHERE key IN ({placeholders}) AND {_LIVE}', (*keys, now))}
+        self._touch([(key, used_at) for key, (_, used_at) in rows.items()], now)
+        return [pickle.loads(rows[key][0]) if key in rows else None for key in keys]
+
+    def has(self, key):
+        return self.db.execute(f'SELECT 1 FROM cache_entries WHERE key = ? AND {_LIVE}',
+                               (key, time.time())).fetchone() is not None
+
+    def set(self, key, value, timeout=None):
+        return bool(self.set_many({key: value}, timeout))
+
+    def set_many(self, mapping, timeout=None):
+        now = time.time()
+        expires_at = self._expires_at(timeout)
+        rows = [(key, _dump(value), expires_at, now) for key, value in mapping.items()]
+        with self.db.transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)', rows)
+            evicted = self._trim(connection, now)
+        self._evicted(evicted)
+        return list(mapping)
+
+    def add(self, key, value, timeout=None):
+        # inserts, or takes over an expired row; a live row is left alone
+        now = time.time()
+        with self.db.transaction() as connection:
+            added = connection.execute(
+                'INSERT INTO cache_entries (key, value, expires_at, used_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, '
+                'used_at = excluded.used_at WHERE cache_entries.expires_at != 0 AND cache_entries.expires_at <= ?',
+                (key, _dump(value), self._expires_at(timeout), now, now)).rowcount == 1
+            evicted = self._trim(connection, now) if added else []
+        self._evicted(evicted)
+        return added
+
+    def delete(self, key):
+        return self.db.execute('DELETE FROM cache_entries WHERE key = ?', (key,)).rowcount == 1
+
+    def delete_many(self, *keys):
+        with self.db.transaction() as connection:
+            return [key for key in keys
+                    if connection.execute('DELETE FROM cache_entries WHERE key = ?', (key,)).rowcount]
+
+    def clear(self):
+        self.db.execute('DELETE FROM cache_entries')
+        return True
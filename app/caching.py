@@ -0,0 +1,361 @@
+"""Write-aware view caching.
+
+Every table has a version token kept in the cache backend. Cached views
+declare the tables they read (``@cache.cached(tables=(...))``) and the
+current tokens become part of the cache key. Session events record which
+tables a transaction wrote and bump their tokens on commit, so every
+cached response built from the old data simply stops being addressable.
+
+The same tokens drive HTTP validators: ``@cache.conditional`` derives a
+strong ETag and Last-Modified from them and answers 304 before the view,
+its query or its serializer run. Both vary with the negotiated
+``Content-Encoding``, and cached views store the compressed body (see
+compression.py) so hits are not recompressed.
+
+Entries and versions live in whatever backend ``CACHE_TYPE`` names;
+``app.cache_backend.SQLiteCache`` shares them between the workers on a
+host. However many threads and workers miss the same entry, one of them
+computes it while the others wait (single flight), and hot entries are
+recomputed just before they expire instead of all at once after.
+"""
+import functools
+import hashlib
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from collections import defaultdict
+from itertools import chain
+from urllib.parse import urlencode
+
+from blinker import Namespace
+from flask import current_app, has_app_context, make_response, request
+from flask_caching import Cache
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.compression import compress_response, negotiated_encoding
+
+VERSION_KEY = 'table-version/%s'
+VIEW_KEY = 'view/%s:'  # + path, representation, query, versions, encoding
+LOCK_KEY = 'lock/%s'
+# seconds between checks while another worker computes an entry
+LOCK_POLL_INTERVAL = 0.01
+
+_signals = Namespace()
+# sent with ``endpoint`` and ``hit`` after every cached view lookup
+cache_lookup = _signals.signal('cache-lookup')
+# sent with ``endpoint`` when the backend drops a view entry to stay in bounds
+cache_eviction = _signals.signal('cache-eviction')
+
+
+def _new_version():
+    # Random rather than a counter so a flushed or evicted version can never
+    # come back with a value that old cache entries were keyed on.
+    return (uuid.uuid4().hex, time.time())
+
+
+def representation():
+    """Name of the body format the current request negotiates."""
+    accept = request.headers.get('Accept', '')
+    if 'text/html' in accept:
+        return 'html'
+    if 'application/x-ndjson' in accept:
+        return 'ndjson'
+    return 'json'
+
+
+def normalized_query():
+    """The query string with parameters sorted by name.
+
+    ``?b=1&a=2`` and ``?a=2&b=1`` normalize alike; repeated values of one
+    parameter keep their order, since that can be significant.
+    """
+    return urlencode(sorted(request.args.items(multi=True), key=lambda item: item[0]))
+
+
+def _flushed_tables(session):
+    tables = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        state = inspect(obj)
+        mapper = state.mapper
+        tables.update(table.name for table in mapper.tables)
+        for rel in mapper.relationships:
+            if rel.secondary is None:
+                continue
+            if obj in session.deleted or state.attrs[rel.key].history.has_changes():
+                tables.add(rel.secondary.name)
+    return tables
+
+
+class VersionedCache(Cache):
+    """``flask_caching.Cache`` whose view entries are invalidated by writes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tracking = False
+        # keys being computed by a thread of this process
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'evictions': 0})
+        self._stats_lock = threading.Lock()
+
+    def init_app(self, app, config=None):
+        super().init_app(app, config)
+        with self._stats_lock:
+            self._stats.clear()  # counts are per app and process
+        backend = app.extensions['cache'][self]
+        if hasattr(backend, 'on_evict'):
+            backend.on_evict = self._record_evictions
+        if not self._tracking:
+            event.listen(Session, 'after_flush', self._record_flush)
+            event.listen(Session, 'do_orm_execute', self._record_execute)
+            event.listen(Session, 'after_commit', self._bump_committed)
+            event.listen(Session, 'after_rollback', self._forget_changes)
+            self._tracking = True
+
+    # -- table versions -------------------------------------------------
+
+    def table_versions(self, tables):
+        """Return ``{table: (token, modified_at)}`` for ``tables``."""
+        keys = [VERSION_KEY % table for table in tables]
+        versions = {}
+        for table, key, value in zip(tables, keys, self.cache.get_many(*keys)):
+            if value is None:
+                value = _new_version()
+                if not self.cache.add(key, value, timeout=0):
+                    value = self.cache.get(key) or value
+            versions[table] = value
+        return versions
+
+    def bump(self, *tables):
+        """Invalidate every cached view that reads any of ``tables``."""
+        if tables:
+            self.cache.set_many({VERSION_KEY % table: _new_version() for table in tables}, timeout=0)
+
+    # -- session tracking -----------------------------------------------
+
+    def _record_flush(self, session, flush_context):
+        session.info.setdefault('changed_tables', set()).update(_flushed_tables(session))
+
+    def _record_execute(self, orm_execute_state):
+        # Bulk INSERT/UPDATE/DELETE statements bypass the unit of work.
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            table = getattr(orm_execute_state.statement, 'table', None)
+            if table is not None:
+                session = orm_execute_state.session
+                session.info.setdefault('changed_tables', set()).add(table.name)
+
+    def _bump_committed(self, session):
+        tables = session.info.pop('changed_tables', None)
+        if tables and has_app_context():
+            self.bump(*sorted(tables))
+
+    def _forget_changes(self, session):
+        session.info.pop('changed_tables', None)
+
+    # -- view decorator -------------------------------------------------
+
+    def _view_key(self, tables):
+        # the representation keeps e.g. the HTML and JSON bodies of one URL apart
+        key = VIEW_KEY % request.endpoint + f'{request.path}|{representation()}'
+        query = normalized_query()
+        if query:
+            key += '?' + hashlib.md5(query.encode()).hexdigest()
+        if tables:
+            versions = self.table_versions(tables)
+            tokens = ','.join(versions[table][0] for table in tables)
+            key += '@' + hashlib.md5(tokens.encode()).hexdigest()
+        encoding = negotiated_encoding()
+        if encoding:
+            key += f'#{encoding}'
+        return key
+
+    def cached(self, timeout=None, tables=(), unless=None):
+        """Cache a GET view's response; ``tables`` are the tables it reads.
+
+        Entries are keyed on the endpoint, path, normalized query string,
+        negotiated representation and encoding, and are dropped as soon as a
+        transaction touching one of ``tables`` commits, so long timeouts no
+        longer mean stale reads. Every lookup sends ``cache_lookup`` with
+        whether it was a hit. The stored response is already compressed for
+        the negotiated encoding.
+
+        Only one caller computes a missing entry (see ``_fetch``); the rest
+        wait for it. Entries are also refreshed shortly before they expire,
+        by one caller, with a probability that grows as expiry approaches
+        and with how long the view takes (``CACHE_EARLY_REFRESH_BETA``).
+        """
+        tables = tuple(tables)
+
+        def make_cache_key(*args, **view_kwargs):
+            return self._view_key(tables)
+
+        def decorator(f):
+            def compute(*args, **view_kwargs):
+                return compress_response(make_response(f(*args, **view_kwargs)))
+
+            @functools.wraps(f)
+            def decorated_function(*args, **view_kwargs):
+                if unless is not None and unless():
+                    return f(*args, **view_kwargs)
+                try:
+                    key = make_cache_key()
+                    entry = self.cache.get(key)
+                except Exception:
+                    if current_app.debug:
+                        raise
+                    current_app.logger.exception('Cache lookup failed; serving %s uncached', request.path)
+                    return compute(*args, **view_kwargs)
+                rv, hit = self._fetch(key, entry, lambda: compute(*args, **view_kwargs), timeout)
+                with self._stats_lock:
+                    self._stats[request.endpoint]['hits' if hit else 'misses'] += 1
+                cache_lookup.send(self, endpoint=request.endpoint, hit=hit)
+                return rv
+
+            decorated_function.uncached = f
+            decorated_function.make_cache_key = make_cache_key
+            return decorated_function
+        return decorator
+
+    # -- statistics -----------------------------------------------------
+
+    def _record_evictions(self, keys):
+        prefix = VIEW_KEY.split('%', 1)[0]
+        for key in keys:
+            if key.startswith(prefix):
+                endpoint = key[len(prefix):].split(':', 1)[0]
+                with self._stats_lock:
+                    self._stats[endpoint]['evictions'] += 1
+                cache_eviction.send(self, endpoint=endpoint)
+
+    def view_stats(self):
+        """Per-endpoint hits, misses and evictions seen by this process."""
+        with self._stats_lock:
+            stats = {endpoint: dict(counts) for endpoint, counts in self._stats.items()}
+        for counts in stats.values():
+            lookups = counts['hits'] + counts['misses']
+            counts['hit_rate'] = counts['hits'] / lookups if lookups else 0.0
+        return stats
+
+    # -- single flight --------------------------------------------------
+
+    def _refresh_due(self, entry):
+        # XFetch: recompute early with probability rising towards expiry,
+        # sooner for views that take longer (delta) to compute
+        _, delta, expires_at = entry
+        beta = current_app.config.get('CACHE_EARLY_REFRESH_BETA', 1.0)
+        if not expires_at or not beta:
+            return False
+        return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+    def _fetch(self, key, entry, compute, timeout):
+        """Return ``(value, hit)`` for ``key``, computing it at most once.
+
+        Threads of this process queue on a per-key event; other processes
+        on a lock entry taken with the backend's atomic ``add``. Whoever
+        loses either race waits for the winner's result, or serves the
+        current entry when it only lost an early refresh.
+        """
+        if entry is not None and not self._refresh_due(entry):
+            return entry[0], True
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = threading.Event()
+        lock_timeout = current_app.config.get('CACHE_LOCK_TIMEOUT', 10)
+        if not leader:
+            if entry is not None:
+                return entry[0], True
+            flight.wait(lock_timeout)
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry[0], True
+            return compute(), False
+
+        try:
+            return self._compute_locked(key, entry, compute, timeout, lock_timeout)
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.set()
+
+    def _compute_locked(self, key, entry, compute, timeout, lock_timeout):
+        lock_key = LOCK_KEY % key
+        token = uuid.uuid4().hex
+        deadline = time.time() + lock_timeout
+        locked = self.cache.add(lock_key, token, timeout=lock_timeout)
+        while not locked:
+            if entry is not None:
+                return entry[0], True  # another worker is refreshing it
+            if time.time() >= deadline:
+                break  # the holder died or hangs; compute without the lock
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = self.cache.get(key)
+            locked = entry is None and self.cache.add(lock_key, token, timeout=lock_timeout)
+        try:
+            started = time.perf_counter()
+            value = compute()
+            delta = time.perf_counter() - started
+            if timeout is None:
+                timeout = self.cache.default_timeout
+            expires_at = time.time() + timeout if timeout else 0
+            self.cache.set(key, (value, delta, expires_at), timeout=timeout)
+            return value, False
+        finally:
+            if locked and self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+
+    def conditional(self, tables):
+        """Serve ``ETag``/``Last-Modified`` for a GET view reading ``tables``.
+
+        Validators only depend on the URL, the negotiated representation and
+        the table versions, so a matching ``If-None-Match`` or
+        ``If-Modified-Since`` is answered with 304 before the view runs.
+        """
+        tables = tuple(tables)
+
+        def decorator(f):
+            @functools.wraps(f)
+            def decorated_function(*args, **kwargs):
+                versions = self.table_versions(tables)
+                tokens = ','.join(versions[table][0] for table in tables)
+                raw = f'{request.path}|{normalized_query()}|{representation()}|{negotiated_encoding()}|{tokens}'
+                etag = hashlib.md5(raw.encode()).hexdigest()
+                # HTTP dates have whole seconds: a write later in the same
+                # second as the newest version would keep its Last-Modified.
+                # So only the end of that second validates, and it is only
+                # handed out once the second is over.
+                stamp = max(stamp for _, stamp in versions.values())
+                settled = datetime.fromtimestamp(math.ceil(stamp), tz=timezone.utc)
+                modified = settled if time.time() >= math.ceil(stamp) else \
+                    datetime.fromtimestamp(math.floor(stamp), tz=timezone.utc)
+
+                not_modified = False
+                if request.if_none_match:
+                    not_modified = request.if_none_match.contains_weak(etag)
+                elif request.if_modified_since:
+                    not_modified = request.if_modified_since >= settled
+
+                if not_modified:
+                    response = make_response('', 304)
+                else:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+
+                response.set_etag(etag)
+                response.last_modified = modified
+                max_age = current_app.config.get('HTTP_CACHE_MAX_AGE', 0)
+                # public so a shared reverse proxy may store it; must-revalidate
+                # so it comes back with the validators once max-age runs out
+                response.headers['Cache-Control'] = f'public, max-age={max_age}, must-revalidate'
+                response.vary.add('Accept')
+                response.vary.add('Accept-Encoding')
+                return response
+            return decorated_function
+        return decorator
@@ -0,0 +1,31 @@
+"""``flask`` CLI commands, registered on the app in ``create_app``."""
+import click
+
+from app.extensions import db
+
+
+def register_commands(app):
+    @app.cli.command('db-upgrade')
+    def db_upgrade_command():
+        """Create missing tables and apply pending schema migrations."""
+        from app.migrations import current_version, upgrade
+        applied = upgrade(db.engine)
+        if applied:
+            click.echo(f"Applied migrations: {', '.join(map(str, applied))}")
+        click.echo(f'Database is at version {current_version(db.engine)}.')
+
+    @app.cli.command('reconcile-ticket-counts')
+    def reconcile_ticket_counts_command():
+        """Rebuild mechanics.ticket_count from service_mechanic."""
+        from app.ranking import reconcile_ticket_counts
+        updated = reconcile_ticket_counts()
+        db.session.commit()
+        click.echo(f'Reconciled ticket counts for {updated} mechanics.')
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Recompute the /reports rollup tables from the raw ticket tables."""
+        from app.rollups import rebuild_rollups
+        days = rebuild_rollups()
+        db.session.commit()
+        click.echo(f'Rebuilt rollups for {days} days.')
@@ -0,0 +1,118 @@
+"""gzip/brotli response compression negotiated by ``Accept-Encoding``.
+
+JSON and NDJSON bodies of at least ``COMPRESS_MIN_SIZE`` bytes are
+compressed by an ``after_request`` hook. Streamed responses are
+compressed chunk by chunk, each chunk flushed so the client still gets
+every batch as it is produced. ``@cache.cached`` views compress before
+their result is stored (the encoding is part of the cache key), so a hit
+is served as stored instead of being recompressed. Brotli is used when
+the ``brotli`` package is installed and the client prefers or accepts it.
+"""
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json', 'application/x-ndjson', 'text/html', 'text/plain', 'text/csv',
+})
+
+
+def _encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiated_encoding():
+    """``'br'``, ``'gzip'`` or None for the current request."""
+    if not current_app.config.get('COMPRESS_ENABLED', True):
+        return None
+    # ties go to the first (smaller output) encoding we offer
+    return request.accept_encodings.best_match(_encodings())
+
+
+class _Compressor:
+    """One incremental gzip or brotli stream."""
+
+    def __init__(self, encoding, config):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._stream = brotli.Compressor(quality=config.get('COMPRESS_BR_QUALITY', 4))
+        else:
+            # wbits 31: gzip container, mtime 0 so equal input gives equal bytes
+            self._stream = zlib.compressobj(config.get('COMPRESS_LEVEL', 6), zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._stream.process(data)
+        return self._stream.compress(data)
+
+    def flush(self):
+        if self.encoding == 'br':
+            return self._stream.flush()
+        return self._stream.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._stream.finish()
+        return self._stream.flush()
+
+
+def _compressible(response):
+    return 200 <= response.status_code < 300 and response.status_code != 204 \
+        and response.mimetype in COMPRESSIBLE_MIMETYPES \
+        and 'Content-Encoding' not in response.headers \
+        and not response.direct_passthrough
+
+
+def _stream(chunks, compressor, charset):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(charset)
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush()
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response, encoding=None):
+    """Compress ``response`` in place for ``encoding`` (default: negotiated).
+
+    Bodies below ``COMPRESS_MIN_SIZE`` are left as they are; the response
+    gets ``Vary: Accept-Encoding`` either way when its type is compressible.
+    """
+    if not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = encoding or negotiated_encoding()
+    if encoding is None:
+        return response
+
+    config = current_app.config
+    if response.is_streamed:
+        compressor = _Compressor(encoding, config)
+        response.response = _stream(response.response, compressor, 'utf-8')
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config.get('COMPRESS_MIN_SIZE', 1024):
+            return response
+        compressor = _Compressor(encoding, config)
+        response.set_data(compressor.compress(data) + compressor.finish())
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Compress every eligible response on its way out."""
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response)
@@ -0,0 +1,50 @@
+"""Engine setup that SQLALCHEMY_ENGINE_OPTIONS cannot express."""
+from sqlalchemy import event
+
+from app.extensions import db
+
+
+def _sqlite_pragmas(pragmas, in_memory):
+    def apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if name == 'journal_mode' and in_memory:
+                continue
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return apply
+
+
+def configure_engine(app):
+    """Apply SQLITE_PRAGMAS to each new connection of the app's engine."""
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    database = engine.url.database or ''
+    in_memory = database in ('', ':memory:') or database.startswith('file::memory:')
+    event.listen(engine, 'connect', _sqlite_pragmas(pragmas, in_memory))
+
+
+def dispose_engines(app, close=True):
+    """Drop the pooled connections of every engine of ``app``.
+
+    A forked worker passes ``close=False``: the connections it inherited
+    are the parent's, so they are only forgotten; closing them would shut
+    sockets the parent (or a sibling) is still using.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+def pool_stats(engine):
+    """Checkout/overflow figures for pools that keep them (QueuePool)."""
+    pool = engine.pool
+    stats = {}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    return stats
@@ -1,13 +1,27 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_marshmallow import Marshmallow
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask_caching import Cache
+from .caching import VersionedCache
+from .ratelimit import SQLiteStorage  # noqa: F401 (registers the sqlite:// limiter storage)
 
 # singletons used across the app
 db = SQLAlchemy()
-ma = Marshmallow()
-# In-memory limiter for dev; configure a storage backend for production
+# Counters live in RATELIMIT_STORAGE_URI: memory:// (per worker) for dev and
+# tests, sqlite:// (shared by the workers on a host, see ratelimit.py) in production
 limiter = Limiter(key_func=get_remote_address, default_limits=["100 per hour"])
-# SimpleCache for dev to silence CACHE_TYPE null warning
-cache = Cache(config={"CACHE_TYPE": "SimpleCache"})
\ No newline at end of file
+# Backend from CACHE_TYPE (per-worker LRUCache in dev, a shared SQLite
+# file in production); view entries are versioned per table and invalidated
+# when a write commits (see caching.py)
+cache = VersionedCache()
+
+
+def __getattr__(name):
+    # ``ma`` is built on first use: flask_marshmallow imports
+    # marshmallow-sqlalchemy, which only the blueprint schemas need and
+    # which costs more at startup than the rest of this module but SQLAlchemy
+    if name == 'ma':
+        global ma
+        from flask_marshmallow import Marshmallow
+        ma = Marshmallow()
+        return ma
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,99 @@
+"""Whitelisted filter and sort query parameters for the collection routes.
+
+``?experience[gte]=5&specialization=Engine&sort=-experience,name`` compiles
+to ``WHERE experience >= 5 AND specialization = 'Engine'`` and the
+``[(column, descending), ...]`` ordering ``keyset_paginate`` expects, so
+the filtering happens in the database and cursors keep working. Each
+route passes the columns it allows; anything else is rejected rather than
+silently ignored.
+"""
+import re
+from datetime import date
+
+from flask import request
+
+# query parameters owned by pagination and representation, not filters
+RESERVED_ARGS = frozenset({'cursor', 'limit', 'per_page', 'page', 'include_total', 'stream', 'expand', 'sort'})
+
+OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'ne': lambda column, value: column != value,
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+    'in': lambda column, values: column.in_(values),
+}
+
+_FILTER_KEY = re.compile(r'^(\w+)(?:\[(\w+)\])?$')
+
+
+class FilterError(ValueError):
+    """Raised for a filter or sort parameter the route does not allow."""
+
+
+def _coerce(name, column, raw):
+    python_type = column.type.python_type
+    try:
+        if python_type is date:
+            return date.fromisoformat(raw)
+        return python_type(raw)
+    except ValueError:
+        raise FilterError(f'Invalid value for {name}: {raw!r}')
+
+
+def filter_clauses(fields):
+    """WHERE clauses for the ``name`` / ``name[op]`` query parameters.
+
+    ``fields`` maps the public parameter name to its column. A bare
+    ``name=value`` means ``eq``; ``in`` takes a comma-separated list.
+    Repeating a parameter ANDs the conditions together.
+    """
+    clauses = []
+    for key in request.args:
+        if key in RESERVED_ARGS:
+            continue
+        match = _FILTER_KEY.match(key)
+        if not match or match.group(1) not in fields:
+            raise FilterError(f'Unknown filter: {key}')
+        name, op = match.group(1), match.group(2) or 'eq'
+        if op not in OPERATORS:
+            raise FilterError(f'Unknown operator for {name}: {op}')
+        column = fields[name]
+        for raw in request.args.getlist(key):
+            if op == 'in':
+                value = [_coerce(name, column, part) for part in raw.split(',') if part]
+            else:
+                value = _coerce(name, column, raw)
+            clauses.append(OPERATORS[op](column, value))
+    return clauses
+
+
+def sort_order(fields, default, tiebreaker):
+    """``(column, descending)`` pairs for ``?sort=name,-other``.
+
+    ``tiebreaker`` (the primary key) is appended when missing so that the
+    order is total, which keyset pagination needs.
+    """
+    raw = request.args.get('sort')
+    if not raw:
+        return list(default)
+
+    order_by = []
+    for part in raw.split(','):
+        part = part.strip()
+        name = part.lstrip('+-')
+        if name not in fields:
+            raise FilterError(f'Cannot sort by {name or part!r}')
+        column = fields[name]
+        if any(column is seen for seen, _ in order_by):
+            continue
+        order_by.append((column, part.startswith('-')))
+    if not any(column is tiebreaker for column, _ in order_by):
+        order_by.append((tiebreaker, False))
+    return order_by
+
+
+def ordering(order_by):
+    """ORDER BY clauses for ``(column, descending)`` pairs."""
+    return [column.desc() if desc else column.asc() for column, desc in order_by]
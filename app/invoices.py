@@ -0,0 +1,86 @@
+"""Ticket cost totals, computed by the database.
+
+Each line is ``quantity * unit_price`` from ``service_inventory``, where
+``unit_price`` is the price snapshotted when the part was added (falling
+back to the current catalogue price for links that predate snapshots).
+``invoice`` and ``ticket_totals`` each run exactly one aggregate query.
+"""
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models import Inventory, Service_Inventory, ServiceTicket
+
+# tables the results are computed from, for the view cache and ETags
+INVOICE_TABLES = ('service_tickets', 'service_inventory', 'inventory')
+
+_unit_price = func.coalesce(Service_Inventory.c.unit_price, Inventory.price)
+_line_total = Service_Inventory.c.quantity * _unit_price
+
+
+def _money(value):
+    return round(value or 0.0, 2)
+
+
+def _lines_joined(stmt):
+    return (
+        stmt.select_from(ServiceTicket)
+        .outerjoin(Service_Inventory, Service_Inventory.c.service_ticket_id == ServiceTicket.id)
+        .outerjoin(Inventory, Inventory.id == Service_Inventory.c.inventory_id)
+    )
+
+
+def invoice(ticket_id):
+    """Lines and grand total for one ticket, or None if it does not exist.
+
+    The grand total comes from a window sum over the same rows, and the
+    outer join returns the ticket even when it has no parts.
+    """
+    stmt = _lines_joined(select(
+        ServiceTicket.id,
+        ServiceTicket.service_date,
+        ServiceTicket.customer_id,
+        Inventory.id.label('part_id'),
+        Inventory.name,
+        Service_Inventory.c.quantity,
+        _unit_price.label('unit_price'),
+        _line_total.label('line_total'),
+        func.sum(_line_total).over().label('grand_total'),
+    )).where(ServiceTicket.id == ticket_id).order_by(Inventory.id)
+    rows = db.session.execute(stmt).all()
+    if not rows:
+        return None
+
+    first = rows[0]
+    lines = [{
+        'part_id': row.part_id,
+        'name': row.name,
+        'quantity': row.quantity,
+        'unit_price': _money(row.unit_price),
+        'line_total': _money(row.line_total),
+    } for row in rows if row.part_id is not None]
+    return {
+        'ticket_id': first.id,
+        'service_date': first.service_date.isoformat(),
+        'customer_id': first.customer_id,
+        'lines': lines,
+        'item_count': sum(line['quantity'] for line in lines),
+        'total': _money(first.grand_total),
+    }
+
+
+def ticket_totals(ticket_ids):
+    """``(totals, missing_ids)`` for many tickets with one GROUP BY query."""
+    stmt = _lines_joined(select(
+        ServiceTicket.id,
+        func.count(Service_Inventory.c.inventory_id).label('line_count'),
+        func.coalesce(func.sum(Service_Inventory.c.quantity), 0).label('item_count'),
+        func.sum(_line_total).label('total'),
+    )).where(ServiceTicket.id.in_(ticket_ids)).group_by(ServiceTicket.id).order_by(ServiceTicket.id)
+    totals = [{
+        'ticket_id': row.id,
+        'line_count': row.line_count,
+        'item_count': row.item_count,
+        'total': _money(row.total),
+    } for row in db.session.execute(stmt)]
+    found = {entry['ticket_id'] for entry in totals}
+    return totals, sorted(set(ticket_ids) - found)
@@ -0,0 +1,79 @@
+"""JSON provider used for every response body (``app.json``).
+
+Flask's ``DefaultJSONProvider`` sorts keys and builds a new encoder on
+every call. This one keeps the key order the schemas dump in, writes
+compact UTF-8 and reuses one preconfigured encoder. When ``orjson`` is
+installed it is used instead (``JSON_ENCODER = 'auto'``, the default);
+``'stdlib'`` forces the standard library encoder and ``'orjson'``
+requires orjson.
+
+Both encoders produce the same text for the types the API returns:
+dates and datetimes as ISO 8601, ``Decimal`` and ``UUID`` as strings,
+dataclasses as objects.
+"""
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def _default(o):
+    # only reached for types the encoder has no native path for
+    if isinstance(o, (date, datetime)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(JSONProvider):
+    mimetype = 'application/json'
+
+    def __init__(self, app):
+        super().__init__(app)
+        choice = app.config.get('JSON_ENCODER', 'auto')
+        if choice == 'orjson' and orjson is None:
+            raise RuntimeError("JSON_ENCODER is 'orjson' but orjson is not installed")
+        self.use_orjson = orjson is not None and choice in ('auto', 'orjson')
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+    @property
+    def encoder_name(self):
+        return 'orjson' if self.use_orjson else 'stdlib'
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # callers asking for specific options (indent, sort_keys) get them
+            kwargs.setdefault('default', _default)
+            kwargs.setdefault('ensure_ascii', False)
+            return json.dumps(obj, **kwargs)
+        if self.use_orjson:
+            return self._orjson_bytes(obj).decode()
+        return self._encoder.encode(obj)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def _orjson_bytes(self, obj):
+        # OPT_PASSTHROUGH_DATETIME routes datetimes through _default, which
+        # keeps naive/aware formatting identical to datetime.isoformat()
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = self._orjson_bytes(obj) if self.use_orjson else self._encoder.encode(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,322 @@
+"""Prometheus metrics for the API, served at ``/metrics``.
+
+Each process keeps its own counters and histograms. With several gunicorn
+workers, set ``METRICS_MULTIPROC_DIR`` (or ``PROMETHEUS_MULTIPROC_DIR``):
+every worker then writes a snapshot file there at most once per
+``METRICS_FLUSH_INTERVAL`` seconds and ``/metrics`` sums the snapshots of
+all workers, so whichever worker answers the scrape reports the totals.
+gunicorn.conf.py empties the directory when the server (re)starts and,
+as each worker exits, folds its counters and histograms into one
+compacted file and drops its gauges (``mark_process_dead``), so recycled
+workers neither pile up files nor keep reporting their pool levels.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import Response, current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from app.caching import cache_eviction, cache_lookup
+from app.database import pool_stats
+from app.extensions import db, limiter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by endpoint, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint.', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Response body size by endpoint.', SIZE_BUCKETS),
+    'db_statements_total': ('counter', 'SQL statements executed by endpoint.', None),
+    'db_statement_duration_seconds': ('histogram', 'SQL statement latency by endpoint.', LATENCY_BUCKETS),
+    'cache_lookups_total': ('counter', 'Cached view lookups by endpoint and result.', None),
+    'cache_evictions_total': ('counter', 'Cached view entries evicted to stay within CACHE_THRESHOLD.', None),
+    'ratelimit_rejections_total': ('counter', 'Requests rejected by the rate limiter.', None),
+    'auth_token_lookups_total': ('counter', 'Bearer token checks by result (hit, miss, revoked).', None),
+    'db_pool_checkouts_total': ('counter', 'Connections checked out of the engine pool.', None),
+    'db_pool_size': ('gauge', 'Configured pool size, summed over workers.', None),
+    'db_pool_checked_out': ('gauge', 'Connections currently checked out, summed over workers.', None),
+    'db_pool_overflow': ('gauge', 'Overflow connections in use, summed over workers.', None),
+}
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by ``(name, labels)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, labels, value):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        buckets = METRICS[name][2]
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                # one slot per bucket, then +Inf, sum
+                hist = self.histograms[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            else:
+                hist[len(buckets)] += 1
+            hist[-1] += value
+
+    def clear(self):
+        self._lock = threading.Lock()
+        self.counters, self.histograms, self.gauges = {}, {}, {}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(hist)] for (name, labels), hist in self.histograms.items()],
+                'gauges': [[name, list(labels), value] for (name, labels), value in self.gauges.items()],
+            }
+
+
+registry = MetricsRegistry()
+# what mark_process_dead keeps of the workers that have exited
+COMPACTED_SNAPSHOT = 'metrics-compacted.json'
+_process_token = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+_last_flush = 0.0
+_hooks_installed = False
+
+
+def _after_fork():
+    # gunicorn forks a preloaded app into every worker: each needs its own
+    # snapshot file, and nothing the master recorded may be counted twice
+    global _process_token, _last_flush
+    registry.clear()
+    _process_token = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    _last_flush = 0.0
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _merge(snapshots):
+    counters, histograms = {}, {}
+    for snap in snapshots:
+        # gauges are per-worker levels, so summing them gives the host total
+        for name, labels, value in snap['counters'] + snap.get('gauges', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snap['histograms']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, [0] * len(hist))
+            for i, value in enumerate(hist):
+                merged[i] += value
+    return counters, histograms
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def render(counters, histograms):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind in ('counter', 'gauge'):
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+            continue
+        for (metric, labels), hist in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, hist):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            cumulative += hist[len(buckets)]
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {hist[-1]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def _multiproc_dir():
+    return current_app.config.get('METRICS_MULTIPROC_DIR') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+def _refresh_pool_gauges():
+    if not has_app_context():
+        return
+    stats = pool_stats(db.engine)
+    for key, name in (('size', 'db_pool_size'), ('checkedout', 'db_pool_checked_out'), ('overflow', 'db_pool_overflow')):
+        if key in stats:
+            registry.set(name, {}, stats[key])
+
+
+def flush(directory):
+    """Atomically write this process's snapshot into ``directory``."""
+    global _last_flush
+    _refresh_pool_gauges()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'metrics-{_process_token}.json')
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(registry.snapshot(), fh)
+    os.replace(tmp, path)
+    _last_flush = time.monotonic()
+
+
+def clear_snapshots(directory):
+    """Remove every worker snapshot in ``directory`` (at server start)."""
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith('metrics-') and name.endswith(('.json', '.tmp')):
+            os.remove(os.path.join(directory, name))
+
+
+def mark_process_dead(directory, pid):
+    """Fold the snapshots of exited worker ``pid`` into the compacted file.
+
+    Counters and histograms keep counting up across worker restarts;
+    gauges are levels of the dead process and are dropped.
+    """
+    if not directory or not os.path.isdir(directory):
+        return
+    dead = [name for name in os.listdir(directory)
+            if name.startswith(f'metrics-{pid}-') and name.endswith('.json')]
+    if not dead:
+        return
+    compacted = os.path.join(directory, COMPACTED_SNAPSHOT)
+    snapshots = []
+    for name in [COMPACTED_SNAPSHOT, *dead]:
+        try:
+            with open(os.path.join(directory, name)) as fh:
+                snapshots.append(dict(json.load(fh), gauges=[]))
+        except (OSError, ValueError):
+            continue
+    counters, histograms = _merge(snapshots)
+    tmp = f'{compacted}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump({
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), hist] for (name, labels), hist in histograms.items()],
+            'gauges': [],
+        }, fh)
+    os.replace(tmp, compacted)
+    for name in dead:
+        os.remove(os.path.join(directory, name))
+
+
+def collect(directory=None):
+    if not directory:
+        _refresh_pool_gauges()
+        return _merge([registry.snapshot()])
+    flush(directory)
+    snapshots = []
+    for name in os.listdir(directory):
+        if name.startswith('metrics-') and name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name)) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue  # a worker is mid-write or the file was removed
+    return _merge(snapshots)
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'none'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    labels = {'endpoint': _endpoint()}
+    registry.inc('db_statements_total', labels)
+    registry.observe('db_statement_duration_seconds', labels, elapsed)
+
+
+def _on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    registry.inc('db_pool_checkouts_total', {})
+
+
+def _on_cache_lookup(sender, endpoint, hit):
+    registry.inc('cache_lookups_total', {'endpoint': endpoint or 'none', 'result': 'hit' if hit else 'miss'})
+
+
+def _on_cache_eviction(sender, endpoint):
+    registry.inc('cache_evictions_total', {'endpoint': endpoint})
+
+
+def init_app(app):
+    """Install request, SQL and cache hooks and register ``/metrics``."""
+    global _hooks_installed
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    if not _hooks_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Pool, 'checkout', _on_pool_checkout)
+        cache_lookup.connect(_on_cache_lookup)
+        cache_eviction.connect(_on_cache_eviction)
+        _hooks_installed = True
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if request.endpoint == 'metrics':
+            return response
+        labels = {'endpoint': _endpoint()}
+        registry.inc('http_requests_total', {**labels, 'method': request.method, 'status': response.status_code})
+        # requests the limiter rejects never reach start_timer
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            registry.observe('http_request_duration_seconds', labels, time.perf_counter() - start)
+        if response.content_length is not None:
+            registry.observe('http_response_size_bytes', labels, response.content_length)
+        if response.status_code == 429:
+            registry.inc('ratelimit_rejections_total', labels)
+        directory = _multiproc_dir()
+        if directory and time.monotonic() - _last_flush >= app.config.get('METRICS_FLUSH_INTERVAL', 1.0):
+            flush(directory)
+        return response
+
+    @app.route('/metrics')
+    @limiter.exempt
+    def metrics():
+        counters, histograms = collect(_multiproc_dir())
+        return Response(render(counters, histograms), mimetype='text/plain; version=0.0.4')
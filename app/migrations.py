@@ -0,0 +1,141 @@
+"""Versioned schema migrations for databases that already exist.
+
+``db.create_all()`` only creates missing tables; it never adds columns or
+indexes to tables that are already there. Each migration below runs once
+per database, in version order, and is recorded in ``schema_migrations``.
+Steps check before they change anything, so running them against a
+freshly created schema simply stamps the version.
+
+Run them with ``flask db-upgrade``.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, inspect, select, text, update
+
+from app.extensions import db
+from app.rollups import rebuild_rollups
+from app.search import create_search_indexes
+
+_meta = MetaData()
+schema_migrations = Table(
+    'schema_migrations',
+    _meta,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def _create_index(conn, name, table, *columns):
+    """Create index ``name`` on ``table`` unless it exists.
+
+    Each migration spells out its indexes (``'column'`` or ``'column DESC'``)
+    rather than looking them up in the models, so what a released version
+    does never changes when the models do.
+    """
+    names = [column.split()[0] for column in columns]
+    target = Table(table, MetaData(), *(Column(column) for column in dict.fromkeys(names)))
+    expressions = [target.c[n].desc() if column.endswith(' DESC') else target.c[n] for n, column in zip(names, columns)]
+    Index(name, *expressions).create(conn, checkfirst=True)
+
+
+@migration(1, 'Add mechanics.ticket_count and the ranking index')
+def _add_ticket_count(conn):
+    columns = {column['name'] for column in inspect(conn).get_columns('mechanics')}
+    if 'ticket_count' not in columns:
+        conn.execute(text('ALTER TABLE mechanics ADD COLUMN ticket_count INTEGER NOT NULL DEFAULT 0'))
+        mechanics = db.metadata.tables['mechanics']
+        links = db.metadata.tables['service_mechanic']
+        count = (
+            select(func.count())
+            .select_from(links)
+            .where(links.c.mechanic_id == mechanics.c.id)
+            .scalar_subquery()
+        )
+        conn.execute(update(mechanics).values(ticket_count=count))
+    _create_index(conn, 'ix_mechanics_ranking', 'mechanics', 'ticket_count DESC', 'id')
+
+
+@migration(2, 'Index hot foreign keys and filter columns')
+def _index_hot_columns(conn):
+    _create_index(conn, 'ix_service_tickets_customer_id', 'service_tickets', 'customer_id')
+    _create_index(conn, 'ix_service_tickets_service_date_id', 'service_tickets', 'service_date', 'id')
+    _create_index(conn, 'ix_service_mechanic_mechanic_id', 'service_mechanic', 'mechanic_id', 'service_ticket_id')
+    _create_index(conn, 'ix_service_inventory_inventory_id', 'service_inventory', 'inventory_id', 'service_ticket_id')
+
+
+@migration(3, 'Full-text / trigram search indexes')
+def _search_indexes(conn):
+    create_search_indexes(conn)
+
+
+@migration(4, 'Index the filter columns of the collection routes')
+def _index_filter_columns(conn):
+    _create_index(conn, 'ix_service_tickets_customer_date', 'service_tickets', 'customer_id', 'service_date', 'id')
+    _create_index(conn, 'ix_mechanics_specialization_experience', 'mechanics', 'specialization', 'experience')
+    _create_index(conn, 'ix_inventory_price', 'inventory', 'price')
+    # the composite index covers the plain one migration 2 created on customer_id
+    conn.execute(text('DROP INDEX IF EXISTS ix_service_tickets_customer_id'))
+
+
+@migration(5, 'Part quantities and unit price snapshots on service_inventory')
+def _part_quantities(conn):
+    columns = {column['name'] for column in inspect(conn).get_columns('service_inventory')}
+    if 'quantity' not in columns:
+        conn.execute(text('ALTER TABLE service_inventory ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1'))
+    if 'unit_price' not in columns:
+        conn.execute(text('ALTER TABLE service_inventory ADD COLUMN unit_price FLOAT'))
+    # existing links are priced at today's catalogue price
+    links = db.metadata.tables['service_inventory']
+    inventory = db.metadata.tables['inventory']
+    price = select(inventory.c.price).where(inventory.c.id == links.c.inventory_id).scalar_subquery()
+    conn.execute(update(links).where(links.c.unit_price.is_(None)).values(unit_price=price))
+
+
+@migration(6, 'Backfill the daily rollup tables')
+def _backfill_rollups(conn):
+    # the tables themselves are created by create_all()
+    rebuild_rollups(conn)
+
+
+def applied_versions(conn):
+    schema_migrations.create(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine):
+    """Create missing tables, then apply pending migrations in order.
+
+    Returns the versions applied by this call.
+    """
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if version in done:
+            continue
+        # one transaction per migration so a failure leaves earlier ones recorded
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.now(timezone.utc)
+            ))
+        applied.append(version)
+    return applied
+
+
+def current_version(engine):
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    return max(done, default=0)
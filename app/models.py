@@ -9,16 +9,24 @@ class Base(DeclarativeBase):
     pass
 
 # association tables
+# the composite primary keys lead with service_ticket_id, so the reverse
+# lookups (a mechanic's or a part's tickets) need their own index
 Service_Mechanic = db.Table(
     "service_mechanic",
     db.Column("service_ticket_id", db.Integer, db.ForeignKey("service_tickets.id"), primary_key=True),
     db.Column("mechanic_id", db.Integer, db.ForeignKey("mechanics.id"), primary_key=True),
+    db.Index("ix_service_mechanic_mechanic_id", "mechanic_id", "service_ticket_id"),
 )
 
+# quantity and the part's price when it was added, so an invoice does not
+# change when the catalogue price does (NULL unit_price: use the current one)
 Service_Inventory = db.Table(
     "service_inventory",
     db.Column("service_ticket_id", db.Integer, db.ForeignKey("service_tickets.id"), primary_key=True),
     db.Column("inventory_id", db.Integer, db.ForeignKey("inventory.id"), primary_key=True),
+    db.Column("quantity", db.Integer, nullable=False, default=1, server_default="1"),
+    db.Column("unit_price", db.Float),
+    db.Index("ix_service_inventory_inventory_id", "inventory_id", "service_ticket_id"),
 )
 
 class Customer(db.Model):
@@ -38,6 +46,12 @@ class Customer(db.Model):
 
 class ServiceTicket(db.Model):
     __tablename__ = "service_tickets"
+    __table_args__ = (
+        # date filters and the (service_date, id) keyset order of the listing
+        db.Index("ix_service_tickets_service_date_id", "service_date", "id"),
+        # a customer's tickets, optionally within a date range, in listing order
+        db.Index("ix_service_tickets_customer_date", "customer_id", "service_date", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     service_date = db.Column(db.Date, nullable=False)
@@ -55,14 +69,54 @@ class Mechanic(db.Model):
     specialization = db.Column(db.String(255), nullable=False)
     experience = db.Column(db.Integer, nullable=False)
     email = db.Column(db.String(360), nullable=False, unique=True)
+    # denormalized count of service_mechanic rows, kept in step by app.ranking
+    ticket_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     service_tickets = db.relationship("ServiceTicket", secondary=Service_Mechanic, back_populates="mechanics")
 
+# serves /mechanics/ranking as an index scan (ORDER BY ticket_count DESC, id LIMIT n)
+db.Index("ix_mechanics_ranking", Mechanic.ticket_count.desc(), Mechanic.id)
+# ?specialization=...&experience[gte]=... on GET /mechanics
+db.Index("ix_mechanics_specialization_experience", Mechanic.specialization, Mechanic.experience)
+
 class Inventory(db.Model):
     __tablename__ = "inventory"
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
+
+    service_tickets = db.relationship("ServiceTicket", secondary=Service_Inventory, back_populates="inventory")
+
+# Daily rollups for /reports, kept current by app.rollups whenever tickets,
+# assignments or parts change and rebuilt with `flask rebuild-rollups`.
+class DailyRevenue(db.Model):
+    __tablename__ = "daily_revenue"
+
+    day = db.Column(db.Date, primary_key=True)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    part_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class DailyMechanicWorkload(db.Model):
+    __tablename__ = "daily_mechanic_workload"
+
+    day = db.Column(db.Date, primary_key=True)
+    mechanic_id = db.Column(db.Integer, primary_key=True)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyPartUsage(db.Model):
+    __tablename__ = "daily_part_usage"
+
+    day = db.Column(db.Date, primary_key=True)
+    inventory_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+# Logged-out bearer tokens by SHA-256 digest, rejected until they would
+# have expired (only checked with AUTH_REVOCATION_CHECK); see app.auth
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_tokens"
 
-    service_tickets = db.relationship("ServiceTicket", secondary=Service_Inventory, back_populates="inventory")
\ No newline at end of file
+    digest = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
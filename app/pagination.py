@@ -0,0 +1,201 @@
+"""Keyset (cursor) pagination shared by the collection routes.
+
+Pages are addressed by an opaque cursor that encodes the sort key of the
+row on the page boundary, so the database seeks straight to it through
+the index instead of counting past ``OFFSET`` rows.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import date
+from urllib.parse import urlencode
+
+from flask import current_app, request
+from sqlalchemy import and_, func, or_, select, tuple_
+
+from app.extensions import db
+from app.serialization import returns_entities
+
+
+class CursorError(ValueError):
+    """Raised for a cursor we cannot decode or paging arguments we do not accept."""
+
+
+@dataclass
+class Page:
+    items: list
+    limit: int
+    next_cursor: str = None
+    prev_cursor: str = None
+    total: int = None
+    headers: dict = field(default_factory=dict)
+
+
+def _to_json(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _from_json(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def _sort_signature(order_by):
+    return ','.join(f"{'-' if desc else ''}{col.key}" for col, desc in order_by)
+
+
+def encode_cursor(order_by, item, direction='next'):
+    payload = {
+        'd': direction,
+        'k': _sort_signature(order_by),
+        'v': [_to_json(getattr(item, col.key)) for col, _ in order_by],
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(order_by, token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        direction, signature, values = payload['d'], payload['k'], payload['v']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise CursorError('Invalid cursor')
+    if direction not in ('next', 'prev') or signature != _sort_signature(order_by):
+        raise CursorError('Cursor does not match this listing')
+    if not isinstance(values, list) or len(values) != len(order_by):
+        raise CursorError('Invalid cursor')
+    try:
+        values = [_from_json(col, v) for (col, _), v in zip(order_by, values)]
+    except (TypeError, ValueError):
+        raise CursorError('Invalid cursor')
+    return direction, values
+
+
+def _seek(order_by, values, backwards):
+    # A row-value comparison lets the planner use a composite index directly;
+    # mixed sort directions need the expanded (a > x) OR (a = x AND b > y) form.
+    directions = {desc for _, desc in order_by}
+    if len(directions) == 1:
+        descending = directions.pop() != backwards
+        columns = tuple_(*(col for col, _ in order_by))
+        return columns < tuple_(*values) if descending else columns > tuple_(*values)
+
+    clauses = []
+    for i, (col, desc) in enumerate(order_by):
+        descending = desc != backwards
+        step = col < values[i] if descending else col > values[i]
+        ties = [c == v for (c, _), v in zip(order_by[:i], values[:i])]
+        clauses.append(and_(*ties, step))
+    return or_(*clauses)
+
+
+def _ordering(order_by, backwards):
+    return [col.asc() if desc == backwards else col.desc() for col, desc in order_by]
+
+
+def limit_arg(name='limit', default=None):
+    """``?<name>`` as a page size capped at PAGINATION_MAX_LIMIT, or ``default``.
+
+    Raises CursorError unless the value is a positive integer.
+    """
+    raw = request.args.get(name)
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise CursorError(f'{name} must be a positive integer')
+    return min(limit, current_app.config.get('PAGINATION_MAX_LIMIT', 500))
+
+
+def page_args(default_limit=None):
+    """Read ``cursor``, ``limit`` and ``include_total`` from the query string."""
+    if 'page' in request.args:
+        # page numbers from the old offset API would silently return page 1
+        raise CursorError('page is not supported: pass the next_cursor of the previous response as cursor')
+    config = current_app.config
+    default_limit = default_limit or config.get('PAGINATION_DEFAULT_LIMIT', 50)
+
+    limit = limit_arg('limit')
+    if limit is None:
+        # per_page is accepted for clients written against the old offset API
+        limit = limit_arg('per_page', min(default_limit, config.get('PAGINATION_MAX_LIMIT', 500)))
+
+    include_total = request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
+    return {
+        'cursor': request.args.get('cursor') or None,
+        'limit': limit,
+        'include_total': include_total,
+    }
+
+
+def _page_url(cursor):
+    args = request.args.to_dict()
+    args['cursor'] = cursor
+    return f"{request.base_url}?{urlencode(args)}"
+
+
+def _page_headers(page):
+    headers = {}
+    links = []
+    if page.next_cursor:
+        headers['X-Next-Cursor'] = page.next_cursor
+        links.append(f'<{_page_url(page.next_cursor)}>; rel="next"')
+    if page.prev_cursor:
+        headers['X-Prev-Cursor'] = page.prev_cursor
+        links.append(f'<{_page_url(page.prev_cursor)}>; rel="prev"')
+    if links:
+        headers['Link'] = ', '.join(links)
+    if page.total is not None:
+        headers['X-Total-Count'] = str(page.total)
+    return headers
+
+
+def keyset_paginate(stmt, order_by, cursor=None, limit=50, include_total=False):
+    """Fetch one page of ``stmt`` ordered by ``order_by``.
+
+    ``order_by`` is a list of ``(column, descending)`` pairs whose last entry
+    must be unique (normally the primary key) so every row has a distinct
+    position. ``COUNT(*)`` is only run when ``include_total`` is set.
+    ``stmt`` may select an entity or plain columns (``RowSerializer.select``);
+    the page items are objects or rows accordingly, and a column select has
+    to include every ``order_by`` column.
+    """
+    backwards = False
+    query = stmt
+    if cursor:
+        direction, values = decode_cursor(order_by, cursor)
+        backwards = direction == 'prev'
+        query = query.where(_seek(order_by, values, backwards))
+
+    query = query.order_by(*_ordering(order_by, backwards)).limit(limit + 1)
+    result = db.session.execute(query)
+    items = (result.scalars() if returns_entities(stmt) else result).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    if backwards:
+        items.reverse()
+
+    page = Page(items=items, limit=limit)
+    if items:
+        if has_more or backwards:
+            page.next_cursor = encode_cursor(order_by, items[-1], 'next')
+        if (has_more and backwards) or (cursor and not backwards):
+            page.prev_cursor = encode_cursor(order_by, items[0], 'prev')
+
+    if include_total:
+        counted = select(func.count()).select_from(stmt.order_by(None).subquery())
+        page.total = db.session.scalar(counted)
+
+    page.headers = _page_headers(page)
+    return page
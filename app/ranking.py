@@ -0,0 +1,38 @@
+"""Maintenance of the denormalized ``Mechanic.ticket_count`` column.
+
+Routes that link or unlink mechanics call ``adjust_ticket_counts`` in the
+same transaction as the association change, so ``/mechanics/ranking`` can
+read the counts from an index instead of grouping ``service_mechanic``.
+``reconcile_ticket_counts`` recomputes them from the association table.
+"""
+from sqlalchemy import func, select, update
+
+from app.extensions import db
+from app.models import Mechanic, Service_Mechanic
+
+
+def adjust_ticket_counts(added=(), removed=()):
+    """+1 for every mechanic id in ``added``, -1 for every id in ``removed``."""
+    for ids, delta in ((added, 1), (removed, -1)):
+        if ids:
+            db.session.execute(
+                update(Mechanic)
+                .where(Mechanic.id.in_(ids))
+                .values(ticket_count=Mechanic.ticket_count + delta),
+                execution_options={'synchronize_session': False},
+            )
+
+
+def reconcile_ticket_counts(mechanic_ids=None):
+    """Recount from ``service_mechanic``; all mechanics when ids is None."""
+    count = (
+        select(func.count())
+        .select_from(Service_Mechanic)
+        .where(Service_Mechanic.c.mechanic_id == Mechanic.id)
+        .scalar_subquery()
+    )
+    stmt = update(Mechanic).values(ticket_count=count)
+    if mechanic_ids is not None:
+        stmt = stmt.where(Mechanic.id.in_(mechanic_ids))
+    result = db.session.execute(stmt, execution_options={'synchronize_session': False})
+    return result.rowcount
@@ -0,0 +1,152 @@
+"""Rate-limit counters shared by every worker process on a host.
+
+Importing this module registers a ``sqlite://`` storage scheme with the
+``limits`` package, so Flask-Limiter can be pointed at a local file::
+
+    RATELIMIT_STORAGE_URI = 'sqlite:////tmp/mechanic_api_ratelimit.db'
+
+With ``memory://`` each gunicorn worker keeps its own counters and a
+``5 per day`` limit really allows five per worker. Here every worker
+increments the same row in one ``INSERT ... ON CONFLICT ... RETURNING``
+statement, so limits hold across workers without an external service.
+Counters need no durability (see shared_sqlite.py for the file settings).
+
+``RATELIMIT_STORAGE_OPTIONS = {'flush_interval': seconds}`` batches
+updates instead: hits are counted in memory and written for all keys in
+one transaction by the first hit after each interval. A worker then sees
+the others' hits only as of its last flush, so a limit can be exceeded
+by up to the hits each worker takes in one interval. Keep it at 0 (write
+every hit) unless the limiter shows up in profiles.
+
+Only the fixed-window strategy (Flask-Limiter's default) is supported.
+"""
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+
+from app.shared_sqlite import SharedSQLite
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS ratelimit_counters (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID
+'''
+
+# A row whose window has ended starts over instead of being incremented.
+# SET expressions all see the row's old values.
+_INCR = '''
+INSERT INTO ratelimit_counters (key, count, expires_at) VALUES (?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    count = CASE WHEN expires_at <= ? THEN excluded.count ELSE count + excluded.count END,
+    expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+RETURNING count, expires_at
+'''
+
+# seconds between sweeps of expired rows
+PURGE_INTERVAL = 60
+
+
+class SQLiteStorage(Storage):
+    """``limits`` storage backed by a SQLite file (``sqlite:///<path>``)."""
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, flush_interval=0, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.db = SharedSQLite(uri[len('sqlite:///'):])
+        self.flush_interval = float(flush_interval)
+        self._lock = threading.Lock()
+        # batched mode: key -> [hits not yet written, expires_at] and
+        # key -> (count, expires_at) as of the last flush
+        self._pending = {}
+        self._seen = {}
+        self._last_flush = time.time()
+        self._last_purge = 0.0
+        self.db.execute(_SCHEMA)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _write(self, hits, now):
+        """Apply ``{key: (amount, expires_at)}``; returns ``{key: (count, expires_at)}``."""
+        counts = {}
+        with self.db.transaction() as connection:
+            for key, (amount, expires_at) in hits.items():
+                counts[key] = connection.execute(_INCR, (key, amount, expires_at, now, now)).fetchone()
+            if now - self._last_purge >= PURGE_INTERVAL:
+                connection.execute('DELETE FROM ratelimit_counters WHERE expires_at <= ?', (now,))
+                self._last_purge = now
+        return counts
+
+    def flush(self):
+        """Write batched hits now (a no-op when every hit is written)."""
+        with self._lock:
+            self._flush(time.time())
+
+    def _flush(self, now):
+        pending, self._pending = self._pending, {}
+        self._last_flush = now
+        if pending:
+            self._seen.update(self._write(pending, now))
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        if not self.flush_interval:
+            return self._write({key: (amount, now + expiry)}, now)[key][0]
+
+        with self._lock:
+            count, expires_at = self._seen.get(key, (0, 0.0))
+            if expires_at <= now:
+                count, expires_at = 0, now + expiry
+                self._seen[key] = (count, expires_at)
+            entry = self._pending.setdefault(key, [0, expires_at])
+            entry[0] += amount
+            total = count + entry[0]
+            if now - self._last_flush >= self.flush_interval:
+                self._flush(now)
+                total = self._seen[key][0]
+            return total
+
+    def _row(self, key):
+        row = self.db.execute(
+            'SELECT count, expires_at FROM ratelimit_counters WHERE key = ? AND expires_at > ?',
+            (key, time.time())).fetchone()
+        return row or (0, time.time())
+
+    def get(self, key):
+        count, _ = self._row(key)
+        if self.flush_interval:
+            with self._lock:
+                count += self._pending.get(key, (0,))[0]
+        return count
+
+    def get_expiry(self, key):
+        if self.flush_interval:
+            with self._lock:
+                if key in self._pending:
+                    return self._pending[key][1]
+        return self._row(key)[1]
+
+    def check(self):
+        try:
+            self.db.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            self._seen.clear()
+        return self.db.execute('DELETE FROM ratelimit_counters').rowcount
+
+    def clear(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+            self._seen.pop(key, None)
+        self.db.execute('DELETE FROM ratelimit_counters WHERE key = ?', (key,))
@@ -0,0 +1,139 @@
+"""Maintenance of the daily rollup tables behind ``/reports``.
+
+A rollup row only depends on the tickets of its own day, so routes that
+change tickets, assignments or parts call ``refresh_days`` in the same
+transaction and just those days are re-aggregated from the raw tables.
+That keeps every write O(tickets that day) however much history there is,
+and a rollup can never drift by a missed +1/-1 the way a delta would.
+``rebuild_rollups`` recomputes every day, for the backfill command and
+migration 6.
+
+Rows are written with ``INSERT ... SELECT ... ON CONFLICT DO UPDATE`` and
+only the keys the source no longer has are deleted, so two transactions
+refreshing the same day both succeed instead of one hitting the primary
+key. Other backends delete the days' rows and insert them again, which
+InnoDB serialises with its next-key locks.
+"""
+from sqlalchemy import delete, distinct, func, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.extensions import db
+from app.models import (
+    DailyMechanicWorkload,
+    DailyPartUsage,
+    DailyRevenue,
+    Inventory,
+    Service_Inventory,
+    Service_Mechanic,
+    ServiceTicket,
+)
+
+ROLLUP_TABLES = ('daily_revenue', 'daily_mechanic_workload', 'daily_part_usage')
+
+# keeps the IN lists of a large refresh within SQLite's bind limit
+_CHUNK = 500
+
+# backends whose insert() has on_conflict_do_update
+_UPSERT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+_line_total = Service_Inventory.c.quantity * func.coalesce(Service_Inventory.c.unit_price, Inventory.price)
+
+
+def _aggregates(days):
+    """(rollup model, INSERT ... SELECT source) pairs, limited to ``days``."""
+    day = ServiceTicket.service_date
+    revenue = (
+        select(
+            day,
+            func.count(distinct(ServiceTicket.id)),
+            func.coalesce(func.sum(Service_Inventory.c.quantity), 0),
+            func.coalesce(func.sum(_line_total), 0.0),
+        )
+        .select_from(ServiceTicket)
+        .outerjoin(Service_Inventory, Service_Inventory.c.service_ticket_id == ServiceTicket.id)
+        .outerjoin(Inventory, Inventory.id == Service_Inventory.c.inventory_id)
+        .group_by(day)
+    )
+    workload = (
+        select(day, Service_Mechanic.c.mechanic_id, func.count())
+        .select_from(ServiceTicket)
+        .join(Service_Mechanic, Service_Mechanic.c.service_ticket_id == ServiceTicket.id)
+        .group_by(day, Service_Mechanic.c.mechanic_id)
+    )
+    usage = (
+        select(day, Service_Inventory.c.inventory_id, func.sum(Service_Inventory.c.quantity), func.sum(_line_total))
+        .select_from(ServiceTicket)
+        .join(Service_Inventory, Service_Inventory.c.service_ticket_id == ServiceTicket.id)
+        .join(Inventory, Inventory.id == Service_Inventory.c.inventory_id)
+        .group_by(day, Service_Inventory.c.inventory_id)
+    )
+    sources = (
+        (DailyRevenue, ('day', 'ticket_count', 'part_count', 'revenue'), revenue),
+        (DailyMechanicWorkload, ('day', 'mechanic_id', 'ticket_count'), workload),
+        (DailyPartUsage, ('day', 'inventory_id', 'quantity', 'revenue'), usage),
+    )
+    for model, columns, source in sources:
+        if days is not None:
+            source = source.where(day.in_(days))
+        yield model, columns, source
+
+
+def _recompute(executor, days):
+    # a Session (so the view cache sees the writes) or a Connection
+    bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+    upsert = _UPSERT_INSERTS.get(bind.dialect.name)
+    for model, columns, source in _aggregates(days):
+        if upsert is None:
+            stmt = delete(model)
+            if days is not None:
+                stmt = stmt.where(model.day.in_(days))
+            executor.execute(stmt)
+            executor.execute(insert(model).from_select(columns, source))
+            continue
+
+        keys = [column.name for column in model.__table__.primary_key]
+        found = source.subquery()
+        stale = delete(model).where(
+            tuple_(*(model.__table__.c[key] for key in keys)).not_in(select(*list(found.c)[:len(keys)]))
+        )
+        if days is not None:
+            stale = stale.where(model.day.in_(days))
+        executor.execute(stale)
+        stmt = upsert(model).from_select(columns, source)
+        executor.execute(stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={column: stmt.excluded[column] for column in columns if column not in keys},
+        ))
+
+
+def refresh_days(days):
+    """Re-aggregate the rollups of ``days`` from the current session state."""
+    days = sorted(set(days))
+    if not days:
+        return
+    db.session.flush()
+    for start in range(0, len(days), _CHUNK):
+        _recompute(db.session, days[start:start + _CHUNK])
+
+
+def ticket_days(ticket_ids=None, mechanic_id=None, inventory_id=None, customer_id=None):
+    """Distinct service dates of the tickets selected by any one filter."""
+    stmt = select(distinct(ServiceTicket.service_date))
+    if ticket_ids is not None:
+        stmt = stmt.where(ServiceTicket.id.in_(ticket_ids))
+    if mechanic_id is not None:
+        stmt = stmt.join(Service_Mechanic, Service_Mechanic.c.service_ticket_id == ServiceTicket.id) \
+            .where(Service_Mechanic.c.mechanic_id == mechanic_id)
+    if inventory_id is not None:
+        stmt = stmt.join(Service_Inventory, Service_Inventory.c.service_ticket_id == ServiceTicket.id) \
+            .where(Service_Inventory.c.inventory_id == inventory_id)
+    if customer_id is not None:
+        stmt = stmt.where(ServiceTicket.customer_id == customer_id)
+    return db.session.scalars(stmt).all()
+
+
+def rebuild_rollups(connection=None):
+    """Recompute every rollup row; returns the number of days covered."""
+    executor = connection if connection is not None else db.session
+    _recompute(executor, None)
+    return executor.execute(select(func.count()).select_from(DailyRevenue)).scalar()
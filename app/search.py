@@ -0,0 +1,142 @@
+"""Type-ahead search for the ``GET /<resource>/search`` routes.
+
+SQLite gets one FTS5 table per searchable table, declared with
+``content=<table>`` so it stores only the index, not a second copy of the
+rows. Triggers on the base table keep it in step with every write path:
+ORM flushes, the executemany INSERTs of the bulk routes and raw SQL alike.
+PostgreSQL gets GIN trigram indexes instead, which the server maintains
+itself. Other backends fall back to an unindexed ``LIKE`` scan.
+
+Every backend splits ``q`` into the same word terms, and a row matches when
+each term starts a word in one of its search columns (FTS5 prefix queries
+on SQLite, case-insensitive word-start regexes on PostgreSQL; the ``LIKE``
+fallback can only look for the terms anywhere in a column).
+
+The indexes are created whenever ``db.create_all()`` runs (and by
+migration 3 for databases that predate them); an FTS table created over
+existing rows is rebuilt from them straight away.
+"""
+import re
+
+from flask import current_app, request
+from sqlalchemy import and_, event, func, or_, select, text
+
+from app.extensions import db
+
+# table -> columns matched by ?q=
+SEARCH_COLUMNS = {
+    'customers': ('name', 'email'),
+    'mechanics': ('name', 'specialization'),
+    'inventory': ('name',),
+}
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def _fts_ddl(table, columns):
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{c}' for c in columns)
+    old = ', '.join(f'old.{c}' for c in columns)
+    fts = f'{table}_fts'
+    delete = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f'INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});'
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN {delete} {insert} END',
+    ]
+
+
+def create_search_indexes(conn):
+    """Create (or complete) the search indexes on ``conn``. Idempotent."""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        for table, columns in SEARCH_COLUMNS.items():
+            fts = f'{table}_fts'
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': fts}
+            ).first()
+            if not exists:
+                # prefix indexes make 2- and 3-character type-ahead terms cheap
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, content='{table}', "
+                    f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                ))
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            for statement in _fts_ddl(table, columns):
+                conn.execute(text(statement))
+    elif dialect == 'postgresql':
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        for table, columns in SEARCH_COLUMNS.items():
+            for column in columns:
+                conn.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm '
+                    f'ON {table} USING gin ({column} gin_trgm_ops)'
+                ))
+
+
+def drop_search_indexes(conn):
+    # the triggers and trigram indexes go with their tables
+    if conn.dialect.name == 'sqlite':
+        for table in SEARCH_COLUMNS:
+            conn.execute(text(f'DROP TABLE IF EXISTS {table}_fts'))
+
+
+event.listen(db.metadata, 'after_create', lambda target, conn, **kw: create_search_indexes(conn))
+event.listen(db.metadata, 'before_drop', lambda target, conn, **kw: drop_search_indexes(conn))
+
+
+def search_limit():
+    """``?limit=`` clamped to ``SEARCH_MAX_LIMIT``."""
+    default = current_app.config.get('SEARCH_DEFAULT_LIMIT', 10)
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, current_app.config.get('SEARCH_MAX_LIMIT', 50)))
+
+
+def _fts_query(q):
+    # every term must match as a prefix; quoting keeps FTS5 operators inert
+    return ' '.join(f'"{term}"*' for term in _TERM.findall(q))
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _terms_match(columns, terms, dialect):
+    """Each of ``terms`` starts a word in at least one of ``columns``."""
+    if dialect == 'postgresql':
+        # terms are \w+ runs, so they need no regex escaping
+        return and_(*(or_(*(column.regexp_match(rf'\m{term}', flags='i') for column in columns))
+                      for term in terms))
+    return and_(*(or_(*(column.ilike(_like_pattern(term), escape='\\') for column in columns)) for term in terms))
+
+
+def search(model, q, limit=10):
+    """Up to ``limit`` rows of ``model`` matching ``q``, best match first."""
+    table = model.__table__.name
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS[table]]
+    q = (q or '').strip()
+    if not _TERM.search(q):
+        return []
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        fts = f'{table}_fts'
+        # rank (bm25) orders the hits before the limit, so a broad prefix
+        # returns its best matches rather than its lowest ids
+        stmt = text(
+            f'SELECT {table}.* FROM (SELECT rowid, rank FROM {fts} WHERE {fts} MATCH :match '
+            f'ORDER BY rank, rowid LIMIT :limit) AS hits '
+            f'JOIN {table} ON {table}.id = hits.rowid ORDER BY hits.rank, {table}.id'
+        )
+        stmt = select(model).from_statement(stmt.bindparams(match=_fts_query(q), limit=limit))
+        return db.session.scalars(stmt).all()
+
+    stmt = select(model).where(_terms_match(columns, _TERM.findall(q), dialect)).limit(limit)
+    if dialect == 'postgresql':
+        score = func.greatest(*(func.similarity(column, q) for column in columns))
+        stmt = stmt.order_by(score.desc(), model.id)
+    else:
+        stmt = stmt.order_by(model.id)
+    return db.session.scalars(stmt).all()
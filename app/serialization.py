@@ -0,0 +1,83 @@
+"""ORM-free serialization for the read-only list routes.
+
+``RowSerializer`` is built once from a model schema. It selects only the
+columns the schema dumps, through Core, and turns each result row into
+the same dict ``schema.dump`` would produce for the ORM object, without
+hydrating objects into the identity map or walking marshmallow's field
+machinery per row. Only schemas made of plain column fields qualify;
+anything else (nested, method, load-only) is rejected when the
+serializer is built, not at request time.
+"""
+from marshmallow import fields
+from sqlalchemy import select
+
+
+def _iso(value):
+    return value.isoformat()
+
+
+# (field classes, converter, python type the converter produces); Email is
+# a String. Date/DateTime qualify only with the default ISO format.
+_CONVERTERS = (
+    ((fields.Date, fields.DateTime, fields.Time), _iso, str),
+    (fields.Float, float, float),
+    (fields.Integer, int, int),
+    (fields.String, str, str),
+)
+
+
+def returns_entities(stmt):
+    """True when ``stmt`` selects a single ORM entity (use ``.scalars()``)."""
+    descriptions = stmt.column_descriptions
+    return len(descriptions) == 1 and descriptions[0].get('entity') is not None \
+        and descriptions[0]['expr'] is descriptions[0]['entity']
+
+
+class RowSerializer:
+    """Precompiled ``schema.dump`` for rows of ``serializer.select()``."""
+
+    def __init__(self, schema):
+        model = schema.opts.model
+        self.schema_name = type(schema).__name__
+        self.keys = []
+        self.attributes = []
+        conversions = []
+        for name, field in schema.dump_fields.items():
+            attribute = field.attribute or name
+            column = model.__table__.columns.get(attribute)
+            match = next((c for c in _CONVERTERS if isinstance(field, c[0])), None)
+            if getattr(field, 'format', None) not in (None, 'iso'):
+                match = None
+            if column is None or match is None:
+                raise TypeError(f'{self.schema_name}.{name} is not a plain column field')
+            _, convert, produces = match
+            # marshmallow would call e.g. int() on an int; skip the no-ops
+            if column.type.python_type is not produces:
+                conversions.append((len(self.keys), field.data_key or name, convert))
+            self.keys.append(field.data_key or name)
+            self.attributes.append(getattr(model, attribute))
+        self.dump = self._compile(tuple(self.keys), tuple(conversions))
+
+    @staticmethod
+    def _compile(keys, conversions):
+        if not conversions:
+            def dump(row):
+                return dict(zip(keys, row))
+            return dump
+
+        def dump(row):
+            out = dict(zip(keys, row))
+            for index, key, convert in conversions:
+                value = row[index]
+                if value is not None:
+                    out[key] = convert(value)
+            return out
+        return dump
+
+    def select(self):
+        """A Core ``select`` of exactly the dumped columns, in dump order."""
+        return select(*self.attributes)
+
+    def dump_many(self, rows):
+        dump = self.dump
+        return [dump(row) for row in rows]
@@ -0,0 +1,52 @@
+"""Connections to a SQLite file shared by the worker processes on a host.
+
+Used by the rate-limit storage (ratelimit.py) and the view cache backend
+(cache_backend.py). Their data is disposable, so the file runs in WAL
+mode with ``synchronous=OFF``: readers never wait for the writer and no
+write waits for an fsync.
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+
+
+class SharedSQLite:
+    """One connection per thread and process to the database at ``path``.
+
+    With ``:memory:`` every connection, hence every thread, gets its own
+    empty database; only useful for single-threaded tests.
+    """
+
+    def __init__(self, path, timeout=5):
+        self.path = path or ':memory:'
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connection(self):
+        # reopened after a fork: gunicorn --preload builds the app, and with
+        # it these objects, in the master before starting the workers
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            if self.path != ':memory:':
+                connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def execute(self, sql, parameters=()):
+        return self.connection().execute(sql, parameters)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run the block as one write transaction, taking the lock up front."""
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
@@ -0,0 +1,40 @@
+"""Streaming NDJSON export for the collection routes.
+
+Rows are pulled from a server-side cursor in ``STREAM_BATCH_SIZE`` batches
+and written one JSON document per line, so memory use and time to first
+byte do not grow with the size of the table.
+"""
+from flask import Response, current_app, request, stream_with_context
+
+from app.extensions import db
+from app.serialization import returns_entities
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson():
+    """True when the client asked for a stream via Accept or ``?stream=1``."""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return NDJSON_MIMETYPE in request.headers.get('Accept', '')
+
+
+def ndjson_response(stmt, schema):
+    """Stream every row of ``stmt`` through ``schema`` as NDJSON.
+
+    ``schema`` must be the single-object schema (``many=False``), or the
+    ``RowSerializer`` whose ``select()`` ``stmt`` was built from.
+    """
+    batch_size = current_app.config.get('STREAM_BATCH_SIZE', 500)
+    dumps = current_app.json.dumps
+
+    def generate():
+        # yield_per turns on stream_results, so drivers that support it use a
+        # server-side cursor instead of buffering the whole result set.
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        if returns_entities(stmt):
+            result = result.scalars()
+        for batch in result.partitions():
+            yield ''.join(dumps(schema.dump(row)) + '\n' for row in batch)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
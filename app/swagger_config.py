@@ -43,7 +43,8 @@ swagger_config = {
                 "name": {"type": "string"},
                 "email": {"type": "string"},
                 "specialization": {"type": "string"},
-                "experience": {"type": "integer"}
+                "experience": {"type": "integer"},
+                "ticket_count": {"type": "integer"}
             }
         },
         "MechanicInput": {
@@ -64,6 +65,35 @@ swagger_config = {
                 "customer_id": {"type": "integer"}
             }
         },
+        "ServiceTicketDetail": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "integer"},
+                "service_date": {"type": "string", "format": "date"},
+                "customer_id": {"type": "integer"},
+                "mechanics": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "name": {"type": "string"}
+                        }
+                    }
+                },
+                "inventory": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "name": {"type": "string"},
+                            "price": {"type": "number"}
+                        }
+                    }
+                }
+            }
+        },
         "ServiceTicketInput": {
             "type": "object",
             "required": ["service_date", "customer_id"],
@@ -96,6 +126,73 @@ swagger_config = {
                 "password": {"type": "string"}
             }
         },
+        "Invoice": {
+            "type": "object",
+            "properties": {
+                "ticket_id": {"type": "integer"},
+                "service_date": {"type": "string", "format": "date"},
+                "customer_id": {"type": "integer"},
+                "lines": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "part_id": {"type": "integer"},
+                            "name": {"type": "string"},
+                            "quantity": {"type": "integer"},
+                            "unit_price": {"type": "number", "format": "float"},
+                            "line_total": {"type": "number", "format": "float"}
+                        }
+                    }
+                },
+                "item_count": {"type": "integer"},
+                "total": {"type": "number", "format": "float"}
+            }
+        },
+        "TicketTotals": {
+            "type": "object",
+            "properties": {
+                "totals": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "ticket_id": {"type": "integer"},
+                            "line_count": {"type": "integer"},
+                            "item_count": {"type": "integer"},
+                            "total": {"type": "number", "format": "float"}
+                        }
+                    }
+                },
+                "missing_ids": {"type": "array", "items": {"type": "integer"}}
+            }
+        },
+        "Report": {
+            "type": "object",
+            "properties": {
+                "start": {"type": "string", "format": "date"},
+                "end": {"type": "string", "format": "date"},
+                "bucket": {"type": "string", "enum": ["day", "week", "month"]},
+                "rows": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "description": "period (first day of the bucket), the report's keys and its measures"
+                    }
+                }
+            }
+        },
+        "BulkResult": {
+            "type": "object",
+            "properties": {
+                "created": {"type": "integer"},
+                "ids": {"type": "array", "items": {"type": "integer"}},
+                "errors": {
+                    "type": "object",
+                    "description": "Validation messages keyed by the index of the rejected row"
+                }
+            }
+        },
         "Error": {
             "type": "object",
             "properties": {
@@ -0,0 +1 @@
+"""Stand-alone performance benchmarks; run each module with ``python -m``."""
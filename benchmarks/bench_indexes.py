@@ -0,0 +1,149 @@
+"""Before/after timings for the hot-path indexes added by the migrations.
+
+Seeds a throwaway SQLite file with the current schema minus the indexes,
+times the hot queries, applies ``app.migrations.upgrade`` and times them
+again. Prints one JSON document::
+
+    python -m benchmarks.bench_indexes --tickets 200000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+
+from app.extensions import db
+from app.migrations import upgrade
+import app.models  # noqa: F401  (registers the tables on db.metadata)
+
+INDEXES = (
+    'ix_service_tickets_customer_date',
+    'ix_service_tickets_service_date_id',
+    'ix_service_mechanic_mechanic_id',
+    'ix_service_inventory_inventory_id',
+    'ix_mechanics_ranking',
+)
+
+QUERIES = {
+    'my_tickets': ('SELECT * FROM service_tickets WHERE customer_id = :customer', None),
+    'tickets_from_date_page': (
+        'SELECT * FROM service_tickets WHERE service_date >= :day ORDER BY service_date, id LIMIT 50', None),
+    'mechanic_tickets': ('SELECT service_ticket_id FROM service_mechanic WHERE mechanic_id = :mechanic', None),
+    'part_tickets': ('SELECT service_ticket_id FROM service_inventory WHERE inventory_id = :part', None),
+    'mechanic_ranking_top10': (
+        # before: what /mechanics/ranking used to run; after: the index scan
+        'SELECT mechanics.id, count(service_mechanic.service_ticket_id) AS n FROM mechanics'
+        ' LEFT OUTER JOIN service_mechanic ON mechanics.id = service_mechanic.mechanic_id'
+        ' GROUP BY mechanics.id ORDER BY n DESC LIMIT 10',
+        'SELECT id, ticket_count FROM mechanics ORDER BY ticket_count DESC, id LIMIT 10',
+    ),
+}
+
+
+def seed(engine, customers, tickets, mechanics, parts, rng):
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in INDEXES:
+            conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.executemany('INSERT INTO customers (id, name, email, password) VALUES (?, ?, ?, ?)',
+                        [(i, f'Customer {i}', f'c{i}@example.com', 'pw') for i in range(1, customers + 1)])
+        cur.executemany('INSERT INTO mechanics (id, name, specialization, experience, email, ticket_count)'
+                        ' VALUES (?, ?, ?, ?, ?, 0)',
+                        [(i, f'Mechanic {i}', 'Engine', i % 30, f'm{i}@example.com') for i in range(1, mechanics + 1)])
+        cur.executemany('INSERT INTO inventory (id, name, price) VALUES (?, ?, ?)',
+                        [(i, f'Part {i}', round(rng.uniform(1, 500), 2)) for i in range(1, parts + 1)])
+        start = date(2015, 1, 1)
+        ticket_rows, mech_rows, part_rows = [], [], []
+        for t in range(1, tickets + 1):
+            ticket_rows.append((t, (start + timedelta(days=rng.randrange(3650))).isoformat(),
+                                rng.randrange(1, customers + 1)))
+            for m in rng.sample(range(1, mechanics + 1), 2):
+                mech_rows.append((t, m))
+            for p in rng.sample(range(1, parts + 1), 3):
+                part_rows.append((t, p))
+        cur.executemany('INSERT INTO service_tickets (id, service_date, customer_id) VALUES (?, ?, ?)', ticket_rows)
+        cur.executemany('INSERT INTO service_mechanic (service_ticket_id, mechanic_id) VALUES (?, ?)', mech_rows)
+        cur.executemany('INSERT INTO service_inventory (service_ticket_id, inventory_id) VALUES (?, ?)', part_rows)
+        cur.execute('UPDATE mechanics SET ticket_count ='
+                    ' (SELECT count(*) FROM service_mechanic WHERE mechanic_id = mechanics.id)')
+        raw.commit()
+    finally:
+        raw.close()
+    with engine.begin() as conn:
+        conn.execute(text('ANALYZE'))
+
+
+def time_queries(engine, phase, params, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, (before_sql, after_sql) in QUERIES.items():
+            sql = text(after_sql if phase == 'after' and after_sql else before_sql)
+            samples = []
+            for bind in params[:repeat]:
+                t0 = time.perf_counter()
+                conn.execute(sql, bind).all()
+                samples.append((time.perf_counter() - t0) * 1000)
+            results[name] = round(statistics.median(samples), 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--tickets', type=int, default=200000)
+    parser.add_argument('--mechanics', type=int, default=100)
+    parser.add_argument('--parts', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        t0 = time.perf_counter()
+        seed(engine, args.customers, args.tickets, args.mechanics, args.parts, rng)
+        seeded = time.perf_counter() - t0
+
+        params = [{
+            'customer': rng.randrange(1, args.customers + 1),
+            'day': (date(2015, 1, 1) + timedelta(days=rng.randrange(3650))).isoformat(),
+            'mechanic': rng.randrange(1, args.mechanics + 1),
+            'part': rng.randrange(1, args.parts + 1),
+        } for _ in range(args.repeat)]
+
+        before = time_queries(engine, 'before', params, args.repeat)
+        t0 = time.perf_counter()
+        upgrade(engine)
+        migrated = time.perf_counter() - t0
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+        after = time_queries(engine, 'after', params, args.repeat)
+        engine.dispose()
+
+    report = {
+        'scale': {k: getattr(args, k) for k in ('customers', 'tickets', 'mechanics', 'parts')},
+        'seed_seconds': round(seeded, 2),
+        'migration_seconds': round(migrated, 2),
+        'median_ms': {
+            name: {
+                'before': before[name],
+                'after': after[name],
+                'speedup': round(before[name] / after[name], 1) if after[name] else None,
+            }
+            for name in QUERIES
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Response encoding: Flask's default provider against ``FastJSONProvider``.
+
+Encodes realistic ticket-detail and inventory list payloads (what the
+routes hand to ``jsonify``) with each provider, median of --repeat runs::
+
+    python -m benchmarks.bench_json --tickets 500 --parts 5000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.json_provider import FastJSONProvider, orjson
+
+
+def _payloads(tickets, parts, rng):
+    inventory = [{'id': i, 'name': f'Part {i}', 'price': round(rng.uniform(1, 500), 2)} for i in range(parts)]
+    mechanics = [{'id': i, 'name': f'Mechanic {i}', 'email': f'm{i}@example.com', 'specialization': 'Engine',
+                  'experience': i % 30, 'ticket_count': i % 97} for i in range(50)]
+    start = date(2024, 1, 1)
+    details = [{
+        'id': t,
+        'service_date': (start + timedelta(days=t % 365)).isoformat(),
+        'customer_id': t % 200,
+        'customer': {'id': t % 200, 'name': f'Customer {t % 200}', 'email': f'c{t % 200}@example.com',
+                     'phone': '555-0100', 'dob': '1990-02-28'},
+        'mechanics': rng.sample(mechanics, 2),
+        'inventory': rng.sample(inventory, 4),
+    } for t in range(tickets)]
+    # report rows carry real date objects until the provider formats them
+    report = [{'period': start + timedelta(days=d), 'ticket_count': d % 40, 'part_count': d % 90,
+               'revenue': round(rng.uniform(100, 9000), 2)} for d in range(365)]
+    return {'ticket_details': details, 'inventory': inventory, 'report': {'bucket': 'day', 'rows': report}}
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=500)
+    parser.add_argument('--parts', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    app = create_app('TestingConfig')
+    providers = {'flask_default': DefaultJSONProvider(app)}
+    for choice in ('stdlib', 'orjson') if orjson is not None else ('stdlib',):
+        app.config['JSON_ENCODER'] = choice
+        providers[choice] = FastJSONProvider(app)
+
+    results = {}
+    with app.test_request_context():
+        for name, payload in _payloads(args.tickets, args.parts, random.Random(args.seed)).items():
+            # report dates differ by design (HTTP date vs ISO 8601); compare the rest
+            baseline = json.loads(providers['flask_default'].dumps(payload)) if name != 'report' else None
+            row = {'bytes': len(providers['stdlib'].response(payload).get_data())}
+            for label, provider in providers.items():
+                if baseline is not None:
+                    assert json.loads(provider.dumps(payload)) == baseline, f'{label} {name} differs'
+                row[f'{label}_ms'] = round(_time(lambda: provider.response(payload), args.repeat), 3)
+            results[name] = row
+
+    print(json.dumps({'tickets': args.tickets, 'parts': args.parts, 'median': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Per-request rate limiter overhead for each storage backend.
+
+Times GET /health (which only carries the default limit) with the limiter
+disabled, on memory://, on the shared sqlite:// storage and on sqlite://
+with batched flushes, then times raw ``incr`` calls from --workers
+processes hitting one counter file at once::
+
+    python -m benchmarks.bench_limiter --requests 2000 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+from app import create_app
+from app.extensions import limiter
+from app.ratelimit import SQLiteStorage
+
+
+def _request_us(overrides, requests):
+    with mock.patch.multiple('config.TestingConfig', create=True, **overrides):
+        app = create_app('TestingConfig')
+    client = app.test_client()
+    samples = []
+    for i in range(requests):
+        if i % 90 == 0 and limiter.enabled:
+            limiter.reset()  # stay under "100 per hour" so every request takes the same path
+        t0 = time.perf_counter()
+        client.get('/health')
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+
+def _incr_rate(uri, flush_interval, calls):
+    storage = SQLiteStorage(uri, flush_interval=flush_interval)
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        storage.incr('bench', 3600)
+    storage.flush()
+    return calls / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--calls', type=int, default=5000)
+    parser.add_argument('--flush-interval', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        uri = f"sqlite:///{os.path.join(directory, 'limits.db')}"
+        batched = {'flush_interval': args.flush_interval}
+        backends = {
+            'disabled': {'RATELIMIT_ENABLED': False},
+            'memory': {'RATELIMIT_STORAGE_URI': 'memory://'},
+            'sqlite': {'RATELIMIT_STORAGE_URI': uri},
+            'sqlite_batched': {'RATELIMIT_STORAGE_URI': uri, 'RATELIMIT_STORAGE_OPTIONS': batched},
+        }
+        per_request = {name: _request_us(overrides, args.requests) for name, overrides in backends.items()}
+        overhead = {name: round(us - per_request['disabled'], 1) for name, us in per_request.items()}
+
+        concurrent = {}
+        with multiprocessing.get_context('fork').Pool(args.workers) as pool:
+            for name, interval in (('sqlite', 0), ('sqlite_batched', args.flush_interval)):
+                rates = pool.starmap(_incr_rate, [(uri, interval, args.calls)] * args.workers)
+                concurrent[name] = round(sum(rates))
+        hits = SQLiteStorage(uri).get('bench')
+
+    print(json.dumps({
+        'median_request_us': {name: round(us, 1) for name, us in per_request.items()},
+        'limiter_overhead_us': overhead,
+        f'incr_per_second_{args.workers}_workers': concurrent,
+        'hits_recorded': hits,
+        'hits_expected': 2 * args.workers * args.calls,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""Load test: every blueprint route served over HTTP at several data scales.
+
+For each --scales entry (service tickets; customers are a tenth of that)
+seeds a throwaway SQLite file with ``bench_indexes.seed`` plus the
+migrations and rollups, starts the app on a threaded local WSGI server in a
+child process, and sends --requests requests per route from --concurrency
+client threads over keep-alive connections (``http.client``). Reports
+throughput and p50/p95/p99 latency per route as JSON::
+
+    python -m benchmarks.bench_load --scales 10000,100000 --requests 200 --output load.json
+    python -m benchmarks.bench_load --baseline load.json  # exit 1 on p95 regressions
+
+Rate limits are off, token revocation checks are on (so logout does real
+work) and the view cache runs as configured (--no-cache turns it off), so
+repeated GETs of one URL measure cache hits. Writes run
+after the reads and only touch rows the run itself created, except for
+assign/add-part, which link them to seeded mechanics and parts.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.bench_indexes import seed
+
+MECHANICS = 100
+PARTS = 2000
+
+
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def prepare(path, tickets, rng):
+    """Seed ``path`` at this scale; returns the row counts."""
+    from app.migrations import upgrade
+    from app.rollups import rebuild_rollups
+
+    scale = {'customers': max(tickets // 10, 10), 'tickets': tickets, 'mechanics': MECHANICS, 'parts': PARTS}
+    engine = create_engine(f'sqlite:///{path}')
+    seed(engine, scale['customers'], tickets, MECHANICS, PARTS, rng)
+    upgrade(engine)
+    with engine.begin() as conn:
+        rebuild_rollups(conn)
+        conn.execute(text('ANALYZE'))
+    engine.dispose()
+    return scale
+
+
+def _serve(path, cache, ready):
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    overrides = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'RATELIMIT_ENABLED': False, 'TESTING': False,
+                 'AUTH_REVOCATION_CHECK': True}
+    if not cache:
+        overrides['CACHE_TYPE'] = 'NullCache'
+    with mock.patch.multiple('config.TestingConfig', create=True, **overrides):
+        app = create_app('TestingConfig')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    ready.send(server.server_port)
+    server.serve_forever()
+
+
+class Client:
+    """One keep-alive connection per client thread."""
+
+    def __init__(self, port):
+        self.port = port
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        """Returns (status, decoded JSON body or None, seconds)."""
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in (0, 1):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            try:
+                t0 = time.perf_counter()
+                connection.request(method, path, payload, headers)
+                response = connection.getresponse()
+                data = response.read()
+                elapsed = time.perf_counter() - t0
+            except (ConnectionError, http.client.HTTPException):
+                # the server closed an idle keep-alive connection; retry once on a new one
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+                continue
+            if response.getheader('Connection', '').lower() == 'close':
+                connection.close()
+                self._local.connection = None
+            try:
+                parsed = json.loads(data) if data else None
+            except ValueError:
+                parsed = None
+            return response.status, parsed, elapsed
+
+
+def routes(scale, run):
+    """(name, method, request builder, collect) per route, in the order they run.
+
+    A builder maps the request number and the response bodies collected so
+    far to (path, body, headers); ``collect`` names the list in which the
+    route's successful responses are kept for the routes after it.
+    """
+    customers, tickets = scale['customers'], scale['tickets']
+    window = 'start=2015-01-01&end=2024-12-31&bucket=month'
+
+    def spread(i, n):
+        return 1 + (i * 7919) % n
+
+    def get(path):
+        return lambda i, ctx: (path(i), None, {})
+
+    def created(ctx, key, i):
+        return ctx[key][i % len(ctx[key])] if ctx[key] else {'id': 0, 'email': '', 'token': ''}
+
+    def auth(i, ctx):
+        return {'Authorization': f"Bearer {created(ctx, 'tokens', i)['token']}"}
+
+    def customer(i, k=''):
+        return {'name': f'Load {i}{k}', 'email': f'load{run}-{i}{k}@example.com', 'password': 'pw'}
+
+    def mechanic(i, k=''):
+        return {'name': f'Load {i}{k}', 'email': f'load{run}-{i}{k}@example.com', 'specialization': 'Engine',
+                'experience': i % 30}
+
+    def update(key, resource, **changes):
+        def build(i, ctx):
+            row = created(ctx, key, i)
+            body = {field: value for field, value in row.items() if field in ('name', 'email', 'specialization',
+                                                                              'experience', 'price')}
+            return f"/{resource}/{row['id']}", {**body, **changes}, {}
+        return build
+
+    def remove(key, resource):
+        return lambda i, ctx: (f"/{resource}/{created(ctx, key, i)['id']}", None, {})
+
+    def on_ticket(action):
+        return lambda i, ctx: (f"/service-tickets/{created(ctx, 'tickets', i)['id']}/{action(i)}", None, {})
+
+    return [
+        # reads
+        ('GET /customers/', 'GET', get(lambda i: f'/customers/?limit={10 + i % 41}'), None),
+        ('GET /customers/search', 'GET', get(lambda i: f'/customers/search?q=Customer {spread(i, customers)}'), None),
+        ('GET /customers/<id>', 'GET', get(lambda i: f'/customers/{spread(i, customers)}'), None),
+        ('POST /customers/login', 'POST',
+         lambda i, ctx: ('/customers/login', {'email': f'c{spread(i, customers)}@example.com', 'password': 'pw'}, {}),
+         'tokens'),
+        ('GET /customers/my-tickets', 'GET', lambda i, ctx: ('/customers/my-tickets', None, auth(i, ctx)), None),
+        ('GET /mechanics/', 'GET', get(lambda i: f'/mechanics/?limit={10 + i % 41}'), None),
+        ('GET /mechanics/search', 'GET', get(lambda i: f'/mechanics/search?q=Mech {spread(i, MECHANICS)}'), None),
+        ('GET /mechanics/<id>', 'GET', get(lambda i: f'/mechanics/{spread(i, MECHANICS)}'), None),
+        ('GET /mechanics/ranking', 'GET', get(lambda i: f'/mechanics/ranking?limit={1 + i % 20}'), None),
+        ('GET /inventory/', 'GET', get(lambda i: f'/inventory/?limit={10 + i % 41}'), None),
+        ('GET /inventory/search', 'GET', get(lambda i: f'/inventory/search?q=Part {spread(i, PARTS)}'), None),
+        ('GET /inventory/<id>', 'GET', get(lambda i: f'/inventory/{spread(i, PARTS)}'), None),
+        ('GET /service-tickets/', 'GET', get(lambda i: f'/service-tickets/?limit={10 + i % 41}'), None),
+        ('GET /service-tickets/?expand', 'GET', get(lambda i: f'/service-tickets/?expand=true&limit={10 + i % 41}'), None),
+        ('GET /service-tickets/<id>/invoice', 'GET', get(lambda i: f'/service-tickets/{spread(i, tickets)}/invoice'), None),
+        ('GET /service-tickets/totals', 'GET',
+         get(lambda i: '/service-tickets/totals?ids=' + ','.join(str(spread(i + k, tickets)) for k in range(20))), None),
+        ('GET /reports/revenue', 'GET', get(lambda i: f'/reports/revenue?{window}'), None),
+        ('GET /reports/mechanic-workload', 'GET',
+         get(lambda i: f'/reports/mechanic-workload?{window}&mechanic_id={spread(i, MECHANICS)}'), None),
+        ('GET /reports/parts-usage', 'GET',
+         get(lambda i: f'/reports/parts-usage?{window}&inventory_id={spread(i, PARTS)}'), None),
+        # writes, on rows this run creates
+        ('POST /customers/', 'POST', lambda i, ctx: ('/customers/', customer(i), {}), 'customers'),
+        ('POST /customers/bulk', 'POST',
+         lambda i, ctx: ('/customers/bulk', [customer(i, f'-{k}') for k in range(10)], {}), None),
+        ('PUT /customers/<id>', 'PUT', update('customers', 'customers', password='pw2'), None),
+        ('POST /mechanics/', 'POST', lambda i, ctx: ('/mechanics/', mechanic(i), {}), 'mechanics'),
+        ('POST /mechanics/bulk', 'POST',
+         lambda i, ctx: ('/mechanics/bulk', [mechanic(i, f'-{k}') for k in range(10)], {}), None),
+        ('PUT /mechanics/<id>', 'PUT', update('mechanics', 'mechanics', specialization='Brakes'), None),
+        ('POST /inventory/', 'POST', lambda i, ctx: ('/inventory/', {'name': f'Load part {i}', 'price': 10 + i % 90}, {}),
+         'parts'),
+        ('POST /inventory/bulk', 'POST',
+         lambda i, ctx: ('/inventory/bulk', [{'name': f'Load part {i}-{k}', 'price': 5 + k} for k in range(10)], {}), None),
+        ('PUT /inventory/<id>', 'PUT', update('parts', 'inventory', price=99.0), None),
+        ('POST /service-tickets/', 'POST',
+         lambda i, ctx: ('/service-tickets/', {'service_date': date.today().isoformat(),
+                                               'customer_id': spread(i, customers)}, {}),
+         'tickets'),
+        ('PUT /service-tickets/<id>/assign-mechanic', 'PUT',
+         on_ticket(lambda i: f'assign-mechanic/{spread(i, MECHANICS)}'), None),
+        ('PUT /service-tickets/<id>/remove-mechanic', 'PUT',
+         on_ticket(lambda i: f'remove-mechanic/{spread(i, MECHANICS)}'), None),
+        ('PUT /service-tickets/<id>/edit', 'PUT',
+         lambda i, ctx: (f"/service-tickets/{created(ctx, 'tickets', i)['id']}/edit",
+                         {'add_ids': [spread(i + 1, MECHANICS)], 'add_part_ids': [spread(i, PARTS)]}, {}), None),
+        ('PUT /service-tickets/<id>/add-part', 'PUT',
+         on_ticket(lambda i: f'add-part/{spread(i + 1, PARTS)}?quantity=2'), None),
+        ('POST /customers/logout', 'POST', lambda i, ctx: ('/customers/logout', None, auth(i, ctx)), None),
+        # deletes, of the rows created above
+        ('DELETE /mechanics/<id>', 'DELETE', remove('mechanics', 'mechanics'), None),
+        ('DELETE /inventory/<id>', 'DELETE', remove('parts', 'inventory'), None),
+        ('DELETE /customers/<id>', 'DELETE', remove('customers', 'customers'), None),
+    ]
+
+
+def drive(client, method, build, collect, ctx, requests, concurrency):
+    """Send ``requests`` requests from ``concurrency`` threads; returns the route's stats."""
+    counter = itertools.count()
+    samples, statuses, lock = [], {}, threading.Lock()
+
+    def worker():
+        while (i := next(counter)) < requests:
+            path, body, headers = build(i, ctx)
+            status, parsed, elapsed = client.request(method, path.replace(' ', '%20'), body, headers)
+            with lock:
+                samples.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if collect is not None and status < 300 and isinstance(parsed, dict):
+                    ctx[collect].append(parsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - t0
+    samples.sort()
+    return {
+        'requests_per_second': round(len(samples) / wall, 1),
+        'p50_ms': round(_percentile(samples, 50) * 1000, 2),
+        'p95_ms': round(_percentile(samples, 95) * 1000, 2),
+        'p99_ms': round(_percentile(samples, 99) * 1000, 2),
+        'max_ms': round(samples[-1] * 1000, 2),
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+def run_scale(tickets, args):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'load.db')
+        t0 = time.perf_counter()
+        scale = prepare(path, tickets, random.Random(args.seed))
+        seeded = time.perf_counter() - t0
+
+        receive, send = multiprocessing.get_context('fork').Pipe(duplex=False)
+        server = multiprocessing.get_context('fork').Process(target=_serve, args=(path, not args.no_cache, send),
+                                                             daemon=True)
+        server.start()
+        try:
+            client = Client(receive.recv())
+            ctx = {'customers': [], 'mechanics': [], 'parts': [], 'tickets': [], 'tokens': []}
+            results = {}
+            for name, method, build, collect in routes(scale, args.seed):
+                if args.routes and not any(part in name for part in args.routes):
+                    continue
+                if method == 'GET':
+                    # unmeasured requests warm the connections and the blueprints
+                    drive(client, method, build, None, ctx, args.concurrency, args.concurrency)
+                results[name] = drive(client, method, build, collect, ctx, args.requests, args.concurrency)
+        finally:
+            server.terminate()
+            server.join()
+    return {'scale': scale, 'seed_seconds': round(seeded, 2), 'routes': results}
+
+
+def regressions(report, baseline, tolerance):
+    """Routes whose p95 grew by more than ``tolerance`` (a fraction) over ``baseline``."""
+    found = []
+    for tickets, current in report['scales'].items():
+        before = baseline.get('scales', {}).get(tickets, {}).get('routes', {})
+        for name, stats in current['routes'].items():
+            if name in before and before[name]['p95_ms'] and \
+                    stats['p95_ms'] > before[name]['p95_ms'] * (1 + tolerance):
+                found.append({'scale': tickets, 'route': name, 'baseline_p95_ms': before[name]['p95_ms'],
+                              'p95_ms': stats['p95_ms']})
+    return found
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='10000,100000', help='comma-separated service ticket counts')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--routes', nargs='*', help='only routes whose name contains one of these')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the report to this file')
+    parser.add_argument('--baseline', help='report of an earlier run to compare p95 latencies against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth over the baseline')
+    args = parser.parse_args(argv)
+
+    report = {
+        'commit': _commit(),
+        'python': sys.version.split()[0],
+        'requests_per_route': args.requests,
+        'concurrency': args.concurrency,
+        'cache': not args.no_cache,
+        'scales': {},
+    }
+    for tickets in (int(n) for n in args.scales.split(',')):
+        report['scales'][str(tickets)] = run_scale(tickets, args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = regressions(report, json.load(f), args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
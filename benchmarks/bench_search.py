@@ -0,0 +1,79 @@
+"""Type-ahead latency of ``app.search.search`` against a LIKE scan.
+
+Seeds a throwaway SQLite file with N customers and times growing prefixes
+of a few names, the way a search box sends them::
+
+    python -m benchmarks.bench_search --customers 100000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import string
+import tempfile
+import time
+from unittest import mock
+
+from sqlalchemy import select
+
+from app import create_app
+from app.extensions import db
+from app.models import Customer
+from app.search import _like_pattern, search
+
+WORDS = ['anna', 'bernard', 'carla', 'dmitri', 'elena', 'farid', 'grace', 'hiro', 'ines', 'jonas']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        with mock.patch('config.TestingConfig.SQLALCHEMY_DATABASE_URI', uri):
+            app = create_app('TestingConfig')
+        with app.app_context():
+            db.create_all()
+            rows = []
+            for i in range(args.customers):
+                first = rng.choice(WORDS) + ''.join(rng.choices(string.ascii_lowercase, k=3))
+                last = ''.join(rng.choices(string.ascii_lowercase, k=7))
+                rows.append({'name': f'{first.title()} {last.title()}', 'email': f'{first}.{last}{i}@example.com',
+                             'password': 'x'})
+            db.session.execute(Customer.__table__.insert(), rows)
+            db.session.commit()
+
+            # common first-name prefixes match thousands of rows; prefixes of a
+            # random last name narrow to a handful, which a LIKE must scan for
+            workloads = {
+                'common': [w[:end] for w in rng.sample(WORDS, 5) for end in range(2, len(w) + 1)],
+                'selective': [r['name'].split()[1][:end].lower() for r in rng.sample(rows, 5) for end in range(2, 8)],
+            }
+            timings = {}
+            for workload, queries in workloads.items():
+                fts, like = timings[f'{workload}/fts'], timings[f'{workload}/like'] = [], []
+                for q in queries:
+                    t0 = time.perf_counter()
+                    search(Customer, q, limit=10)
+                    fts.append((time.perf_counter() - t0) * 1000)
+                    pattern = _like_pattern(q)
+                    stmt = select(Customer).where(Customer.name.ilike(pattern, escape='\\')
+                                                  | Customer.email.ilike(pattern, escape='\\'))
+                    t0 = time.perf_counter()
+                    db.session.scalars(stmt.order_by(Customer.id).limit(10)).all()
+                    like.append((time.perf_counter() - t0) * 1000)
+            db.engine.dispose()
+
+    print(json.dumps({
+        'customers': args.customers,
+        'median_ms': {name: round(statistics.median(samples), 3) for name, samples in timings.items()},
+        'max_ms': {name: round(max(samples), 3) for name, samples in timings.items()},
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
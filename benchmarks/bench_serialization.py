@@ -0,0 +1,89 @@
+"""Marshmallow/ORM list serialization against the ``RowSerializer`` path.
+
+For each list size, times SELECT + serialize + JSON encode of the same rows
+both ways (median of --repeat runs) and checks the bodies are identical::
+
+    python -m benchmarks.bench_serialization --rows 20000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+from sqlalchemy import select
+
+from app import create_app
+from app.extensions import db
+from app.models import Inventory, Mechanic
+
+
+def _time(fn, repeat):
+    samples = []
+    body = None
+    for _ in range(repeat):
+        db.session.expunge_all()  # every request starts with an empty identity map
+        t0 = time.perf_counter()
+        body = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    from app.blueprints.inventory.schemas import inventories_schema, inventory_rows
+    from app.blueprints.mechanic.schemas import mechanics_schema, mechanic_rows
+    cases = {
+        'inventory': (Inventory, inventories_schema, inventory_rows),
+        'mechanics': (Mechanic, mechanics_schema, mechanic_rows),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        with mock.patch('config.TestingConfig.SQLALCHEMY_DATABASE_URI', uri):
+            app = create_app('TestingConfig')
+        with app.app_context():
+            db.create_all()
+            db.session.execute(Inventory.__table__.insert(), [
+                {'name': f'Part {i}', 'price': round(rng.uniform(1, 500), 2)} for i in range(args.rows)])
+            db.session.execute(Mechanic.__table__.insert(), [
+                {'name': f'Mechanic {i}', 'email': f'm{i}@example.com', 'specialization': 'Engine',
+                 'experience': i % 30, 'ticket_count': i % 97} for i in range(args.rows)])
+            db.session.commit()
+
+            dumps = app.json.dumps
+            results = {}
+            for name, (model, schema, rows) in cases.items():
+                for size in (50, 500, args.rows):
+                    def orm():
+                        items = db.session.scalars(select(model).order_by(model.id).limit(size)).all()
+                        return dumps(schema.dump(items))
+
+                    def core():
+                        items = db.session.execute(rows.select().order_by(model.id).limit(size))
+                        return dumps(rows.dump_many(items))
+
+                    orm_ms, orm_body = _time(orm, args.repeat)
+                    core_ms, core_body = _time(core, args.repeat)
+                    assert orm_body == core_body, f'{name} bodies differ'
+                    results[f'{name}/{size}'] = {
+                        'marshmallow_ms': round(orm_ms, 3),
+                        'row_serializer_ms': round(core_ms, 3),
+                        'speedup': round(orm_ms / core_ms, 1),
+                    }
+            db.engine.dispose()
+
+    print(json.dumps({'rows': args.rows, 'median': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Cold start: import, create_app and the first requests of a fresh process.
+
+Each run starts a new interpreter (what an autoscaled instance pays before
+it can serve) and times ``import app``, ``create_app``, the first request
+(GET /health, which is where LAZY_BLUEPRINTS loads the blueprints) and the
+first API request, with and without LAZY_BLUEPRINTS. One more process runs
+under ``python -X importtime`` for the slowest imports, summed per
+top-level package::
+
+    python -m benchmarks.bench_startup --repeat 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# pulled in by the blueprints; a cold start that imports them has lost its laziness
+DEFERRED_MODULES = ('flask_marshmallow', 'marshmallow_sqlalchemy', 'flask_swagger_ui', 'jose',
+                    'app.blueprints.customer', 'app.swagger_config')
+
+
+def measure():
+    """Time startup in this (fresh) process; returns milliseconds per phase."""
+    t0 = time.perf_counter()
+    from app import create_app
+    from app.extensions import db
+    t1 = time.perf_counter()
+    app = create_app('TestingConfig')
+    t2 = time.perf_counter()
+    loaded = sorted(m for m in DEFERRED_MODULES if m in sys.modules)
+    client = app.test_client()
+    assert client.get('/health').status_code == 200
+    t3 = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+    t4 = time.perf_counter()
+    assert client.get('/mechanics/').status_code == 200
+    t5 = time.perf_counter()
+    return {
+        'import_ms': (t1 - t0) * 1000,
+        'create_app_ms': (t2 - t1) * 1000,
+        'first_request_ms': (t3 - t2) * 1000,
+        'ready_ms': (t3 - t0) * 1000,
+        'first_api_request_ms': (t5 - t4) * 1000,
+        'loaded_by_create_app': loaded,
+    }
+
+
+def run_child(lazy=True):
+    """``measure()`` in a new interpreter, plus its wall time from exec to exit."""
+    env = dict(os.environ, LAZY_BLUEPRINTS='true' if lazy else 'false')
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_startup', '--child'], cwd=ROOT, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    result = json.loads(out.splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - t0) * 1000
+    return result
+
+
+def import_times(top):
+    """Self import time per top-level package under ``-X importtime``."""
+    code = "from app import create_app; create_app('TestingConfig')"
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stderr
+    packages = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+        total += int(self_us)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {'total_ms': round(total / 1000, 1), 'packages_ms': {name: round(us / 1000, 1) for name, us in slowest}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure()))
+        return
+
+    results = {}
+    for label, lazy in (('lazy', True), ('eager', False)):
+        runs = [run_child(lazy) for _ in range(args.repeat)]
+        row = {key: round(statistics.median(run[key] for run in runs), 1)
+               for key in runs[0] if key.endswith('_ms')}
+        row['loaded_by_create_app'] = runs[0]['loaded_by_create_app']
+        results[label] = row
+
+    print(json.dumps({'repeat': args.repeat, 'median': results, 'importtime': import_times(args.top)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
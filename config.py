@@ -1,19 +1,163 @@
+import math
 import os
+import tempfile
+
+# CPU quota of the container: cgroup v2, then v1
+CGROUP_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+CGROUP_V1_CPU_QUOTA = ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', '/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+
+def _read_words(path):
+    with open(path) as fh:
+        return fh.read().split()
+
+def cgroup_cpu_quota():
+    """CPUs the container's cgroup quota allows (rounded up), or None if unlimited."""
+    try:
+        quota, period = _read_words(CGROUP_CPU_MAX)[:2]
+    except (OSError, ValueError):
+        try:
+            quota, period = (_read_words(path)[0] for path in CGROUP_V1_CPU_QUOTA)
+        except (OSError, ValueError, IndexError):
+            return None
+    if quota in ('max', '-1'):
+        return None
+    try:
+        return max(1, math.ceil(int(quota) / int(period)))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def usable_cpus():
+    """CPUs this process may run on: its affinity mask, capped by a cgroup CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS, Windows
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    return min(cpus, quota) if quota else cpus
+
+def server_concurrency():
+    """(workers, threads per worker) the app server runs with.
+
+    WEB_CONCURRENCY and GUNICORN_THREADS win when set. Otherwise one gthread
+    worker per usable CPU (2 to 8) with 4 threads each: workers give CPU
+    parallelism, threads cover the time requests spend waiting on the database.
+    A container's CPU quota counts, not the host's cores it can see.
+    """
+    workers = int(os.environ.get('WEB_CONCURRENCY') or min(max(usable_cpus(), 2), 8))
+    threads = int(os.environ.get('GUNICORN_THREADS') or 4)
+    return workers, threads
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for the backend named by ``uri``.
+
+    Server databases get one pooled connection per request thread (plus a
+    little overflow), capped so that every worker together stays within
+    DB_MAX_CONNECTIONS, with pre-ping and recycling so connections dropped
+    by the server or a proxy are replaced instead of failing a request.
+    SQLite is tuned through SQLITE_PRAGMAS instead (see app/database.py).
+    """
+    if not uri or uri.startswith('sqlite'):
+        return {}
+
+    workers, threads = server_concurrency()
+    pool_size = threads
+    max_overflow = max(2, threads // 2)
+    budget = int(os.environ.get('DB_MAX_CONNECTIONS') or 0)
+    if budget:
+        per_worker = max(1, budget // workers)
+        pool_size = min(pool_size, per_worker)
+        max_overflow = max(0, min(max_overflow, per_worker - pool_size))
+
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': 30,
+        # MySQL drops idle connections after wait_timeout (often 300s)
+        'pool_recycle': 280 if uri.startswith('mysql') else 1800,
+        'pool_pre_ping': True,
+    }
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Import the blueprints (routes, schemas, Swagger UI) on the first request
+    # instead of in create_app; gunicorn.conf.py loads them in the master anyway
+    LAZY_BLUEPRINTS = os.environ.get('LAZY_BLUEPRINTS', 'true').lower() in ('1', 'true', 'yes')
+    # Keyset pagination bounds for collection endpoints
+    PAGINATION_DEFAULT_LIMIT = 50
+    PAGINATION_MAX_LIMIT = 500
+    # Rows fetched per server-side cursor batch for NDJSON exports
+    STREAM_BATCH_SIZE = 500
+    # Result bounds for the GET /<resource>/search type-ahead routes
+    SEARCH_DEFAULT_LIMIT = 10
+    SEARCH_MAX_LIMIT = 50
+    # Response encoder: 'auto' uses orjson when installed, else the stdlib
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+    # gzip (brotli when installed) for JSON bodies of at least COMPRESS_MIN_SIZE
+    # bytes; turn off when a reverse proxy already compresses
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    COMPRESS_BR_QUALITY = 4
+    # Largest array accepted by the POST /<resource>/bulk routes
+    BULK_MAX_ROWS = 1000
+    # Seconds clients and shared proxies may reuse a GET before revalidating
+    HTTP_CACHE_MAX_AGE = 0
+    # View cache, bounded to CACHE_THRESHOLD views with LRU eviction.
+    # LRUCache is per worker; app.cache_backend.SQLiteCache keeps one copy
+    # in CACHE_SQLITE_PATH for every worker on the host.
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'app.cache_backend.LRUCache')
+    CACHE_THRESHOLD = int(os.environ.get('CACHE_THRESHOLD') or 1000)
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH') or \
+        os.path.join(tempfile.gettempdir(), 'mechanic_api_cache.db')
+    # Longest a view computation holds its key before waiters compute too
+    CACHE_LOCK_TIMEOUT = 10
+    # XFetch early refresh aggressiveness; 0 refreshes only after expiry
+    CACHE_EARLY_REFRESH_BETA = 1.0
+    # Rate-limit counters. memory:// counts per worker; sqlite:///<path> is
+    # shared by every worker on the host (app/ratelimit.py). flush_interval > 0
+    # batches sqlite writes at the cost of slightly loose limits.
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+    RATELIMIT_STORAGE_OPTIONS = {'flush_interval': float(os.environ.get('RATELIMIT_FLUSH_INTERVAL') or 0)}
+    # Prometheus /metrics; set METRICS_MULTIPROC_DIR (or PROMETHEUS_MULTIPROC_DIR)
+    # to aggregate gunicorn workers
+    METRICS_ENABLED = True
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    METRICS_FLUSH_INTERVAL = 1.0
+    # Verified JWT claims cached per worker until the token's exp
+    AUTH_TOKEN_CACHE_SIZE = 1024
+    AUTH_TOKEN_CACHE_TTL = 300  # for tokens without an exp claim
+    # Reject logged-out tokens (one revoked_tokens lookup per authenticated request)
+    AUTH_REVOCATION_CHECK = os.environ.get('AUTH_REVOCATION_CHECK', '').lower() in ('1', 'true', 'yes')
+    # Applied to every new SQLite connection. WAL lets readers run alongside
+    # the writer and synchronous=NORMAL is durable in WAL mode at far less
+    # fsync cost; journal_mode is skipped for in-memory databases.
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -65536,  # KiB, i.e. 64 MiB of page cache
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    }
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///mechanic_api.db'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
 
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SECRET_KEY = os.environ.get('SECRET_KEY')
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or \
+        f"sqlite:///{os.path.join(tempfile.gettempdir(), 'mechanic_api_ratelimit.db')}"
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'app.cache_backend.SQLiteCache')
+    METRICS_MULTIPROC_DIR = Config.METRICS_MULTIPROC_DIR or os.path.join(tempfile.gettempdir(), 'mechanic_api_metrics')
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     WTF_CSRF_ENABLED = False
\ No newline at end of file
@@ -1,5 +1,4 @@
 from app import create_app
-from app.extensions import db
 import os
 import logging
 
@@ -14,27 +13,21 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    # Use ProductionConfig for deployment
-    config_name = 'ProductionConfig' if os.environ.get('FLASK_ENV') == 'production' else 'DevelopmentConfig'
-    app = create_app(config_name)
-    logger.info(f"Flask app created successfully with {config_name}")
-    
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-        logger.info("Database tables created successfully")
-except Exception as e:
-    logger.error(f"Error during app initialization: {str(e)}")
-    # Fallback to development config
-    try:
-        app = create_app('DevelopmentConfig')
-        logger.info("Fallback to DevelopmentConfig successful")
-    except Exception as fallback_error:
-        logger.error(f"Fallback failed: {str(fallback_error)}")
-        raise
+# Use ProductionConfig for deployment. A config that fails to load raises
+# here instead of falling back to DevelopmentConfig, which would build the
+# app a second time and serve production traffic from the dev settings.
+config_name = 'ProductionConfig' if os.environ.get('FLASK_ENV') == 'production' else 'DevelopmentConfig'
+app = create_app(config_name)
+logger.info(f"Flask app created successfully with {config_name}")
+# Schema migrations run once per deploy, not per worker: gunicorn.conf.py
+# applies them in the master, `flask db-upgrade` does it by hand.
 
 # For development only
 if __name__ == "__main__":
+    from app.extensions import db
+    from app.migrations import upgrade
+
+    with app.app_context():
+        upgrade(db.engine)
     port = int(os.environ.get("PORT", 5000))
     app.run(host="127.0.0.1", port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""Gunicorn profile for production: ``gunicorn -c gunicorn.conf.py flask_app:app``.
+
+The app is imported once in the master (``preload_app``) and forked into
+gthread workers, so a worker boots without re-importing anything and
+shares the master's memory pages until it writes to them (the blueprints,
+which LAZY_BLUEPRINTS would otherwise load on each worker's first
+request, are registered in the master for the same reason). Schema
+migrations run once in the master before any worker starts, and every
+worker drops the pooled database connections it inherited. A worker
+writes its final metrics snapshot on the way out, and the master folds it
+into the compacted one once the worker is gone.
+
+Worker and thread counts come from ``config.server_concurrency`` (usable CPUs,
+within any container quota, unless WEB_CONCURRENCY / GUNICORN_THREADS are
+set), the same numbers the database pool is sized from.
+"""
+import os
+import sys
+
+from config import server_concurrency
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers, threads = server_concurrency()
+worker_class = 'gthread'
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 30)
+graceful_timeout = 30
+# an idle keep-alive connection holds a worker thread, so keep it short;
+# long enough to reuse connections from a proxy or a paging client
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE') or 5)
+# replace each worker after about this many requests to bound memory
+# growth; the jitter keeps the workers from restarting all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 2000)
+max_requests_jitter = max_requests // 10
+# worker heartbeats on tmpfs rather than a possibly slow container disk
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+errorlog = '-'
+
+
+def _app():
+    """The Flask app, importing it if preload_app is off."""
+    from flask_app import app
+    return app
+
+
+def on_starting(server):
+    from app import register_blueprints
+    from app.database import dispose_engines
+    from app.extensions import db
+    from app.metrics import clear_snapshots
+    from app.migrations import upgrade
+
+    app = _app()
+    # import the routes and schemas once here rather than in every worker
+    register_blueprints(app)
+    with app.app_context():
+        applied = upgrade(db.engine)
+        clear_snapshots(app.config.get('METRICS_MULTIPROC_DIR'))
+    server.log.info('Database schema up to date (applied migrations: %s)', applied or 'none')
+    # the master never serves requests; fork the workers without connections
+    dispose_engines(app)
+
+
+def post_fork(server, worker):
+    module = sys.modules.get('flask_app')
+    if module is None:
+        return  # not preloaded: the worker imports and connects on its own
+    from app.database import dispose_engines
+    dispose_engines(module.app, close=False)
+
+
+def worker_exit(server, worker):
+    from app.metrics import flush
+
+    app = _app()
+    directory = app.config.get('METRICS_MULTIPROC_DIR')
+    if directory:
+        with app.app_context():
+            flush(directory)  # the requests since the last periodic flush
+
+
+def child_exit(server, worker):
+    from app.metrics import mark_process_dead
+
+    mark_process_dead(_app().config.get('METRICS_MULTIPROC_DIR'), worker.pid)
@@ -0,0 +1,37 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import tempfile
+from benchmarks import bench_load
+
+class TestLoadBenchmark(unittest.TestCase):
+    def test_smoke_run_covers_every_route(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'load.json')
+            with contextlib.redirect_stdout(io.StringIO()):
+                status = bench_load.main(['--scales', '300', '--requests', '4', '--concurrency', '2',
+                                          '--output', output])
+            with open(output) as f:
+                report = json.load(f)
+        self.assertEqual(status, 0)
+        results = report['scales']['300']['routes']
+        self.assertEqual(list(results), [route[0] for route in bench_load.routes(report['scales']['300']['scale'], 1)])
+        for name, stats in results.items():
+            self.assertEqual(sum(stats['statuses'].values()), 4, name)
+            self.assertTrue(all(int(code) < 400 for code in stats['statuses']), f'{name}: {stats["statuses"]}')
+            self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+            self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+
+    def test_regressions_compare_p95(self):
+        def report(p95):
+            return {'scales': {'1000': {'routes': {'GET /customers/': {'p95_ms': p95}}}}}
+        self.assertEqual(bench_load.regressions(report(11.0), report(10.0), 0.25), [])
+        self.assertEqual(bench_load.regressions(report(13.0), report(10.0), 0.25), [
+            {'scale': '1000', 'route': 'GET /customers/', 'baseline_p95_ms': 10.0, 'p95_ms': 13.0}])
+        # routes missing from the baseline are new, not regressions
+        self.assertEqual(bench_load.regressions(report(13.0), {'scales': {}}, 0.25), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import unittest
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from app import create_app
+from app import cache_backend
+from app.cache_backend import LRUCache, SQLiteCache
+from app.caching import LOCK_KEY, VERSION_KEY, VIEW_KEY
+from app.extensions import cache, db
+from app.models import Inventory
+
+def _app(directory, **overrides):
+    overrides = {'CACHE_TYPE': 'app.cache_backend.SQLiteCache',
+                 'CACHE_SQLITE_PATH': os.path.join(directory, 'cache.db'), **overrides}
+    with mock.patch.multiple('config.TestingConfig', create=True, **overrides):
+        app = create_app('TestingConfig')
+    log = os.path.join(directory, 'computations.log')
+
+    @app.route('/slow-report')
+    @cache.cached(timeout=60, tables=('inventory',))
+    def slow_report():
+        with open(log, 'a') as f:
+            f.write(f'{os.getpid()}\n')
+        time.sleep(0.2)
+        return {'report': 'x' * 10}
+
+    return app
+
+def _computations(directory):
+    path = os.path.join(directory, 'computations.log')
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return len(f.readlines())
+
+def _worker_get(directory, start):
+    app = _app(directory)
+    with app.app_context():
+        db.create_all()
+        time.sleep(max(0, start - time.time()))
+        return app.test_client().get('/slow-report').json
+
+class TestSQLiteCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_entries_shared_between_instances(self):
+        first, second = SQLiteCache(self.path), SQLiteCache(self.path)
+        self.assertTrue(first.set('a', {'rows': [1, 2]}))
+        first.set_many({'b': 2, 'c': 3})
+        self.assertEqual(second.get('a'), {'rows': [1, 2]})
+        self.assertEqual(second.get_many('c', 'missing', 'b'), [3, None, 2])
+        self.assertTrue(second.has('b'))
+        self.assertEqual(second.delete_many('b', 'missing'), ['b'])
+        self.assertIsNone(first.get('b'))
+        self.assertTrue(first.clear())
+        self.assertIsNone(second.get('a'))
+
+    def test_add_is_exclusive_until_expiry(self):
+        first, second = SQLiteCache(self.path), SQLiteCache(self.path)
+        self.assertTrue(first.add('lock', 'one', timeout=0.05))
+        self.assertFalse(second.add('lock', 'two', timeout=0.05))
+        self.assertEqual(second.get('lock'), 'one')
+        time.sleep(0.06)
+        self.assertIsNone(first.get('lock'))
+        self.assertTrue(second.add('lock', 'two'))
+        self.assertEqual(first.get('lock'), 'two')
+
+    def test_lru_eviction(self):
+        for backend in (LRUCache(threshold=2), SQLiteCache(self.path, threshold=2)):
+            with self.subTest(backend=type(backend).__name__), mock.patch.object(cache_backend, 'TOUCH_INTERVAL', 0):
+                evicted = []
+                backend.on_evict = evicted.extend
+                backend.set('view/a', 1)
+                time.sleep(0.001)
+                backend.set('view/b', 2)
+                time.sleep(0.001)
+                self.assertEqual(backend.get('view/a'), 1)  # b is now least recently used
+                time.sleep(0.001)
+                backend.set('view/c', 3)
+                self.assertEqual(evicted, ['view/b'])
+                self.assertEqual(backend.get_many('view/a', 'view/b', 'view/c'), [1, None, 3])
+
+    def test_only_views_are_evicted(self):
+        self.assertTrue(VIEW_KEY.startswith(cache_backend.EVICTABLE_PREFIX))
+        for backend in (LRUCache(threshold=2), SQLiteCache(self.path, threshold=2)):
+            with self.subTest(backend=type(backend).__name__):
+                evicted = []
+                backend.on_evict = evicted.extend
+                backend.set(VERSION_KEY % 'customers', ('token', 1.0), timeout=0)
+                backend.add(LOCK_KEY % 'view/x', 'owner', timeout=30)
+                for i in range(5):
+                    time.sleep(0.001)
+                    backend.set(f'view/{i}', i)
+                self.assertEqual(evicted, ['view/0', 'view/1', 'view/2'])
+                self.assertEqual(backend.get(VERSION_KEY % 'customers'), ('token', 1.0))
+                self.assertEqual(backend.get(LOCK_KEY % 'view/x'), 'owner')
+                self.assertEqual(backend.get_many('view/3', 'view/4'), [3, 4])
+
+class TestViewCacheKeys(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.app.config['RATELIMIT_ENABLED'] = False
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([Inventory(name=f"Part {i}", price=i) for i in range(5)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def stats(self):
+        return cache.view_stats().get('inventory_bp.get_inventory', {})
+
+    def test_query_args_normalized_into_key(self):
+        first = self.client.get('/inventory/?limit=2&sort=-price').json
+        self.assertEqual(self.client.get('/inventory/?sort=-price&limit=2').json, first)
+        self.assertEqual((self.stats()['hits'], self.stats()['misses']), (1, 1))
+        other = self.client.get('/inventory/?limit=3&sort=-price').json
+        self.assertEqual(len(other), 3)
+        self.assertEqual(self.stats()['misses'], 2)
+
+    def test_representations_cached_apart(self):
+        html = self.client.get('/inventory/', headers={'Accept': 'text/html'})
+        self.assertEqual(html.mimetype, 'text/html')
+        data = self.client.get('/inventory/', headers={'Accept': 'application/json'})
+        self.assertEqual(data.mimetype, 'application/json')
+        self.assertEqual(len(data.json), 5)
+        self.assertEqual(self.client.get('/inventory/', headers={'Accept': 'text/html'}).mimetype, 'text/html')
+        self.assertEqual(self.stats()['hits'], 1)
+
+    def test_evictions_counted_per_view(self):
+        self.app.extensions['cache'][cache].threshold = 3
+        for limit in range(1, 6):
+            self.client.get(f'/inventory/?limit={limit}')
+        stats = self.stats()
+        self.assertEqual(stats['misses'], 5)
+        # five views over a threshold of three; the table version keys do not count
+        self.assertEqual(stats['evictions'], 2)
+        self.client.get('/inventory/?limit=5')
+        self.assertEqual(self.stats()['hits'], 1)
+        metrics = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('cache_evictions_total{endpoint="inventory_bp.get_inventory"}', metrics)
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_one_computation_across_threads(self):
+        app = _app(self.directory.name)
+        with app.app_context():
+            db.create_all()
+        results = []
+
+        def get():
+            with app.app_context():
+                results.append(app.test_client().get('/slow-report').json)
+
+        threads = [threading.Thread(target=get) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(_computations(self.directory.name), 1)
+        self.assertEqual(results, [{'report': 'x' * 10}] * 6)
+
+    def test_one_computation_across_processes(self):
+        start = time.time() + 0.5
+        with multiprocessing.get_context('fork').Pool(3) as pool:
+            results = pool.starmap(_worker_get, [(self.directory.name, start)] * 3)
+        self.assertEqual(_computations(self.directory.name), 1)
+        self.assertEqual(results, [{'report': 'x' * 10}] * 3)
+
+    def test_early_refresh(self):
+        app = _app(self.directory.name, CACHE_EARLY_REFRESH_BETA=0)
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+            client.get('/slow-report')
+            client.get('/slow-report')
+            self.assertEqual(_computations(self.directory.name), 1)
+            # a large beta makes every hit fall inside the refresh window
+            app.config['CACHE_EARLY_REFRESH_BETA'] = 1e6
+            self.assertEqual(client.get('/slow-report').status_code, 200)
+            self.assertEqual(_computations(self.directory.name), 2)
+
+if __name__ == '__main__':
+    unittest.main()
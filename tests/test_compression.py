@@ -0,0 +1,75 @@
+import unittest
+import gzip
+import zlib
+from unittest import mock
+from app import create_app, compression
+from app.extensions import db
+from app.models import Inventory
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.app.config['STREAM_BATCH_SIZE'] = 20
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.execute(Inventory.__table__.insert(), [{'name': f'Part {i}', 'price': i + 0.5} for i in range(100)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_large_json_is_gzipped(self):
+        plain = self.client.get('/inventory/?limit=100')
+        zipped = self.client.get('/inventory/?limit=100', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(zipped.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', zipped.headers['Vary'])
+        self.assertLess(len(zipped.get_data()), len(plain.get_data()) // 3)
+        self.assertEqual(gzip.decompress(zipped.get_data()), plain.get_data())
+        self.assertEqual(int(zipped.headers['Content-Length']), len(zipped.get_data()))
+
+    def test_small_and_refused_bodies_stay_plain(self):
+        small = self.client.get('/health', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', small.headers)
+        refused = self.client.get('/inventory/?limit=100', headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', refused.headers)
+        self.app.config['COMPRESS_ENABLED'] = False
+        disabled = self.client.get('/inventory/?limit=90', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', disabled.headers)
+
+    def test_etag_varies_by_encoding(self):
+        plain = self.client.get('/inventory/?limit=100')
+        zipped = self.client.get('/inventory/?limit=100', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotEqual(plain.headers['ETag'], zipped.headers['ETag'])
+        revalidated = self.client.get('/inventory/?limit=100', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+        mismatched = self.client.get('/inventory/?limit=100', headers={'If-None-Match': zipped.headers['ETag']})
+        self.assertEqual(mismatched.status_code, 200)
+
+    def test_cache_hits_are_not_recompressed(self):
+        with mock.patch.object(compression, '_Compressor', wraps=compression._Compressor) as compressor:
+            first = self.client.get('/inventory/?limit=100', headers={'Accept-Encoding': 'gzip'})
+            second = self.client.get('/inventory/?limit=100', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressor.call_count, 1)
+        self.assertEqual(first.get_data(), second.get_data())
+        self.assertEqual(second.headers['Content-Encoding'], 'gzip')
+
+    def test_stream_is_compressed_per_batch(self):
+        response = self.client.get('/inventory/?stream=1', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        decoder = zlib.decompressobj(31)
+        chunks = [decoder.decompress(chunk) for chunk in response.response]
+        response.close()
+        # every batch is flushed as soon as it is written, so it decodes on its own
+        self.assertEqual(chunks[0].decode().count('\n'), 20)
+        self.assertEqual(b''.join(chunks).decode().count('\n'), 100)
+        self.assertTrue(decoder.eof)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 import unittest
 import json
+from unittest import mock
+from jose import jwt
 from app import create_app
-from app.extensions import db
-from app.models import Customer
+from app.extensions import cache, db
+from app.models import Customer, RevokedToken
 
 class TestCustomers(unittest.TestCase):
     def setUp(self):
@@ -27,10 +29,100 @@ class TestCustomers(unittest.TestCase):
         response = self.client.post('/customers/', json=data)
         self.assertEqual(response.status_code, 400)
 
+    def test_bulk_create_customers_detects_duplicate_emails(self):
+        self.client.post('/customers/', json={"name": "Existing", "email": "taken@test.com", "password": "pw"})
+        data = [
+            {"name": "Ann", "email": "ann@test.com", "password": "pw"},
+            {"name": "Dup", "email": "taken@test.com", "password": "pw"},
+            {"name": "Ann Again", "email": "ann@test.com", "password": "pw"},
+            {"name": "No Password", "email": "nopw@test.com"},
+        ]
+        response = self.client.post('/customers/bulk', json=data)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json['created'], 1)
+        self.assertEqual(sorted(response.json['errors']), ['1', '2', '3'])
+        self.assertEqual(db.session.query(Customer).count(), 2)
+
+    def test_bulk_create_customers_reports_rows_lost_to_a_concurrent_insert(self):
+        db.session.add(Customer(name="Bob", email="bob@test.com", password="pw"))
+        db.session.commit()
+        data = [{"name": "Ann", "email": "ann@test.com", "password": "pw"},
+                {"name": "Bob", "email": "bob@test.com", "password": "pw"}]
+        # the first check runs before the other request commits bob@
+        with mock.patch('app.bulk._taken', side_effect=[set(), {"bob@test.com"}]) as taken:
+            response = self.client.post('/customers/bulk', json=data)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json['errors'], {'1': {'email': ['email already exists.']}})
+        self.assertEqual(taken.call_count, 2)
+        self.assertEqual(db.session.query(Customer).count(), 2)
+
+    def test_bulk_create_without_executemany_returning(self):
+        # MySQL: rows go in one INSERT at a time and the ids come from lastrowid
+        dialect = type(db.engine.dialect)
+        with mock.patch.object(dialect, 'insert_executemany_returning_sort_by_parameter_order', False):
+            response = self.client.post('/customers/bulk', json=[
+                {"name": f"C{i}", "email": f"c{i}@test.com", "password": "pw"} for i in range(3)])
+        self.assertEqual(response.status_code, 201)
+        emails = [db.session.get(Customer, i).email for i in response.json['ids']]
+        self.assertEqual(emails, ['c0@test.com', 'c1@test.com', 'c2@test.com'])
+
     def test_get_customers(self):
         response = self.client.get('/customers/')
         self.assertEqual(response.status_code, 200)
 
+    def test_get_customers_cursor_envelope(self):
+        for i in range(3):
+            db.session.add(Customer(name=f"Customer {i}", email=f"c{i}@test.com", password="secret"))
+        db.session.commit()
+
+        response = self.client.get('/customers/?limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json['customers']), 2)
+        self.assertIsNone(response.json['prev_cursor'])
+        self.assertNotIn('total', response.json)
+
+        response = self.client.get(f"/customers/?limit=2&include_total=true&cursor={response.json['next_cursor']}")
+        self.assertEqual([c['name'] for c in response.json['customers']], ["Customer 2"])
+        self.assertIsNone(response.json['next_cursor'])
+        self.assertEqual(response.json['total'], 3)
+
+    def test_get_customers_rejects_page_numbers(self):
+        # clients of the old offset API must not silently get page 1 back
+        response = self.client.get('/customers/?page=2&per_page=10')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json['error'])
+
+    def test_search_customers_by_email_prefix(self):
+        for i in range(15):
+            db.session.add(Customer(name=f"Customer {i}", email=f"c{i}@test.com", password="secret"))
+        db.session.add(Customer(name="Ann Lee", email="ann@shop.com", password="secret"))
+        db.session.commit()
+
+        response = self.client.get('/customers/search?q=shop')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['email'] for c in response.json], ["ann@shop.com"])
+        self.assertNotIn('password', response.json[0])
+        self.assertEqual(len(self.client.get('/customers/search?q=customer').json), 10)
+        self.assertEqual(len(self.client.get('/customers/search?q=customer&limit=100').json), 15)
+
+    def test_search_ranks_before_limiting(self):
+        # a broad prefix matches every row; the best one has the highest id
+        for i in range(300):
+            db.session.add(Customer(name=f"Curtis Filler Name Number {i}", email=f"f{i}@test.com", password="pw"))
+        db.session.add(Customer(name="Cu Cu", email="cu@cu.com", password="pw"))
+        db.session.commit()
+        self.assertEqual(self.client.get('/customers/search?q=cu').json[0]['email'], "cu@cu.com")
+
+    def test_search_terms_match_alike_on_postgresql(self):
+        from sqlalchemy.dialects import postgresql
+        from app.search import _terms_match
+        clause = _terms_match([Customer.name, Customer.email], ['ann', 'le'], 'postgresql')
+        compiled = clause.compile(dialect=postgresql.dialect())
+        # each term must start a word in some column, as with the FTS5 prefix query
+        self.assertEqual(str(compiled).count(' ~* '), 4)
+        self.assertIn(') AND (', str(compiled))
+        self.assertEqual(sorted(set(compiled.params.values())), [r'\mann', r'\mle'])
+
     def test_get_customer_not_found(self):
         response = self.client.get('/customers/999')
         self.assertEqual(response.status_code, 404)
@@ -49,6 +141,59 @@ class TestCustomers(unittest.TestCase):
         response = self.client.post('/customers/login', json=data)
         self.assertEqual(response.status_code, 401)
 
+    def login(self):
+        self.client.post('/customers/', json={"name": "John Doe", "email": "john@test.com", "password": "secret123"})
+        response = self.client.post('/customers/login', json={"email": "john@test.com", "password": "secret123"})
+        return {'Authorization': f"Bearer {response.json['token']}"}
+
+    def test_repeat_token_skips_signature_verification(self):
+        headers = self.login()
+        with mock.patch('app.auth.jwt.decode', wraps=jwt.decode) as decode:
+            for _ in range(3):
+                self.assertEqual(self.client.get('/customers/my-tickets', headers=headers).status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+
+        from app.auth import token_cache
+        stats = token_cache().stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+    def test_token_cache_expires_with_token(self):
+        from app.auth import TokenCache
+        claims_cache = TokenCache(maxsize=2)
+        claims_cache.put('expired', {'customer_id': 1}, expires_at=0)
+        self.assertIsNone(claims_cache.get('expired'))
+        for key in ('a', 'b', 'c'):
+            claims_cache.put(key, {'customer_id': 1}, expires_at=2 ** 40)
+        self.assertIsNone(claims_cache.get('a'))
+        self.assertEqual(claims_cache.stats()['evictions'], 1)
+
+    def test_tampered_token_rejected(self):
+        headers = self.login()
+        self.client.get('/customers/my-tickets', headers=headers)
+        headers['Authorization'] = headers['Authorization'][:-2] + 'xx'
+        self.assertEqual(self.client.get('/customers/my-tickets', headers=headers).status_code, 401)
+
+    def test_logout_revokes_cached_token(self):
+        self.app.config['AUTH_REVOCATION_CHECK'] = True
+        headers = self.login()
+        self.assertEqual(self.client.get('/customers/my-tickets', headers=headers).status_code, 200)
+        self.assertEqual(self.client.post('/customers/logout', headers=headers).status_code, 200)
+        self.assertEqual(self.client.get('/customers/my-tickets', headers=headers).status_code, 401)
+
+    def test_revocation_survives_cache_eviction(self):
+        self.app.config['AUTH_REVOCATION_CHECK'] = True
+        headers = self.login()
+        self.assertEqual(self.client.post('/customers/logout', headers=headers).status_code, 200)
+        backend = cache.cache
+        for i in range(backend.threshold + 10):
+            backend.set(f'view/filler-{i}', i)
+        self.assertEqual(self.client.get('/customers/my-tickets', headers=headers).status_code, 401)
+        self.assertEqual(db.session.query(RevokedToken).count(), 1)
+
+    def test_logout_disabled_without_revocation_check(self):
+        headers = self.login()
+        self.assertEqual(self.client.post('/customers/logout', headers=headers).status_code, 501)
+
     def test_my_tickets_no_token(self):
         response = self.client.get('/customers/my-tickets')
         self.assertEqual(response.status_code, 401)
@@ -0,0 +1,111 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+from sqlalchemy import create_engine, inspect, text
+from app import create_app
+from app.extensions import db
+from app.migrations import MIGRATIONS, current_version, upgrade
+from config import engine_options
+
+# the schema as db.create_all() built it before ticket_count and the indexes
+LEGACY_SCHEMA = [
+    "CREATE TABLE customers (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, email VARCHAR(360) NOT NULL UNIQUE,"
+    " dob DATE, password VARCHAR(255) NOT NULL)",
+    "CREATE TABLE mechanics (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, specialization VARCHAR(255) NOT NULL,"
+    " experience INTEGER NOT NULL, email VARCHAR(360) NOT NULL UNIQUE)",
+    "CREATE TABLE inventory (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, price FLOAT NOT NULL)",
+    "CREATE TABLE service_tickets (id INTEGER PRIMARY KEY, service_date DATE NOT NULL,"
+    " customer_id INTEGER NOT NULL REFERENCES customers (id))",
+    "CREATE TABLE service_mechanic (service_ticket_id INTEGER REFERENCES service_tickets (id),"
+    " mechanic_id INTEGER REFERENCES mechanics (id), PRIMARY KEY (service_ticket_id, mechanic_id))",
+    "CREATE TABLE service_inventory (service_ticket_id INTEGER REFERENCES service_tickets (id),"
+    " inventory_id INTEGER REFERENCES inventory (id), PRIMARY KEY (service_ticket_id, inventory_id))",
+    "INSERT INTO customers VALUES (1, 'Ann', 'ann@test.com', NULL, 'pw')",
+    "INSERT INTO mechanics VALUES (1, 'Mike', 'Engine', 5, 'mike@test.com'), (2, 'Jo', 'Brakes', 2, 'jo@test.com')",
+    "INSERT INTO service_tickets VALUES (1, '2024-01-15', 1), (2, '2024-01-16', 1)",
+    "INSERT INTO service_mechanic VALUES (1, 1), (2, 1), (2, 2)",
+    "INSERT INTO inventory VALUES (1, 'Oil Filter', 12.5)",
+    "INSERT INTO service_inventory VALUES (1, 1)",
+]
+
+class TestDatabase(unittest.TestCase):
+    def test_postgres_pool_sized_from_server_concurrency(self):
+        env = {'WEB_CONCURRENCY': '4', 'GUNICORN_THREADS': '8', 'DB_MAX_CONNECTIONS': '40'}
+        with mock.patch.dict(os.environ, env):
+            options = engine_options('postgresql://user:pw@db/mechanics')
+        self.assertEqual(options['pool_size'], 8)
+        self.assertEqual(options['max_overflow'], 2)  # 4 workers * (8 + 2) == 40
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(options['pool_recycle'], 1800)
+
+    def test_sqlite_has_no_pool_sizing(self):
+        self.assertEqual(engine_options('sqlite:///:memory:'), {})
+
+    def test_sqlite_file_pragmas_and_pool_metrics(self):
+        with tempfile.TemporaryDirectory() as directory:
+            uri = f"sqlite:///{os.path.join(directory, 'api.db')}"
+            with mock.patch('config.TestingConfig.SQLALCHEMY_DATABASE_URI', uri):
+                app = create_app('TestingConfig')
+            with app.app_context():
+                with db.engine.connect() as conn:
+                    self.assertEqual(conn.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+                    self.assertEqual(conn.execute(text('PRAGMA synchronous')).scalar(), 1)  # NORMAL
+                    self.assertEqual(conn.execute(text('PRAGMA busy_timeout')).scalar(), 5000)
+                body = app.test_client().get('/metrics').get_data(as_text=True)
+                self.assertIn('db_pool_checked_out 0', body)
+                self.assertIn('db_pool_checkouts_total', body)
+                db.engine.dispose()
+
+    def test_upgrade_migrates_legacy_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{os.path.join(directory, 'legacy.db')}")
+            with engine.begin() as conn:
+                for statement in LEGACY_SCHEMA:
+                    conn.execute(text(statement))
+
+            self.assertEqual(upgrade(engine), [1, 2, 3, 4, 5, 6])
+            self.assertEqual(upgrade(engine), [])
+            self.assertEqual(current_version(engine), 6)
+
+            tables = ('service_tickets', 'service_mechanic', 'service_inventory', 'mechanics', 'inventory')
+            indexes = {index['name'] for table in tables for index in inspect(engine).get_indexes(table)}
+            self.assertTrue({'ix_service_tickets_customer_date', 'ix_service_tickets_service_date_id',
+                             'ix_service_mechanic_mechanic_id', 'ix_service_inventory_inventory_id',
+                             'ix_mechanics_ranking', 'ix_mechanics_specialization_experience',
+                             'ix_inventory_price'} <= indexes)
+            # migration 4 drops the plain customer_id index in favour of its composite
+            self.assertNotIn('ix_service_tickets_customer_id', indexes)
+            with engine.connect() as conn:
+                counts = conn.execute(text('SELECT id, ticket_count FROM mechanics ORDER BY id')).all()
+            self.assertEqual([tuple(row) for row in counts], [(1, 2), (2, 1)])
+
+            with engine.connect() as conn:
+                link = conn.execute(text('SELECT quantity, unit_price FROM service_inventory')).one()
+            self.assertEqual(tuple(link), (1, 12.5))
+
+            with engine.connect() as conn:
+                revenue = conn.execute(text('SELECT day, ticket_count, revenue FROM daily_revenue ORDER BY day')).all()
+            self.assertEqual([tuple(row) for row in revenue], [('2024-01-15', 1, 12.5), ('2024-01-16', 1, 0.0)])
+
+            # rows that predate the search index are indexed when it is created
+            with engine.connect() as conn:
+                found = conn.execute(text("SELECT rowid FROM mechanics_fts WHERE mechanics_fts MATCH 'brak*'")).all()
+            self.assertEqual([row[0] for row in found], [2])
+            engine.dispose()
+
+    def test_migration_indexes_do_not_follow_the_models(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{os.path.join(directory, 'legacy.db')}")
+            with engine.begin() as conn:
+                for statement in LEGACY_SCHEMA:
+                    conn.execute(text(statement))
+                # migration 2 as released, though the models no longer declare this index
+                dict((version, apply) for version, _, apply in MIGRATIONS)[2](conn)
+            indexes = {index['name']: index['column_names'] for index in inspect(engine).get_indexes('service_tickets')}
+            self.assertEqual(indexes['ix_service_tickets_customer_id'], ['customer_id'])
+            self.assertEqual(indexes['ix_service_tickets_service_date_id'], ['service_date', 'id'])
+            engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+import json
+import os
+import runpy
+import sys
+import tempfile
+import types
+from unittest import mock
+from sqlalchemy import inspect
+from app import create_app, metrics
+from app.extensions import db
+import config
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+class TestGunicornProfile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        uri = f"sqlite:///{os.path.join(self.directory.name, 'api.db')}"
+        with mock.patch('config.TestingConfig.SQLALCHEMY_DATABASE_URI', uri):
+            self.app = create_app('TestingConfig')
+        self.app.config['METRICS_MULTIPROC_DIR'] = os.path.join(self.directory.name, 'metrics')
+        # what `import flask_app` leaves behind under preload_app
+        module = types.ModuleType('flask_app')
+        module.app = self.app
+        patcher = mock.patch.dict(sys.modules, {'flask_app': module})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def load(self, **env):
+        with mock.patch.dict(os.environ, env):
+            return runpy.run_path(CONF)
+
+    def test_settings(self):
+        settings = self.load(WEB_CONCURRENCY='3', GUNICORN_THREADS='6', PORT='9000', GUNICORN_MAX_REQUESTS='500')
+        self.assertEqual((settings['workers'], settings['threads']), (3, 6))
+        self.assertEqual(settings['worker_class'], 'gthread')
+        self.assertTrue(settings['preload_app'])
+        self.assertEqual(settings['bind'], '0.0.0.0:9000')
+        self.assertEqual((settings['max_requests'], settings['max_requests_jitter']), (500, 50))
+        self.assertEqual(settings['keepalive'], 5)
+
+    def test_counts_follow_cpus_by_default(self):
+        with mock.patch.dict(os.environ, clear=True):
+            for cpus, workers in ((1, 2), (4, 4), (32, 8)):
+                with mock.patch('config.usable_cpus', return_value=cpus):
+                    self.assertEqual(config.server_concurrency(), (workers, 4))
+
+    def test_cpus_capped_by_cgroup_quota(self):
+        cpu_max = os.path.join(self.directory.name, 'cpu.max')
+        with mock.patch('config.CGROUP_CPU_MAX', cpu_max), mock.patch('os.sched_getaffinity', return_value=set(range(32)),
+                                                                       create=True):
+            for content, cpus in (('150000 100000\n', 2), ('max 100000\n', 32), ('50000 100000\n', 1)):
+                with open(cpu_max, 'w') as fh:
+                    fh.write(content)
+                self.assertEqual(config.usable_cpus(), cpus)
+            with mock.patch.dict(os.environ, clear=True):
+                self.assertEqual(config.server_concurrency(), (2, 4))
+            os.remove(cpu_max)
+            with mock.patch('config.CGROUP_V1_CPU_QUOTA', ('/nonexistent/quota', '/nonexistent/period')):
+                self.assertEqual(config.usable_cpus(), 32)
+
+    def test_on_starting_migrates_and_loads_blueprints(self):
+        directory = self.app.config['METRICS_MULTIPROC_DIR']
+        os.makedirs(directory)
+        open(os.path.join(directory, 'metrics-old.json'), 'w').close()
+        server = mock.Mock()
+        self.load()['on_starting'](server)
+        self.assertEqual(os.listdir(directory), [])
+        # loaded in the master so the forked workers share them
+        self.assertIn('customer_bp', self.app.blueprints)
+        with self.app.app_context():
+            self.assertIn('service_tickets', inspect(db.engine).get_table_names())
+            self.assertEqual(db.engine.pool.checkedout(), 0)
+
+    def test_post_fork_forgets_inherited_connections(self):
+        with self.app.app_context():
+            inherited = db.engine.pool
+            connection = db.engine.connect()
+        self.load()['post_fork'](mock.Mock(), mock.Mock())
+        with self.app.app_context():
+            self.assertIsNot(db.engine.pool, inherited)
+        # the parent's connection was left open, not closed under it
+        self.assertFalse(connection.closed)
+        connection.close()
+
+    def test_metrics_reset_in_forked_worker(self):
+        metrics.registry.inc('http_requests_total', {'endpoint': 'x'})
+        token = metrics._process_token
+        metrics._after_fork()
+        self.assertNotEqual(metrics._process_token, token)
+        self.assertEqual(metrics.registry.snapshot()['counters'], [])
+
+    def test_exited_workers_folded_into_compacted_snapshot(self):
+        directory = self.app.config['METRICS_MULTIPROC_DIR']
+        os.makedirs(directory)
+        requests = ['http_requests_total', [['endpoint', 'x']]]
+        pool = ['db_pool_checked_out', []]
+        for name, count in (('metrics-101-aaaa.json', 2), ('metrics-102-bbbb.json', 3), ('metrics-1010-cccc.json', 4)):
+            with open(os.path.join(directory, name), 'w') as fh:
+                json.dump({'counters': [requests + [count]], 'histograms': [], 'gauges': [pool + [1]]}, fh)
+
+        conf = self.load()
+        metrics.registry.inc('http_requests_total', {'endpoint': 'x'})
+        conf['worker_exit'](mock.Mock(), mock.Mock())
+        for pid in (101, 102, os.getpid()):
+            conf['child_exit'](mock.Mock(), mock.Mock(pid=pid))
+
+        self.assertEqual(sorted(os.listdir(directory)), ['metrics-1010-cccc.json', metrics.COMPACTED_SNAPSHOT])
+        snapshots = []
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name)) as fh:
+                snapshots.append(json.load(fh))
+        counters, _ = metrics._merge(snapshots)
+        # nothing counted by the exited workers is lost, their gauges are
+        self.assertEqual(counters[('http_requests_total', (('endpoint', 'x'),))], 2 + 3 + 4 + 1)
+        self.assertEqual(counters[('db_pool_checked_out', ())], 1)
+
+if __name__ == '__main__':
+    unittest.main()
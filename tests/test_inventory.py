@@ -1,7 +1,9 @@
 import unittest
 import json
+import time
+from unittest import mock
 from app import create_app
-from app.extensions import db
+from app.extensions import cache, db
 from app.models import Inventory
 
 class TestInventory(unittest.TestCase):
@@ -27,10 +29,106 @@ class TestInventory(unittest.TestCase):
         response = self.client.post('/inventory/', json=data)
         self.assertEqual(response.status_code, 400)
 
+    def test_bulk_create_inventory(self):
+        data = [{"name": f"Part {i}", "price": 1.0 + i} for i in range(50)]
+        response = self.client.post('/inventory/bulk', json=data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json['created'], 50)
+        self.assertEqual(response.json['errors'], {})
+        self.assertEqual(db.session.get(Inventory, response.json['ids'][-1]).name, "Part 49")
+
+    def test_search_finds_bulk_created_parts(self):
+        self.client.post('/inventory/bulk', json=[{"name": "Oil Filter", "price": 9.5}, {"name": "Air Filter", "price": 12.0},
+                                                 {"name": "Spark Plug", "price": 4.0}])
+        response = self.client.get('/inventory/search?q=filt')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(p['name'] for p in response.json), ["Air Filter", "Oil Filter"])
+
+    def test_bulk_create_inventory_reports_row_errors(self):
+        data = [{"name": "Oil Filter", "price": 15.99}, {"name": "No Price"}, {"name": "Wiper", "price": "cheap"}]
+        response = self.client.post('/inventory/bulk', json=data)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json['created'], 1)
+        self.assertEqual(sorted(response.json['errors']), ['1', '2'])
+        self.assertIn('price', response.json['errors']['1'])
+
+    def test_bulk_create_inventory_rejects_non_array(self):
+        response = self.client.post('/inventory/bulk', json={"name": "Oil Filter", "price": 15.99})
+        self.assertEqual(response.status_code, 400)
+
     def test_get_inventory(self):
         response = self.client.get('/inventory/')
         self.assertEqual(response.status_code, 200)
 
+    def test_get_inventory_ndjson_stream(self):
+        for i in range(3):
+            db.session.add(Inventory(name=f"Part {i}", price=1.5 + i))
+        db.session.commit()
+
+        response = self.client.get('/inventory/', headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([r['name'] for r in rows], ["Part 0", "Part 1", "Part 2"])
+
+        # the JSON listing must not be served from the stream (or vice versa)
+        listing = self.client.get('/inventory/')
+        self.assertEqual(len(listing.json), 3)
+        streamed = self.client.get('/inventory/?stream=1')
+        self.assertEqual(len(streamed.get_data(as_text=True).splitlines()), 3)
+
+    def test_get_inventory_price_range(self):
+        self.client.post('/inventory/bulk', json=[{"name": f"Part {i}", "price": float(i)} for i in range(10)])
+
+        response = self.client.get('/inventory/?price[gte]=3&price[lte]=6&sort=-price')
+        self.assertEqual([p['price'] for p in response.json], [6.0, 5.0, 4.0, 3.0])
+
+        streamed = self.client.get('/inventory/?stream=1&price[gt]=7')
+        rows = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+        self.assertEqual([r['name'] for r in rows], ["Part 8", "Part 9"])
+
+    def test_get_inventory_conditional_get(self):
+        item_id = self.client.post('/inventory/', json={"name": "Oil Filter", "price": 15.99}).json['id']
+
+        first = self.client.get('/inventory/')
+        etag = first.headers['ETag']
+        self.assertIn('public', first.headers['Cache-Control'])
+        self.assertIn('Last-Modified', first.headers)
+
+        cached = self.client.get('/inventory/', headers={'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.get_data(), b'')
+        # Last-Modified validates once the second of the last write is over
+        with mock.patch('time.time', return_value=time.time() + 2):
+            settled = self.client.get('/inventory/').headers['Last-Modified']
+            since = self.client.get('/inventory/', headers={'If-Modified-Since': settled})
+        self.assertEqual(since.status_code, 304)
+
+        # a different page or representation gets its own validator
+        self.assertNotEqual(self.client.get('/inventory/?limit=1').headers['ETag'], etag)
+
+        self.client.put(f'/inventory/{item_id}', json={"name": "Oil Filter", "price": 17.5})
+        changed = self.client.get('/inventory/', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json[0]['price'], 17.5)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+    def test_if_modified_since_sees_writes_in_the_same_second(self):
+        item_id = self.client.post('/inventory/', json={"name": "Oil Filter", "price": 15.99}).json['id']
+        write = time.time()
+        second = float(int(write))
+        with mock.patch('time.time', return_value=second + 0.2):
+            cache.bump('inventory')
+            first = self.client.get('/inventory/')
+        with mock.patch('time.time', return_value=second + 0.7):
+            self.client.put(f'/inventory/{item_id}', json={"name": "Oil Filter", "price": 17.5})
+        with mock.patch('time.time', return_value=second + 5):
+            response = self.client.get('/inventory/', headers={'If-Modified-Since': first.headers['Last-Modified']})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json[0]['price'], 17.5)
+            settled = response.headers['Last-Modified']
+            self.assertEqual(self.client.get('/inventory/', headers={'If-Modified-Since': settled}).status_code, 304)
+
     def test_get_inventory_item_not_found(self):
         response = self.client.get('/inventory/999')
         self.assertEqual(response.status_code, 404)
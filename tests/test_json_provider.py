@@ -0,0 +1,67 @@
+import unittest
+import decimal
+import uuid
+from datetime import date, datetime
+from unittest import mock
+from app import create_app
+from app.extensions import db
+from app import json_provider
+
+class TestJSONProvider(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def payload(self):
+        return {"service_date": date(2024, 1, 15), "id": 3, "price": 8.25, "name": "Bo Ünal",
+                "created": datetime(2024, 1, 15, 9, 30, 5, 120), "cost": decimal.Decimal("12.50"),
+                "ref": uuid.UUID(int=1), "tags": [None, True, "a\"b"]}
+
+    def test_compact_unsorted_iso_output(self):
+        body = self.app.json.dumps(self.payload())
+        self.assertEqual(body, '{"service_date":"2024-01-15","id":3,"price":8.25,"name":"Bo Ünal",'
+                               '"created":"2024-01-15T09:30:05.000120","cost":"12.50",'
+                               '"ref":"00000000-0000-0000-0000-000000000001","tags":[null,true,"a\\"b"]}')
+        self.assertEqual(self.app.json.loads(body)["name"], "Bo Ünal")
+
+    def test_encoders_agree(self):
+        if json_provider.orjson is None:
+            self.skipTest("orjson not installed")
+        self.app.config['JSON_ENCODER'] = 'orjson'
+        fast = json_provider.FastJSONProvider(self.app)
+        self.app.config['JSON_ENCODER'] = 'stdlib'
+        stdlib = json_provider.FastJSONProvider(self.app)
+        self.assertEqual((fast.encoder_name, stdlib.encoder_name), ('orjson', 'stdlib'))
+        self.assertEqual(fast.dumps(self.payload()), stdlib.dumps(self.payload()))
+
+    def test_encoder_setting(self):
+        self.app.config['JSON_ENCODER'] = 'stdlib'
+        self.assertEqual(json_provider.FastJSONProvider(self.app).encoder_name, 'stdlib')
+        with mock.patch.object(json_provider, 'orjson', None):
+            self.app.config['JSON_ENCODER'] = 'auto'
+            self.assertEqual(json_provider.FastJSONProvider(self.app).encoder_name, 'stdlib')
+            self.app.config['JSON_ENCODER'] = 'orjson'
+            with self.assertRaises(RuntimeError):
+                json_provider.FastJSONProvider(self.app)
+
+    def test_responses_use_provider(self):
+        customer = {"name": "Zoë", "email": "zoe@test.com", "password": "pw", "dob": "1990-02-28"}
+        response = self.client.post('/customers/', json=customer)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.mimetype, 'application/json')
+        body = response.get_data(as_text=True)
+        self.assertIn('"dob":"1990-02-28"', body)
+        self.assertIn('Zoë', body)
+        # indent/sort_keys still honoured when asked for explicitly
+        self.assertEqual(self.app.json.dumps({"b": 1, "a": 2}, sort_keys=True), '{"a": 2, "b": 1}')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,6 +27,18 @@ class TestMechanics(unittest.TestCase):
         response = self.client.post('/mechanics/', json=data)
         self.assertEqual(response.status_code, 400)
 
+    def test_bulk_create_mechanics(self):
+        data = [{"name": f"Mech {i}", "email": f"m{i}@test.com", "specialization": "Engine", "experience": i}
+                for i in range(3)]
+        response = self.client.post('/mechanics/bulk', json=data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.client.get('/mechanics/').json), 3)
+
+        response = self.client.post('/mechanics/bulk', json=data[:1])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['created'], 0)
+        self.assertIn('email', response.json['errors']['0'])
+
     def test_get_mechanics(self):
         response = self.client.get('/mechanics/')
         self.assertEqual(response.status_code, 200)
@@ -44,9 +56,100 @@ class TestMechanics(unittest.TestCase):
         response = self.client.delete('/mechanics/999')
         self.assertEqual(response.status_code, 404)
 
+    def test_get_mechanics_keyset_pages(self):
+        for i in range(5):
+            db.session.add(Mechanic(name=f"Mech {i}", email=f"m{i}@test.com", specialization="Engine", experience=i))
+        db.session.commit()
+
+        first = self.client.get('/mechanics/?limit=2')
+        self.assertEqual([m['name'] for m in first.json], ["Mech 0", "Mech 1"])
+        self.assertNotIn('X-Prev-Cursor', first.headers)
+
+        second = self.client.get(f"/mechanics/?limit=2&cursor={first.headers['X-Next-Cursor']}")
+        self.assertEqual([m['name'] for m in second.json], ["Mech 2", "Mech 3"])
+
+        back = self.client.get(f"/mechanics/?limit=2&cursor={second.headers['X-Prev-Cursor']}")
+        self.assertEqual([m['name'] for m in back.json], ["Mech 0", "Mech 1"])
+        self.assertNotIn('X-Prev-Cursor', back.headers)
+
+        last = self.client.get(f"/mechanics/?limit=2&include_total=1&cursor={second.headers['X-Next-Cursor']}")
+        self.assertEqual([m['name'] for m in last.json], ["Mech 4"])
+        self.assertNotIn('X-Next-Cursor', last.headers)
+        self.assertEqual(last.headers['X-Total-Count'], '5')
+
+    def test_get_mechanics_invalid_cursor(self):
+        response = self.client.get('/mechanics/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/mechanics/?page=2')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json['error'])
+
+    def test_cached_views_invalidated_by_writes(self):
+        data = {"name": "Mike", "email": "mike@test.com", "specialization": "Engine", "experience": 5}
+        mech_id = self.client.post('/mechanics/', json=data).json['id']
+        self.assertEqual(len(self.client.get('/mechanics/').json), 1)
+        self.assertEqual(self.client.get(f'/mechanics/{mech_id}').json['experience'], 5)
+
+        self.client.post('/mechanics/', json={**data, "email": "jo@test.com", "name": "Jo"})
+        self.assertEqual(len(self.client.get('/mechanics/').json), 2)
+
+        self.client.put(f'/mechanics/{mech_id}', json={**data, "experience": 9})
+        self.assertEqual(self.client.get(f'/mechanics/{mech_id}').json['experience'], 9)
+
+        self.client.delete(f'/mechanics/{mech_id}')
+        self.assertEqual(self.client.get(f'/mechanics/{mech_id}').status_code, 404)
+        self.assertEqual(len(self.client.get('/mechanics/').json), 1)
+
+    def test_get_mechanics_filter_and_sort(self):
+        for i, (spec, years) in enumerate([("Engine", 2), ("Engine", 8), ("Brakes", 9), ("Engine", 5), ("Engine", 8)]):
+            db.session.add(Mechanic(name=f"Mech {i}", email=f"m{i}@test.com", specialization=spec, experience=years))
+        db.session.commit()
+
+        response = self.client.get('/mechanics/?specialization=Engine&experience[gte]=5&sort=-experience,name')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(m['name'], m['experience']) for m in response.json],
+                         [("Mech 1", 8), ("Mech 4", 8), ("Mech 3", 5)])
+
+        response = self.client.get('/mechanics/?specialization[in]=Brakes,Transmission')
+        self.assertEqual([m['name'] for m in response.json], ["Mech 2"])
+        self.assertEqual(self.client.get('/mechanics/?salary[gt]=1').status_code, 400)
+
+    def test_search_mechanics_follows_writes(self):
+        data = {"name": "Mike Jones", "email": "mike@test.com", "specialization": "Engine", "experience": 5}
+        mech_id = self.client.post('/mechanics/', json=data).json['id']
+        self.client.post('/mechanics/', json={**data, "name": "Jo", "email": "jo@test.com", "specialization": "Brakes"})
+
+        self.assertEqual([m['name'] for m in self.client.get('/mechanics/search?q=eng').json], ["Mike Jones"])
+        self.assertEqual([m['name'] for m in self.client.get('/mechanics/search?q=mi jo').json], ["Mike Jones"])
+
+        self.client.put(f'/mechanics/{mech_id}', json={**data, "specialization": "Transmission"})
+        self.assertEqual(self.client.get('/mechanics/search?q=eng').json, [])
+        self.assertEqual(len(self.client.get('/mechanics/search?q=trans').json), 1)
+
+        self.client.delete(f'/mechanics/{mech_id}')
+        self.assertEqual(self.client.get('/mechanics/search?q=trans').json, [])
+
+    def test_search_mechanics_ignores_query_syntax(self):
+        response = self.client.get('/mechanics/search?q="* OR NEAR(')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/mechanics/search?q=').json, [])
+
     def test_get_mechanics_ranking(self):
         response = self.client.get('/mechanics/ranking')
         self.assertEqual(response.status_code, 200)
 
+    def test_ranking_limit_validated(self):
+        for i in range(3):
+            db.session.add(Mechanic(name=f"Mech {i}", email=f"m{i}@test.com", specialization="Engine", experience=i))
+        db.session.commit()
+        self.assertEqual(len(self.client.get('/mechanics/ranking?limit=2').json), 2)
+        self.assertEqual(len(self.client.get('/mechanics/ranking').json), 3)
+        for limit in ('0', '-1', 'two', ''):
+            response = self.client.get(f'/mechanics/ranking?limit={limit}')
+            self.assertEqual(response.status_code, 400, limit)
+            self.assertEqual(response.json['error'], 'limit must be a positive integer')
+        # the list routes validate their page size the same way
+        self.assertEqual(self.client.get('/mechanics/?per_page=0').status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
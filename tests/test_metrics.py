@@ -0,0 +1,96 @@
+import unittest
+import importlib
+import json
+import os
+import tempfile
+from unittest import mock
+from app import create_app
+from app.extensions import db
+from app.models import Mechanic
+import config
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith('text/plain'))
+        samples = {}
+        for line in response.get_data(as_text=True).splitlines():
+            if line and not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_request_latency_sql_and_cache_metrics(self):
+        before = self.scrape()
+        db.session.add(Mechanic(name="Mike", email="mike@test.com", specialization="Engine", experience=5))
+        db.session.commit()
+        self.client.get('/mechanics/')
+        self.client.get('/mechanics/')
+        after = self.scrape()
+
+        def delta(name):
+            return after.get(name, 0) - before.get(name, 0)
+
+        requests = 'http_requests_total{endpoint="mechanic_bp.get_mechanics",method="GET",status="200"}'
+        self.assertEqual(delta(requests), 2)
+        self.assertEqual(delta('http_request_duration_seconds_count{endpoint="mechanic_bp.get_mechanics"}'), 2)
+        self.assertEqual(delta('http_response_size_bytes_count{endpoint="mechanic_bp.get_mechanics"}'), 2)
+        self.assertEqual(delta('cache_lookups_total{endpoint="mechanic_bp.get_mechanics",result="miss"}'), 1)
+        self.assertEqual(delta('cache_lookups_total{endpoint="mechanic_bp.get_mechanics",result="hit"}'), 1)
+        self.assertGreater(delta('db_statements_total{endpoint="mechanic_bp.get_mechanics"}'), 0)
+
+    def test_ratelimit_rejections_counted(self):
+        before = self.scrape().get('ratelimit_rejections_total{endpoint="customer_bp.get_customers"}', 0)
+        for _ in range(4):
+            response = self.client.get('/customers/?limit=1&n=%d' % _)
+        self.assertEqual(response.status_code, 429)
+        after = self.scrape()['ratelimit_rejections_total{endpoint="customer_bp.get_customers"}']
+        self.assertEqual(after - before, 1)
+
+    def test_multiprocess_directory_sums_workers(self):
+        sample = 'http_requests_total{endpoint="health_check",method="GET",status="200"}'
+        before = self.scrape().get(sample, 0)
+        with tempfile.TemporaryDirectory() as directory:
+            other_worker = {
+                'counters': [['http_requests_total', [['endpoint', 'health_check'], ['method', 'GET'],
+                                                      ['status', '200']], 5]],
+                'histograms': [],
+            }
+            with open(os.path.join(directory, 'metrics-other.json'), 'w') as fh:
+                json.dump(other_worker, fh)
+            self.app.config['METRICS_MULTIPROC_DIR'] = directory
+
+            self.client.get('/health')
+            self.assertEqual(self.scrape()[sample], before + 1 + 5)
+
+    def test_multiprocess_directory_configuration(self):
+        env = {k: v for k, v in os.environ.items() if k not in ('METRICS_MULTIPROC_DIR', 'PROMETHEUS_MULTIPROC_DIR')}
+        try:
+            with mock.patch.dict(os.environ, env, clear=True):
+                importlib.reload(config)
+                # production gunicorn runs several workers, so it aggregates by default
+                self.assertEqual(config.ProductionConfig.METRICS_MULTIPROC_DIR,
+                                 os.path.join(tempfile.gettempdir(), 'mechanic_api_metrics'))
+                self.assertIsNone(config.DevelopmentConfig.METRICS_MULTIPROC_DIR)
+            for name in ('METRICS_MULTIPROC_DIR', 'PROMETHEUS_MULTIPROC_DIR'):
+                with mock.patch.dict(os.environ, {**env, name: '/srv/metrics'}, clear=True):
+                    importlib.reload(config)
+                    self.assertEqual(config.ProductionConfig.METRICS_MULTIPROC_DIR, '/srv/metrics')
+        finally:
+            importlib.reload(config)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import multiprocessing
+import os
+import tempfile
+import time
+from unittest import mock
+from app import create_app
+from app.extensions import db, limiter
+from app.ratelimit import SQLiteStorage
+
+def _worker_statuses(uri, requests):
+    # a separate process, as a gunicorn worker would be
+    with mock.patch('config.TestingConfig.RATELIMIT_STORAGE_URI', uri):
+        app = create_app('TestingConfig')
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        return [client.post('/inventory/', json={"name": "Oil", "price": 8.5}).status_code for _ in range(requests)]
+
+class TestSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.uri = f"sqlite:///{os.path.join(self.directory.name, 'limits.db')}"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_instances_share_counters(self):
+        first, second = SQLiteStorage(self.uri), SQLiteStorage(self.uri)
+        self.assertEqual(first.incr('k', 60), 1)
+        self.assertEqual(second.incr('k', 60), 2)
+        self.assertEqual(first.incr('k', 60, amount=3), 5)
+        self.assertEqual(second.get('k'), 5)
+        self.assertGreater(second.get_expiry('k'), time.time() + 50)
+        second.clear('k')
+        self.assertEqual(first.get('k'), 0)
+
+    def test_window_restarts_after_expiry(self):
+        storage = SQLiteStorage(self.uri)
+        storage.incr('k', 0.05)
+        storage.incr('k', 0.05)
+        time.sleep(0.06)
+        self.assertEqual(storage.get('k'), 0)
+        self.assertEqual(storage.incr('k', 60), 1)
+        self.assertTrue(storage.check())
+        self.assertEqual(storage.reset(), 1)
+
+    def test_batched_updates(self):
+        batched, other = SQLiteStorage(self.uri, flush_interval=60), SQLiteStorage(self.uri)
+        self.assertEqual([batched.incr('k', 60) for _ in range(3)], [1, 2, 3])
+        self.assertEqual(batched.get('k'), 3)
+        self.assertEqual(other.get('k'), 0)
+        other.incr('k', 60)
+        batched.flush()
+        self.assertEqual(other.get('k'), 4)
+        # the next flush picks up hits counted elsewhere
+        batched._last_flush = 0
+        self.assertEqual(batched.incr('k', 60), 5)
+
+    def test_limit_holds_across_processes(self):
+        context = multiprocessing.get_context('fork')
+        with context.Pool(2) as pool:
+            results = pool.starmap(_worker_statuses, [(self.uri, 8), (self.uri, 8)])
+        statuses = [status for result in results for status in result]
+        # POST /inventory/ allows 10 per day in total, not 10 per worker
+        self.assertEqual((statuses.count(201), statuses.count(429)), (10, 6))
+
+class TestLimiterStorageConfig(unittest.TestCase):
+    def test_sqlite_uri_selects_shared_storage(self):
+        with tempfile.TemporaryDirectory() as directory:
+            uri = f"sqlite:///{os.path.join(directory, 'limits.db')}"
+            with mock.patch('config.TestingConfig.RATELIMIT_STORAGE_URI', uri):
+                create_app('TestingConfig')
+            self.assertIsInstance(limiter.storage, SQLiteStorage)
+            self.assertEqual(limiter.storage.flush_interval, 0)
+        create_app('TestingConfig')
+        self.assertNotIsInstance(limiter.storage, SQLiteStorage)
+
+if __name__ == '__main__':
+    unittest.main()
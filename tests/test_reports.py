@@ -0,0 +1,131 @@
+import unittest
+from datetime import date
+from unittest import mock
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+from app import create_app
+from app.extensions import db
+from app.rollups import _recompute, refresh_days
+from app.models import Customer, DailyRevenue, Inventory, Mechanic, ServiceTicket
+
+class TestReports(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        customer = Customer(name="Test Customer", email="test@test.com", password="test123")
+        self.mechanics = [Mechanic(name=f"Mech {i}", email=f"m{i}@test.com", specialization="Engine", experience=i)
+                          for i in range(2)]
+        self.parts = [Inventory(name="Oil", price=10.0), Inventory(name="Wiper", price=4.5)]
+        db.session.add_all([customer, *self.mechanics, *self.parts])
+        db.session.commit()
+        self.customer_id = customer.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def create_ticket(self, day):
+        data = {"service_date": day, "customer_id": self.customer_id}
+        return self.client.post('/service-tickets/', json=data).json['id']
+
+    def rollup_rows(self):
+        return {row.day: (row.ticket_count, row.part_count, row.revenue)
+                for row in db.session.scalars(select(DailyRevenue))}
+
+    def test_rollups_follow_ticket_writes(self):
+        oil, wiper = (p.id for p in self.parts)
+        mech = self.mechanics[0].id
+        first = self.create_ticket("2024-03-04")
+        self.create_ticket("2024-03-04")
+        third = self.create_ticket("2024-03-06")
+
+        self.client.put(f'/service-tickets/{first}/add-part/{oil}?quantity=2')
+        self.client.put(f'/service-tickets/{third}/edit', json={"add_ids": [mech], "add_part_ids": [wiper]})
+        self.client.put(f'/service-tickets/{first}/assign-mechanic/{mech}')
+
+        response = self.client.get('/reports/revenue?start=2024-03-01&end=2024-03-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['rows'], [
+            {"period": "2024-03-04", "ticket_count": 2, "part_count": 2, "revenue": 20.0},
+            {"period": "2024-03-06", "ticket_count": 1, "part_count": 1, "revenue": 4.5},
+        ])
+
+        weekly = self.client.get('/reports/mechanic-workload?start=2024-03-01&end=2024-03-31').json['rows']
+        self.assertEqual(weekly, [{"period": "2024-03-04", "mechanic_id": mech, "ticket_count": 2}])
+
+        monthly = self.client.get('/reports/revenue?start=2024-03-01&end=2024-03-31&bucket=month').json['rows']
+        self.assertEqual(monthly, [{"period": "2024-03-01", "ticket_count": 3, "part_count": 3, "revenue": 24.5}])
+
+        # unlinking and deleting flow through as well
+        self.client.put(f'/service-tickets/{first}/remove-mechanic/{mech}')
+        self.client.delete(f'/inventory/{wiper}')
+        usage = self.client.get('/reports/parts-usage?start=2024-03-01&end=2024-03-31').json['rows']
+        self.assertEqual(usage, [{"period": "2024-03-04", "inventory_id": oil, "quantity": 2, "revenue": 20.0}])
+        weekly = self.client.get('/reports/mechanic-workload?start=2024-03-01&end=2024-03-31').json['rows']
+        self.assertEqual(weekly, [{"period": "2024-03-04", "mechanic_id": mech, "ticket_count": 1}])
+
+        self.client.delete(f'/customers/{self.customer_id}')
+        self.assertEqual(self.client.get('/reports/revenue?start=2024-03-01&end=2024-03-31').json['rows'], [])
+
+    def test_rebuild_rollups_command(self):
+        # rows written behind the routes' back, e.g. an import script
+        for day in (5, 5, 20):
+            db.session.add(ServiceTicket(service_date=date(2024, 1, day), customer_id=self.customer_id,
+                                         mechanics=self.mechanics, inventory=self.parts))
+        db.session.commit()
+        self.assertEqual(self.rollup_rows(), {})
+
+        result = self.app.test_cli_runner().invoke(args=['rebuild-rollups'])
+        self.assertIn('2 days', result.output)
+        self.assertEqual(self.rollup_rows(), {date(2024, 1, 5): (2, 4, 29.0), date(2024, 1, 20): (1, 2, 14.5)})
+
+    def test_refresh_updates_rollup_rows_in_place(self):
+        ticket = ServiceTicket(service_date=date(2024, 1, 5), customer_id=self.customer_id,
+                               mechanics=self.mechanics, inventory=self.parts)
+        db.session.add(ticket)
+        refresh_days([ticket.service_date])
+        db.session.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        ticket.mechanics = self.mechanics[:1]
+        ticket.inventory = self.parts[1:]
+        refresh_days([ticket.service_date])
+        db.session.commit()
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertEqual(self.rollup_rows(), {date(2024, 1, 5): (1, 1, 4.5)})
+        self.assertEqual(self.client.get('/reports/mechanic-workload?start=2024-01-01&end=2024-01-31').json['rows'],
+                         [{"period": "2024-01-01", "mechanic_id": self.mechanics[0].id, "ticket_count": 1}])
+        # rows still in the source are overwritten, never deleted and inserted again,
+        # so concurrent refreshes of one day cannot collide on the primary key
+        deletes = [s for s in statements if s.startswith('DELETE FROM daily_')]
+        self.assertTrue(deletes)
+        self.assertTrue(all(' NOT IN ' in s for s in deletes))
+
+    def test_refresh_upserts_on_postgresql(self):
+        executor = mock.Mock()
+        executor.get_bind.return_value.dialect = postgresql.dialect()
+        _recompute(executor, [date(2024, 1, 5)])
+        sql = [str(call.args[0].compile(dialect=postgresql.dialect())) for call in executor.execute.call_args_list]
+        self.assertEqual(len(sql), 6)
+        self.assertIn('ON CONFLICT (day) DO UPDATE SET ticket_count = excluded.ticket_count', sql[1])
+        self.assertIn('ON CONFLICT (day, mechanic_id) DO UPDATE', sql[3])
+
+    def test_report_args_validated(self):
+        self.assertEqual(self.client.get('/reports/revenue?start=2024-02-01&end=2024-01-01').status_code, 400)
+        self.assertEqual(self.client.get('/reports/revenue?start=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/reports/revenue?bucket=year').status_code, 400)
+        self.assertEqual(self.client.get('/reports/parts-usage').json['rows'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import json
+from datetime import date
+from marshmallow import fields
+from sqlalchemy import select
+from app import create_app
+from app.extensions import db, ma
+from app.models import Customer, Inventory, Mechanic, ServiceTicket
+from app.serialization import RowSerializer
+from app.blueprints.customer.schemas import customer_schema, customer_rows
+from app.blueprints.inventory.schemas import inventory_schema, inventory_rows
+from app.blueprints.mechanic.schemas import mechanic_schema, mechanic_rows
+from app.blueprints.service_ticket.schemas import ServiceTicketDetailSchema, service_ticket_schema, service_ticket_rows
+
+class TestRowSerializer(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        customers = [Customer(name="Ann", email="ann@test.com", password="x", dob=date(1990, 2, 28)),
+                     Customer(name="Bo Ünal", email="bo@test.com", password="x")]
+        db.session.add_all(customers)
+        db.session.add_all([Mechanic(name="Mike", email="mike@test.com", specialization="Engine", experience=5),
+                            Inventory(name="Oil \"5W-30\"", price=8.25), Inventory(name="Bolt", price=3)])
+        db.session.flush()
+        db.session.add(ServiceTicket(service_date=date(2024, 1, 15), customer_id=customers[0].id))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_rows_serialize_byte_identical_to_schema(self):
+        cases = [
+            (Customer, customer_schema, customer_rows),
+            (Mechanic, mechanic_schema, mechanic_rows),
+            (Inventory, inventory_schema, inventory_rows),
+            (ServiceTicket, service_ticket_schema, service_ticket_rows),
+        ]
+        for model, schema, rows in cases:
+            with self.subTest(model=model.__name__):
+                objects = db.session.scalars(select(model).order_by(model.id)).all()
+                fast = db.session.execute(rows.select().order_by(model.id)).all()
+                self.assertEqual(len(fast), len(objects))
+                for obj, row in zip(objects, fast):
+                    # json.dumps keeps key order, which Flask's sorted output would hide
+                    self.assertEqual(json.dumps(rows.dump(row)), json.dumps(schema.dump(obj)))
+                    self.assertEqual(self.app.json.dumps(rows.dump(row)), self.app.json.dumps(schema.dump(obj)))
+
+    def test_list_routes_match_marshmallow_output(self):
+        client = self.app.test_client()
+        cases = [
+            ('/mechanics/', Mechanic, mechanic_schema),
+            ('/inventory/', Inventory, inventory_schema),
+            ('/service-tickets/', ServiceTicket, service_ticket_schema),
+        ]
+        for url, model, schema in cases:
+            with self.subTest(url=url):
+                objects = db.session.scalars(select(model).order_by(model.id)).all()
+                expected = schema.jsonify(objects, many=True).get_data()
+                self.assertEqual(client.get(url).get_data(), expected)
+
+    def test_rejects_schemas_without_plain_columns(self):
+        with self.assertRaises(TypeError):
+            RowSerializer(ServiceTicketDetailSchema())
+
+        class FormattedSchema(ma.SQLAlchemyAutoSchema):
+            class Meta:
+                model = ServiceTicket
+            service_date = fields.Date(format='%d/%m/%Y')
+
+        with self.assertRaises(TypeError):
+            RowSerializer(FormattedSchema())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 import json
+from contextlib import contextmanager
 from datetime import date
+from sqlalchemy import event
 from app import create_app
 from app.extensions import db
 from app.models import Customer, Mechanic, ServiceTicket, Inventory
@@ -18,12 +20,41 @@ class TestServiceTickets(unittest.TestCase):
         db.session.add(customer)
         db.session.commit()
         self.customer_id = customer.id
+        self.seeded = 0
 
     def tearDown(self):
         db.session.remove()
         db.drop_all()
         self.app_context.pop()
 
+    @contextmanager
+    def count_queries(self):
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    def add_tickets(self, count):
+        mechanics = [Mechanic(name=f"Mech {i}", email=f"mech{self.seeded + i}@test.com",
+                              specialization="Engine", experience=i) for i in range(2)]
+        parts = [Inventory(name=f"Part {i}", price=10.0 + i) for i in range(2)]
+        for _ in range(count):
+            db.session.add(ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id,
+                                         mechanics=mechanics, inventory=parts))
+        self.seeded += 2
+        db.session.commit()
+        db.session.expunge_all()
+
+    def my_tickets_query_count(self, token):
+        with self.count_queries() as statements:
+            response = self.client.get('/customers/my-tickets', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        return len(statements), response.json
+
     def test_create_ticket_success(self):
         data = {"service_date": "2024-01-15", "customer_id": self.customer_id}
         response = self.client.post('/service-tickets/', json=data)
@@ -38,6 +69,146 @@ class TestServiceTickets(unittest.TestCase):
         response = self.client.get('/service-tickets/')
         self.assertEqual(response.status_code, 200)
 
+    def test_get_tickets_ordered_by_service_date(self):
+        for day in (20, 5, 12):
+            db.session.add(ServiceTicket(service_date=date(2024, 1, day), customer_id=self.customer_id))
+        db.session.commit()
+
+        first = self.client.get('/service-tickets/?limit=2')
+        self.assertEqual([t['service_date'] for t in first.json], ["2024-01-05", "2024-01-12"])
+
+        second = self.client.get(f"/service-tickets/?limit=2&cursor={first.headers['X-Next-Cursor']}")
+        self.assertEqual([t['service_date'] for t in second.json], ["2024-01-20"])
+
+    def test_get_tickets_filtered_by_customer_and_date_range(self):
+        other = Customer(name="Other", email="other@test.com", password="x")
+        db.session.add(other)
+        db.session.commit()
+        for day in range(1, 11):
+            db.session.add(ServiceTicket(service_date=date(2024, 3, day), customer_id=self.customer_id))
+            db.session.add(ServiceTicket(service_date=date(2024, 3, day), customer_id=other.id))
+        db.session.commit()
+
+        query = f'customer_id={self.customer_id}&service_date[gte]=2024-03-03&service_date[lt]=2024-03-08'
+        first = self.client.get(f'/service-tickets/?{query}&sort=-service_date&limit=3')
+        self.assertEqual([t['service_date'] for t in first.json], ["2024-03-07", "2024-03-06", "2024-03-05"])
+        self.assertTrue(all(t['customer_id'] == self.customer_id for t in first.json))
+
+        cursor = first.headers['X-Next-Cursor']
+        second = self.client.get(f"/service-tickets/?{query}&sort=-service_date&limit=3&cursor={cursor}")
+        self.assertEqual([t['service_date'] for t in second.json], ["2024-03-04", "2024-03-03"])
+        self.assertNotIn('X-Next-Cursor', second.headers)
+
+        # a cursor from another sort order is refused rather than misapplied
+        response = self.client.get(f"/service-tickets/?{query}&cursor={cursor}")
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_tickets_filter_uses_customer_index(self):
+        executed = []
+        def record(conn, cursor, statement, parameters, *args):
+            executed.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            self.client.get(f'/service-tickets/?customer_id={self.customer_id}&service_date[gte]=2024-01-01')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        statement, parameters = next((s, p) for s, p in executed if 'FROM service_tickets' in s)
+        with db.engine.connect() as conn:
+            plan = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+        self.assertIn('ix_service_tickets_customer_date', ' '.join(row[-1] for row in plan))
+
+    def test_get_tickets_rejects_unknown_filters(self):
+        self.assertEqual(self.client.get('/service-tickets/?price[gt]=3').status_code, 400)
+        self.assertEqual(self.client.get('/service-tickets/?service_date[gte]=soon').status_code, 400)
+        self.assertEqual(self.client.get('/service-tickets/?service_date[like]=2024').status_code, 400)
+        self.assertEqual(self.client.get('/service-tickets/?sort=customer').status_code, 400)
+
+    def test_get_tickets_rejects_foreign_cursor(self):
+        db.session.add(Mechanic(name="Mike", email="mike@test.com", specialization="Engine", experience=5))
+        db.session.add(Mechanic(name="Jo", email="jo@test.com", specialization="Brakes", experience=2))
+        db.session.commit()
+        cursor = self.client.get('/mechanics/?limit=1').headers['X-Next-Cursor']
+        response = self.client.get(f'/service-tickets/?cursor={cursor}')
+        self.assertEqual(response.status_code, 400)
+
+    def test_my_tickets_query_count_is_constant(self):
+        token = self.client.post('/customers/login', json={"email": "test@test.com", "password": "test123"}).json['token']
+
+        self.add_tickets(2)
+        few, body = self.my_tickets_query_count(token)
+        self.assertEqual(len(body), 2)
+        self.assertEqual([m['name'] for m in body[0]['mechanics']], ["Mech 0", "Mech 1"])
+        self.assertEqual([p['price'] for p in body[0]['inventory']], [10.0, 11.0])
+
+        self.add_tickets(20)
+        many, body = self.my_tickets_query_count(token)
+        self.assertEqual(len(body), 22)
+        self.assertEqual(few, many)
+
+    def test_get_tickets_expand_query_count_is_constant(self):
+        self.add_tickets(2)
+        with self.count_queries() as few:
+            self.client.get('/service-tickets/?expand=1&limit=100')
+        self.add_tickets(20)
+        with self.count_queries() as many:
+            response = self.client.get('/service-tickets/?expand=true&limit=100')
+        self.assertEqual(len(response.json), 22)
+        self.assertEqual(len(response.json[-1]['mechanics']), 2)
+        self.assertEqual(len(few), len(many))
+
+    def test_ranking_and_listing_invalidated_by_assignment(self):
+        mech = Mechanic(name="Mike", email="mike@test.com", specialization="Engine", experience=5)
+        ticket = ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id)
+        db.session.add_all([mech, ticket])
+        db.session.commit()
+        mech_id, ticket_id = mech.id, ticket.id
+
+        self.assertEqual(self.client.get('/mechanics/ranking').json[0]['ticket_count'], 0)
+        self.assertEqual(self.client.get('/service-tickets/?expand=1').json[0]['mechanics'], [])
+
+        self.client.put(f'/service-tickets/{ticket_id}/assign-mechanic/{mech_id}')
+        self.assertEqual(self.client.get('/mechanics/ranking').json[0]['ticket_count'], 1)
+        self.assertEqual(len(self.client.get('/service-tickets/?expand=1').json[0]['mechanics']), 1)
+
+        self.client.put(f'/service-tickets/{ticket_id}/remove-mechanic/{mech_id}')
+        self.assertEqual(self.client.get('/mechanics/ranking').json[0]['ticket_count'], 0)
+
+    def test_ticket_counts_maintained_on_write(self):
+        mechs = [Mechanic(name=f"Mech {i}", email=f"r{i}@test.com", specialization="Engine", experience=i)
+                 for i in range(3)]
+        tickets = [ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id) for _ in range(2)]
+        db.session.add_all(mechs + tickets)
+        db.session.commit()
+        m0, m1, m2 = (m.id for m in mechs)
+        t0, t1 = (t.id for t in tickets)
+
+        self.client.put(f'/service-tickets/{t0}/assign-mechanic/{m1}')
+        self.client.put(f'/service-tickets/{t0}/assign-mechanic/{m1}')  # already assigned: no change
+        self.client.put(f'/service-tickets/{t1}/edit', json={"add_ids": [m1, m2]})
+        self.client.put(f'/service-tickets/{t1}/edit', json={"remove_ids": [m2, m0]})
+        ranking = self.client.get('/mechanics/ranking').json
+        self.assertEqual([(m['id'], m['ticket_count']) for m in ranking], [(m1, 2), (m0, 0), (m2, 0)])
+        self.assertEqual(len(self.client.get('/mechanics/ranking?limit=1').json), 1)
+
+        self.client.put(f'/service-tickets/{t0}/remove-mechanic/{m1}')
+        self.assertEqual(self.client.get('/mechanics/ranking').json[0]['ticket_count'], 1)
+
+        self.client.delete(f'/customers/{self.customer_id}')
+        self.assertEqual(db.session.get(Mechanic, m1).ticket_count, 0)
+
+    def test_reconcile_ticket_counts_command(self):
+        mech = Mechanic(name="Mike", email="mike@test.com", specialization="Engine", experience=5)
+        db.session.add(ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id, mechanics=[mech]))
+        db.session.commit()
+        mech.ticket_count = 7  # drifted
+        db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(args=['reconcile-ticket-counts'])
+        self.assertIn('Reconciled ticket counts for 1 mechanics', result.output)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Mechanic, mech.id).ticket_count, 1)
+
     def test_assign_mechanic_ticket_not_found(self):
         response = self.client.put('/service-tickets/999/assign-mechanic/1')
         self.assertEqual(response.status_code, 404)
@@ -55,6 +226,52 @@ class TestServiceTickets(unittest.TestCase):
         response = self.client.put('/service-tickets/999/remove-mechanic/1')
         self.assertEqual(response.status_code, 404)
 
+    def test_edit_ticket_set_based_diff(self):
+        mechs = [Mechanic(name=f"Mech {i}", email=f"e{i}@test.com", specialization="Engine", experience=i)
+                 for i in range(3)]
+        parts = [Inventory(name=f"Part {i}", price=5.0) for i in range(2)]
+        ticket = ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id, mechanics=[mechs[0]])
+        db.session.add_all(mechs + parts + [ticket])
+        db.session.commit()
+        m0, m1, m2 = (m.id for m in mechs)
+        p0, p1 = (p.id for p in parts)
+
+        data = {"add_ids": [m0, m1, m2, 999], "remove_ids": [m0, m2, 998],
+                "add_part_ids": [p0, p1, 997], "remove_part_ids": []}
+        response = self.client.put(f'/service-tickets/{ticket.id}/edit', json=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(m['id'] for m in response.json['mechanics']), [m0, m1, m2])
+        self.assertEqual(sorted(p['id'] for p in response.json['inventory']), [p0, p1])
+        self.assertEqual(response.json['unknown_mechanic_ids'], [998, 999])
+        self.assertEqual(response.json['unknown_part_ids'], [997])
+
+        response = self.client.put(f'/service-tickets/{ticket.id}/edit',
+                                   json={"remove_ids": [m0, m2], "remove_part_ids": [p1]})
+        self.assertEqual([m['id'] for m in response.json['mechanics']], [m1])
+        self.assertEqual([p['id'] for p in response.json['inventory']], [p0])
+
+    def test_edit_ticket_query_count_independent_of_ids(self):
+        ticket = ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id)
+        mechs = [Mechanic(name=f"Mech {i}", email=f"q{i}@test.com", specialization="Engine", experience=i)
+                 for i in range(30)]
+        db.session.add_all(mechs + [ticket])
+        db.session.commit()
+        ids = [m.id for m in mechs]
+        ticket_id = ticket.id
+
+        with self.count_queries() as few:
+            self.client.put(f'/service-tickets/{ticket_id}/edit', json={"add_ids": ids[:2]})
+        with self.count_queries() as many:
+            self.client.put(f'/service-tickets/{ticket_id}/edit', json={"add_ids": ids[2:]})
+        self.assertEqual(len(few), len(many))
+
+    def test_edit_ticket_rejects_non_integer_ids(self):
+        ticket = ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id)
+        db.session.add(ticket)
+        db.session.commit()
+        response = self.client.put(f'/service-tickets/{ticket.id}/edit', json={"add_ids": "1,2"})
+        self.assertEqual(response.status_code, 400)
+
     def test_edit_ticket_not_found(self):
         data = {"add_ids": [1], "remove_ids": []}
         response = self.client.put('/service-tickets/999/edit', json=data)
@@ -64,5 +281,69 @@ class TestServiceTickets(unittest.TestCase):
         response = self.client.put('/service-tickets/999/add-part/1')
         self.assertEqual(response.status_code, 404)
 
+    def test_invoice_uses_quantities_and_price_snapshot(self):
+        ticket = ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id)
+        oil, wiper = Inventory(name="Oil", price=8.25), Inventory(name="Wiper", price=12.0)
+        db.session.add_all([ticket, oil, wiper])
+        db.session.commit()
+        ticket_id, oil_id, wiper_id = ticket.id, oil.id, wiper.id
+
+        self.client.put(f'/service-tickets/{ticket_id}/add-part/{oil_id}?quantity=4')
+        self.client.put(f'/service-tickets/{ticket_id}/add-part/{wiper_id}')
+        self.client.put(f'/service-tickets/{ticket_id}/add-part/{wiper_id}')
+        # later catalogue price changes do not rewrite the ticket
+        self.client.put(f'/inventory/{oil_id}', json={"name": "Oil", "price": 99.0})
+
+        with self.count_queries() as statements:
+            response = self.client.get(f'/service-tickets/{ticket_id}/invoice')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual([(l['name'], l['quantity'], l['unit_price'], l['line_total']) for l in response.json['lines']],
+                         [("Oil", 4, 8.25, 33.0), ("Wiper", 2, 12.0, 24.0)])
+        self.assertEqual(response.json['item_count'], 6)
+        self.assertEqual(response.json['total'], 57.0)
+
+        with self.count_queries() as statements:
+            self.assertEqual(self.client.get(f'/service-tickets/{ticket_id}/invoice').json['total'], 57.0)
+        self.assertEqual(statements, [])
+
+        # adding parts invalidates the cached invoice
+        self.client.put(f'/service-tickets/{ticket_id}/edit', json={"remove_part_ids": [wiper_id]})
+        self.assertEqual(self.client.get(f'/service-tickets/{ticket_id}/invoice').json['total'], 33.0)
+
+    def test_invoice_without_parts_and_not_found(self):
+        ticket = ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id)
+        db.session.add(ticket)
+        db.session.commit()
+        response = self.client.get(f'/service-tickets/{ticket.id}/invoice')
+        self.assertEqual((response.json['lines'], response.json['total']), ([], 0.0))
+        self.assertEqual(self.client.get('/service-tickets/999/invoice').status_code, 404)
+
+    def test_ticket_totals_in_one_query(self):
+        self.add_tickets(3)
+        ticket_ids = [t.id for t in db.session.query(ServiceTicket).order_by(ServiceTicket.id)]
+        ids = ','.join(str(i) for i in ticket_ids + [999])
+
+        with self.count_queries() as statements:
+            response = self.client.get(f'/service-tickets/totals?ids={ids}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(statements), 1)
+        # parts linked through the ORM have no snapshot and use the catalogue price
+        self.assertEqual([t['total'] for t in response.json['totals']], [21.0, 21.0, 21.0])
+        self.assertEqual(response.json['missing_ids'], [999])
+
+        self.assertEqual(self.client.get('/service-tickets/totals').status_code, 400)
+        self.assertEqual(self.client.get('/service-tickets/totals?ids=1,x').status_code, 400)
+
+    def test_add_part_rejects_bad_quantity(self):
+        ticket = ServiceTicket(service_date=date(2024, 1, 15), customer_id=self.customer_id)
+        part = Inventory(name="Oil", price=8.25)
+        db.session.add_all([ticket, part])
+        db.session.commit()
+        for quantity in ('0', '-2', 'abc', '1.5', ''):
+            response = self.client.put(f'/service-tickets/{ticket.id}/add-part/{part.id}?quantity={quantity}')
+            self.assertEqual(response.status_code, 400, quantity)
+        self.assertEqual(db.session.get(ServiceTicket, ticket.id).inventory, [])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
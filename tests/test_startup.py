@@ -0,0 +1,80 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+from unittest import mock
+from flask import url_for
+from flask.cli import FlaskGroup
+from app import BLUEPRINTS, create_app, register_blueprints
+from app.extensions import db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# import + create_app + first request of a fresh process, best of three runs.
+# About 0.8s on a dev machine; the default leaves room for shared CI hosts
+# and STARTUP_BUDGET_MS adjusts it.
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS') or 3000)
+
+
+def _cold_start():
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_startup', '--child'], cwd=ROOT,
+                         env=dict(os.environ, LAZY_BLUEPRINTS='true'), check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_blueprints_registered_on_first_request(self):
+        app = create_app('TestingConfig')
+        self.assertNotIn('customer_bp', app.blueprints)
+        client = app.test_client()
+        response = client.get('/customers')
+        self.assertIn('customer_bp', app.blueprints)
+        # blueprint routes still redirect to their trailing-slash form
+        self.assertEqual(response.status_code, 308)
+        self.assertEqual(client.get('/health/').status_code, 200)
+        self.assertEqual(client.get('/docs/').status_code, 200)
+        self.assertEqual(client.get('/swagger.json').get_json()['swagger'], '2.0')
+
+    def test_blueprints_registered_for_cli_and_url_for(self):
+        app = create_app('TestingConfig')
+        result = app.test_cli_runner().invoke(FlaskGroup(), args=['routes'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('customer_bp.get_customers', result.output)
+
+        app = create_app('TestingConfig')
+        app.config['SERVER_NAME'] = 'localhost'
+        with app.app_context():
+            self.assertEqual(url_for('customer_bp.get_customers'), 'http://localhost/customers/')
+
+    def test_eager_blueprints(self):
+        with mock.patch('config.TestingConfig.LAZY_BLUEPRINTS', False, create=True):
+            app = create_app('TestingConfig')
+        self.assertIn('customer_bp', app.blueprints)
+        self.assertIs(app.wsgi_app.__self__, app)
+        # loading again, as gunicorn.conf.py does, is a no-op
+        register_blueprints(app)
+        self.assertEqual(len(app.blueprints), len(BLUEPRINTS) + 1)
+
+    def test_create_app_defers_blueprint_imports(self):
+        # the blueprints, their schemas and the swagger spec wait for the first request
+        self.assertEqual(_cold_start()['loaded_by_create_app'], [])
+
+    def test_cold_start_within_budget(self):
+        ready_ms = min(_cold_start()['ready_ms'] for _ in range(3))
+        self.assertLess(ready_ms, STARTUP_BUDGET_MS,
+                        f'cold start took {ready_ms:.0f}ms, budget {STARTUP_BUDGET_MS:.0f}ms')
+
+if __name__ == '__main__':
+    unittest.main()